@@ -1,4 +1,6 @@
 from django.contrib import admin
-from .models import User
+from .models import OutboxEmail, ThrottleBucket, User
 
 admin.site.register(User)
+admin.site.register(OutboxEmail)
+admin.site.register(ThrottleBucket)
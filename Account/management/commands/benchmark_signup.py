@@ -0,0 +1,65 @@
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure signup throughput through /registration/. Run it against a '
+        'scratch database: every signup creates a real user.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--signups', type=int, default=200)
+        parser.add_argument('--fast-hasher', action='store_true',
+                            help='Hash passwords with MD5 so the numbers show database cost rather than PBKDF2.')
+
+    def handle(self, *args, **options):
+        overrides = {
+            'ACCOUNT_EMAIL_VERIFICATION': 'none',
+            'EMAIL_BACKEND': 'django.core.mail.backends.locmem.EmailBackend',
+        }
+        if options['fast_hasher']:
+            overrides['PASSWORD_HASHERS'] = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+        client = APIClient()
+        run = uuid.uuid4().hex[:8]
+        with override_settings(**overrides):
+            # Each test-client request resets connection.queries, so count
+            # statements with an execute wrapper instead.
+            queries = []
+            with connection.execute_wrapper(lambda execute, sql, *rest: queries.append(sql) or execute(sql, *rest)):
+                started = time.perf_counter()
+                for index in range(options['signups']):
+                    response = client.post('/registration/', {
+                        'first_name': 'Bench',
+                        'last_name': 'Signup',
+                        'email': f'signup_{run}_{index}@example.com',
+                        'username': f'signup_{run}_{index}',
+                        'phone_number': f'+{run}{index}',
+                        'password1': 'Bench-pass-1234',
+                        'password2': 'Bench-pass-1234',
+                    }, format='json', HTTP_HOST='localhost')
+                    assert response.status_code == 201, response.content
+                    client.cookies.clear()
+                elapsed = time.perf_counter() - started
+
+            conflict = client.post('/registration/', {
+                'first_name': 'Bench',
+                'last_name': 'Signup',
+                'email': f'signup_{run}_0@example.com',
+                'username': f'signup_{run}_0',
+                'phone_number': f'+{run}0',
+                'password1': 'Bench-pass-1234',
+                'password2': 'Bench-pass-1234',
+            }, format='json', HTTP_HOST='localhost')
+
+        self.stdout.write(
+            f'signups={options["signups"]} {options["signups"] / elapsed:.1f} signups/s '
+            f'queries/signup={len(queries) / options["signups"]:.2f}'
+        )
+        self.stdout.write(f'duplicate signup -> {conflict.status_code} {conflict.json()}')
@@ -0,0 +1,41 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from Config.schema import CODECS, artifact_path, build_schema, code_version, encode_schema
+
+
+class Command(BaseCommand):
+    help = (
+        'Write the OpenAPI schema of the current code version to SCHEMA_DIR as '
+        'openapi-<version>.json and .yaml, for the web processes to load instead '
+        'of introspecting the views themselves. Run it on every deploy.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output-dir', help='Directory to write to instead of SCHEMA_DIR.')
+        parser.add_argument('--prune', action='store_true', help='Delete artifacts of other code versions.')
+
+    def handle(self, *args, **options):
+        version = code_version()
+        started = time.perf_counter()
+        encoded = encode_schema(build_schema())
+        elapsed = time.perf_counter() - started
+
+        for fmt, body in encoded.items():
+            path = artifact_path(fmt, version, options['output_dir'])
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Written aside and renamed so a process never reads half a file.
+            tmp = path.with_name(f'{path.name}.tmp')
+            tmp.write_bytes(body)
+            os.replace(tmp, path)
+            self.stdout.write(f'wrote {path} ({len(body)} bytes)')
+
+        if options['prune']:
+            current = {artifact_path(fmt, version, options['output_dir']).name for fmt in CODECS}
+            for path in artifact_path('json', version, options['output_dir']).parent.glob('openapi-*'):
+                if path.name not in current:
+                    path.unlink()
+                    self.stdout.write(f'removed {path}')
+        self.stdout.write(f'schema for code version {version} generated in {elapsed * 1000:.0f}ms')
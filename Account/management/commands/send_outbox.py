@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from Account.models import OutboxEmail
+from Account.outbox import deliver_outbox
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued outbox emails in batches, one mail server connection per batch.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Emails claimed and sent per connection.')
+        parser.add_argument('--max-attempts', type=int, default=5,
+                            help='Attempts after which a failing email is dead-lettered.')
+        parser.add_argument('--requeue-dead', action='store_true',
+                            help='Give dead-lettered emails a fresh set of attempts first.')
+        parser.add_argument('--watch', action='store_true', help='Keep running and poll for new emails.')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds between polls with --watch.')
+
+    def handle(self, *args, **options):
+        if options['requeue_dead']:
+            requeued = OutboxEmail.objects.filter(status='Dead').update(
+                status='Pending', attempts=0, next_attempt=timezone.now()
+            )
+            self.stdout.write(f'requeued {requeued} dead emails')
+        while True:
+            started = time.monotonic()
+            sent, failed = deliver_outbox(batch_size=options['batch_size'], max_attempts=options['max_attempts'])
+            if sent or failed or not options['watch']:
+                self.stdout.write(f'sent {sent} emails, {failed} failed in {time.monotonic() - started:.1f}s')
+            if not options['watch']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,39 @@
+from django.contrib.postgres.indexes import OpClass
+from django.db import migrations, models
+from django.db.models.functions import Upper
+
+# PostgreSQL only answers ``LIKE 'x%'`` from a btree whose operator class
+# compares bytewise; the Upper() indexes of 0004 follow the database
+# collation, so the user search cannot use them there. Django already adds
+# such ``_like`` indexes to unique CharFields, phone_number's included.
+PATTERN_INDEXES = [
+    models.Index(OpClass(Upper('email'), name='varchar_pattern_ops'), name='user_email_upper_like'),
+    models.Index(OpClass(Upper('username'), name='varchar_pattern_ops'), name='user_username_upper_like'),
+]
+
+
+def add_pattern_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    User = apps.get_model('Account', 'User')
+    for index in PATTERN_INDEXES:
+        schema_editor.add_index(User, index)
+
+
+def remove_pattern_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    User = apps.get_model('Account', 'User')
+    for index in PATTERN_INDEXES:
+        schema_editor.remove_index(User, index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Account', '0005_outboxemail'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_pattern_indexes, remove_pattern_indexes),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.0.14 on 2026-10-18 12:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Account', '0006_user_search_pattern_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ThrottleBucket',
+            fields=[
+                ('key', models.CharField(max_length=200, primary_key=True, serialize=False)),
+                ('full_at', models.FloatField(default=0)),
+            ],
+        ),
+    ]
@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.utils import timezone
+from django.db.models.functions import Upper
 
 class UserManager(BaseUserManager):
     def create_user(self, username, email, password=None, **extra_fields):
@@ -57,6 +58,13 @@ class User(AbstractBaseUser, PermissionsMixin):
 
     class Meta:
         ordering = ['id']
+        indexes = [
+            models.Index(fields=['date_joined', 'id'], name='user_joined_idx'),
+            models.Index(fields=['verified', 'date_joined'], name='user_verified_joined_idx'),
+            models.Index(fields=['is_active', 'date_joined'], name='user_active_joined_idx'),
+            models.Index(Upper('email'), name='user_email_upper_idx'),
+            models.Index(Upper('username'), name='user_username_upper_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         super().save(*args, **kwargs)
@@ -69,3 +77,48 @@ class User(AbstractBaseUser, PermissionsMixin):
 
     def __str__(self):
         return self.username
+
+
+class OutboxEmail(models.Model):
+    """
+    An email recorded in the transaction that triggered it, so it goes out
+    only if that transaction commits. The send_outbox command delivers
+    pending rows in batches.
+    """
+    status_choices = (
+        ('Pending', 'Pending'),
+        ('Sent', 'Sent'),
+        ('Dead', 'Dead'),
+    )
+    subject = models.TextField()
+    body = models.TextField(blank=True)
+    html_body = models.TextField(blank=True)
+    from_email = models.CharField(max_length=254, blank=True)
+    to = models.JSONField()
+    headers = models.JSONField(default=dict, blank=True)
+    status = models.CharField(choices=status_choices, max_length=20, default='Pending')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    next_attempt = models.DateTimeField(default=timezone.now)
+    date_created = models.DateTimeField(auto_now_add=True)
+    date_sent = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['next_attempt', 'id'], condition=models.Q(status='Pending'), name='outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)}"
+
+
+class ThrottleBucket(models.Model):
+    """
+    A token bucket of Config/throttling.py, stored as the time (epoch
+    seconds) at which it is full again; any time in the past means full.
+    """
+    key = models.CharField(max_length=200, primary_key=True)
+    full_at = models.FloatField(default=0)
+
+    def __str__(self):
+        return self.key
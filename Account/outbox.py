@@ -0,0 +1,130 @@
+"""
+Transactional email outbox.
+
+Emails are not sent while a request is being handled: ``queue_message``
+records them as OutboxEmail rows in the caller's transaction, so an email
+exists exactly when the signup (or reset, ...) that produced it commits,
+and a slow or unreachable mail server never holds up a request. The
+send_outbox command claims due rows in batches and delivers each batch
+over one connection of the configured ``EMAIL_BACKEND``. Failures are
+retried with exponential backoff and dead-lettered after
+``max_attempts``.
+"""
+import logging
+from datetime import timedelta
+
+from django.core.mail import EmailMessage, EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+# How long a claimed row stays invisible to other workers. A worker that
+# dies mid-batch leaves its rows to be picked up again after this.
+CLAIM_LEASE = timedelta(minutes=5)
+RETRY_BACKOFF = timedelta(minutes=1)
+
+
+def queue_message(message):
+    """Record ``message`` (an EmailMessage) for delivery instead of sending it."""
+    body, html_body = message.body, ''
+    if message.content_subtype == 'html':
+        body, html_body = '', message.body
+    for content, mimetype in getattr(message, 'alternatives', []):
+        if mimetype == 'text/html':
+            html_body = content
+    return OutboxEmail.objects.create(
+        subject=message.subject,
+        body=body,
+        html_body=html_body,
+        from_email=message.from_email or '',
+        to=list(message.to),
+        headers=message.extra_headers,
+    )
+
+
+def build_message(email, connection=None):
+    """The EmailMessage to send for an OutboxEmail row."""
+    kwargs = dict(from_email=email.from_email or None, to=email.to, headers=email.headers, connection=connection)
+    if not email.body:
+        message = EmailMessage(email.subject, email.html_body, **kwargs)
+        message.content_subtype = 'html'
+        return message
+    message = EmailMultiAlternatives(email.subject, email.body, **kwargs)
+    if email.html_body:
+        message.attach_alternative(email.html_body, 'text/html')
+    return message
+
+
+def claim_batch(batch_size, now=None):
+    """
+    Claim up to ``batch_size`` due emails and count the attempt. Rows are
+    locked with ``SKIP LOCKED`` so concurrent workers take other rows, and
+    pushed ``CLAIM_LEASE`` into the future so they are not claimed again
+    while this worker sends them.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        emails = list(
+            OutboxEmail.objects.filter(status='Pending', next_attempt__lte=now)
+            .select_for_update(skip_locked=True)
+            .order_by('next_attempt', 'id')[:batch_size]
+        )
+        OutboxEmail.objects.filter(id__in=[email.id for email in emails]).update(
+            attempts=F('attempts') + 1, next_attempt=now + CLAIM_LEASE
+        )
+    for email in emails:
+        email.attempts += 1
+    return emails
+
+
+def send_batch(emails, max_attempts=5):
+    """
+    Send ``emails`` over one backend connection and record the outcome.
+    Returns ``(sent, failed)`` counts.
+    """
+    sent, failed = [], []
+    connection = get_connection()
+    try:
+        for email in emails:
+            try:
+                # No-op while the session is up; reconnects after a failure.
+                connection.open()
+                build_message(email, connection).send()
+            except Exception as exc:
+                email.last_error = f'{type(exc).__name__}: {exc}'
+                failed.append(email)
+                # The session may be unusable after an error.
+                connection.close()
+            else:
+                sent.append(email.id)
+    finally:
+        connection.close()
+
+    now = timezone.now()
+    OutboxEmail.objects.filter(id__in=sent).update(status='Sent', date_sent=now, last_error='')
+    for email in failed:
+        if email.attempts >= max_attempts:
+            email.status = 'Dead'
+            logger.error('outbox email %s dead after %s attempts: %s', email.id, email.attempts, email.last_error)
+        else:
+            email.next_attempt = now + RETRY_BACKOFF * 2 ** (email.attempts - 1)
+    OutboxEmail.objects.bulk_update(failed, ['status', 'next_attempt', 'last_error'])
+    return len(sent), len(failed)
+
+
+def deliver_outbox(batch_size=100, max_attempts=5, max_batches=None):
+    """Deliver due emails batch by batch until none are left; returns ``(sent, failed)``."""
+    total_sent = total_failed = batches = 0
+    while max_batches is None or batches < max_batches:
+        emails = claim_batch(batch_size)
+        if not emails:
+            break
+        sent, failed = send_batch(emails, max_attempts)
+        total_sent += sent
+        total_failed += failed
+        batches += 1
+    return total_sent, total_failed
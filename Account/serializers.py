@@ -4,10 +4,34 @@ from allauth.account.adapter import get_adapter
 from allauth.account.utils import setup_user_email
 from dj_rest_auth.serializers import UserDetailsSerializer
 from .models import User
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
+from django.db.models import Q
 
-def email_address_exists(email):
-    return User.objects.filter(email=email).exists()
+CONFLICT_MESSAGES = {
+    'email': "A user is already registered with this email address.",
+    'username': "A user with that username already exists.",
+    'phone_number': "This phone number is already in use.",
+}
+
+
+def find_conflicts(email=None, username=None, phone_number=None):
+    """
+    Return ``{field: message}`` for every unique field already taken, using
+    one query over the unique email, username and phone_number indexes.
+    """
+    wanted = {'email': email, 'username': username, 'phone_number': phone_number}
+    wanted = {field: value for field, value in wanted.items() if value}
+    if not wanted:
+        return {}
+    query = Q()
+    for field, value in wanted.items():
+        query |= Q(**{field: value})
+    conflicts = {}
+    for row in User.objects.filter(query).values(*wanted)[:len(wanted)]:
+        for field, value in wanted.items():
+            if row[field] == value:
+                conflicts[field] = CONFLICT_MESSAGES[field]
+    return conflicts
 
 
 class RegisterSerializer(serializers.Serializer):
@@ -20,12 +44,7 @@ class RegisterSerializer(serializers.Serializer):
     password2 = serializers.CharField(required=True, write_only=True)
 
     def validate_email(self, email):
-        email = get_adapter().clean_email(email)
-        if allauth_settings.UNIQUE_EMAIL:
-            if email and email_address_exists(email):
-                raise serializers.ValidationError(
-                    ("A user is already registered with this e-mail address."))
-        return email
+        return get_adapter().clean_email(email)
 
     def validate_password1(self, password):
         return get_adapter().clean_password(password)
@@ -35,12 +54,11 @@ class RegisterSerializer(serializers.Serializer):
             raise serializers.ValidationError(
                 ("The two password fields didn't match."))
 
-        if User.objects.filter(email=data['email']).exists():
-            raise serializers.ValidationError(
-                {"email": "A user is already registered with this email address."})
-        if User.objects.filter(phone_number=data['phone_number']).exists():
-            raise serializers.ValidationError(
-                {"phone_number": "This phone number is already in use."})
+        # A fast pre-check for a friendly error; the unique constraints in
+        # save() remain the authority when two signups race.
+        conflicts = find_conflicts(data.get('email'), data['username'], data['phone_number'])
+        if conflicts:
+            raise serializers.ValidationError(conflicts)
         return data
 
     def get_cleaned_data(self):
@@ -57,25 +75,20 @@ class RegisterSerializer(serializers.Serializer):
         adapter = get_adapter()
         user = adapter.new_user(request)
         self.cleaned_data = self.get_cleaned_data()
-        adapter.save_user(request, user, self)
-        setup_user_email(request, user, [])
+        adapter.save_user(request, user, self, commit=False)
 
-        
-        first_name = self.cleaned_data.get('first_name')
-        last_name = self.cleaned_data.get('last_name')
-        phone_number = self.cleaned_data.get('phone_number')
-
-        user.first_name = first_name
-        user.last_name = last_name
-        user.phone_number = phone_number
+        user.first_name = self.cleaned_data.get('first_name')
+        user.last_name = self.cleaned_data.get('last_name')
+        user.phone_number = self.cleaned_data.get('phone_number')
         
         try:
-            user.save()
-        except IntegrityError as e:
-            if 'unique constraint' in str(e).lower() and 'phone_number' in str(e).lower():
-                raise serializers.ValidationError("This phone number is already in use.")
-            else:
-                raise serializers.ValidationError("Error while saving user.")
+            with transaction.atomic():
+                user.save()
+        except IntegrityError:
+            conflicts = find_conflicts(user.email, user.username, user.phone_number)
+            raise serializers.ValidationError(conflicts or "Error while saving user.")
+
+        setup_user_email(request, user, [])
         return user
 
 class UserDetailsSerializer(UserDetailsSerializer):
@@ -91,3 +104,13 @@ class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'email', 'date_joined','first_name', 'last_name', 'phone_number']
+
+
+class UserQuerySerializer(serializers.Serializer):
+    search = serializers.CharField(required=False, help_text='Prefix of an email, username or phone number.')
+    verified = serializers.BooleanField(required=False, allow_null=True, default=None)
+    is_active = serializers.BooleanField(required=False, allow_null=True, default=None)
+    joined_after = serializers.DateField(required=False)
+    joined_before = serializers.DateField(required=False)
+    dump = serializers.BooleanField(required=False, default=False,
+                                    help_text='Stream every matching user as NDJSON instead of a page.')
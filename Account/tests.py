@@ -1,3 +1,171 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth.hashers import make_password
+from django.core import mail
+from django.core.mail import EmailMessage
+from django.core.mail.backends.locmem import EmailBackend as LocmemBackend
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from Account.models import OutboxEmail, User
+from Account.outbox import deliver_outbox, queue_message
+from Account.urls import urlpatterns
+from Account.views import user_queryset
+from Config.adapters import CustomAccountAdapter
+from Config.benchmark import FAST_HASHERS, EndpointBenchmarkMixin, jwt_client
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class AccountEndpointTests(EndpointBenchmarkMixin, TestCase):
+    covered_prefix = 'Account/'
+    covered_patterns = [str(pattern.pattern) for pattern in urlpatterns]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(email='admin@example.com', username='admin', password='pass')
+        User.objects.filter(pk=cls.admin.pk).update(is_admin=True)
+        password = make_password('pass')
+        User.objects.bulk_create([
+            User(email=f'member{number}@example.com', username=f'member{number}', password=password,
+                 phone_number=f'+234800{number:07d}', verified=number % 3 == 0)
+            for number in range(2000)
+        ])
+        cls.member = User.objects.get(username='member1')
+
+    def test_get_all_users(self):
+        response = self.measure(jwt_client(self.admin), 'get', '/Account/get_all_users/', max_queries=2)
+        self.assertEqual(len(response.json()['data']), 50)
+
+    def test_get_all_users_filtered(self):
+        response = self.measure(jwt_client(self.admin), 'get', '/Account/get_all_users/', max_queries=2,
+                                name='GET Account/get_all_users/ (search)',
+                                data={'search': 'member19', 'verified': 'true'})
+        self.assertTrue(all(row['email'].startswith('member19') for row in response.json()['data']))
+
+    def test_search_is_index_backed(self):
+        # member19, member190..199 and member1900..1999, matched case-insensitively.
+        self.assertEqual(user_queryset(search='Member19').count(), 111)
+        self.assertEqual(user_queryset(search='+23480000001').count(), 100)
+        page = user_queryset(search='Member19').order_by('-date_joined', '-id')[:50]
+        if connection.vendor != 'sqlite':
+            return
+        plan = page.explain()
+        for index in ('user_email_upper_idx', 'user_username_upper_idx', 'sqlite_autoindex_Account_user_3'):
+            self.assertIn(f'SEARCH Account_user USING INDEX {index}', plan)
+        self.assertNotIn('SCAN Account_user', plan)
+
+    def test_get_all_users_dump(self):
+        response = self.measure(jwt_client(self.admin), 'get', '/Account/get_all_users/', max_queries=2,
+                                name='GET Account/get_all_users/ (dump)', data={'dump': 'true'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+
+    def test_get_all_users_requires_admin(self):
+        self.measure(jwt_client(self.member), 'get', '/Account/get_all_users/', max_queries=1, status=401,
+                     name='GET Account/get_all_users/ (not admin)')
+
+
+class FlakyBackend(LocmemBackend):
+    """Refuses every message sent to a ``bounce`` address."""
+
+    def send_messages(self, messages):
+        if any(address.startswith('bounce') for message in messages for address in message.to):
+            raise ConnectionError('connection reset')
+        return super().send_messages(messages)
+
+
+class SessionBackend(LocmemBackend):
+    """Counts sessions opened the way the SMTP backend opens them."""
+    sessions = 0
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.session = None
+
+    def open(self):
+        if self.session is not None:
+            return False
+        self.session = object()
+        SessionBackend.sessions += 1
+        return True
+
+    def close(self):
+        self.session = None
+
+
+class ExplodingAdapter(CustomAccountAdapter):
+    def send_confirmation_mail(self, request, emailconfirmation, signup):
+        super().send_confirmation_mail(request, emailconfirmation, signup)
+        raise RuntimeError('signup failed after the email was queued')
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, ACCOUNT_EMAIL_VERIFICATION='optional')
+class OutboxTests(TestCase):
+    def register(self, username):
+        return APIClient().post('/registration/', format='json', data={
+            'username': username, 'email': f'{username}@example.com', 'first_name': 'New', 'last_name': 'Member',
+            'phone_number': '+2348100000001', 'password1': 'Register-pass-123', 'password2': 'Register-pass-123',
+        })
+
+    def test_signup_queues_confirmation_email(self):
+        response = self.register('newmember')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(mail.outbox, [])
+        email = OutboxEmail.objects.get()
+        self.assertEqual(email.to, ['newmember@example.com'])
+        self.assertIn('/registration/account-confirm-email/', email.body)
+
+        call_command('send_outbox', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].subject, email.subject)
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ('Sent', 1))
+        self.assertIsNotNone(email.date_sent)
+
+    def test_failed_signup_queues_nothing(self):
+        with override_settings(ACCOUNT_ADAPTER='Account.tests.ExplodingAdapter'), self.assertRaises(RuntimeError):
+            self.register('failedmember')
+        self.assertFalse(User.objects.filter(username='failedmember').exists())
+        self.assertFalse(OutboxEmail.objects.exists())
+
+    def test_html_alternative_round_trips(self):
+        message = EmailMessage('Subject', '<p>Hi</p>', 'from@example.com', ['to@example.com'])
+        message.content_subtype = 'html'
+        queue_message(message)
+        deliver_outbox()
+        self.assertEqual(mail.outbox[0].content_subtype, 'html')
+        self.assertEqual(mail.outbox[0].body, '<p>Hi</p>')
+
+    @override_settings(EMAIL_BACKEND='Account.tests.SessionBackend')
+    def test_batch_shares_one_connection(self):
+        SessionBackend.sessions = 0
+        for number in range(25):
+            queue_message(EmailMessage('Subject', 'Body', to=[f'member{number}@example.com']))
+        self.assertEqual(deliver_outbox(batch_size=10), (25, 0))
+        self.assertEqual(len(mail.outbox), 25)
+        self.assertEqual(SessionBackend.sessions, 3)
+        self.assertEqual(OutboxEmail.objects.filter(status='Sent').count(), 25)
+
+    @override_settings(EMAIL_BACKEND='Account.tests.FlakyBackend')
+    def test_failures_retry_with_backoff_then_dead_letter(self):
+        queue_message(EmailMessage('Subject', 'Body', to=['bounce@example.com']))
+        queue_message(EmailMessage('Subject', 'Body', to=['member@example.com']))
+        self.assertEqual(deliver_outbox(max_attempts=2), (1, 1))
+        email = OutboxEmail.objects.get(status='Pending')
+        self.assertEqual(email.attempts, 1)
+        self.assertIn('ConnectionError', email.last_error)
+        self.assertGreater(email.next_attempt, timezone.now() + timedelta(seconds=50))
+
+        # Not due yet, so nothing is claimed.
+        self.assertEqual(deliver_outbox(max_attempts=2), (0, 0))
+        OutboxEmail.objects.filter(id=email.id).update(next_attempt=timezone.now())
+        self.assertEqual(deliver_outbox(max_attempts=2), (0, 1))
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ('Dead', 2))
+
+        call_command('send_outbox', '--requeue-dead', stdout=StringIO())
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ('Pending', 1))
@@ -2,21 +2,101 @@ from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
-from .serializers import UserSerializer
+from .serializers import UserSerializer, UserQuerySerializer
 from .models import User 
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models import Q
+from django.db.models.functions import Upper
+from django.http import StreamingHttpResponse
+from drf_yasg.utils import swagger_auto_schema
+from dj_rest_auth.registration.views import RegisterView as BaseRegisterView
+from Config.pagination import KeysetPagination
+from Plans.queries import date_range_bounds
+import json
+import string
+import sys
 
+# SQLite's UPPER() only folds ASCII letters.
+SQLITE_UPPER = str.maketrans(string.ascii_lowercase, string.ascii_uppercase)
 
+
+def db_upper(value):
+	"""``value`` as the database's UPPER() would return it."""
+	return value.translate(SQLITE_UPPER) if connection.vendor == 'sqlite' else value.upper()
+
+
+def prefix_match(name, prefix):
+	"""
+	Q for rows whose ``name`` (a field or alias) starts with ``prefix``, in
+	the form an index on it can serve. PostgreSQL turns ``LIKE 'prefix%'``
+	into an index range itself, given a pattern_ops index (migration
+	0006). SQLite never uses an index for LIKE on an expression, so it
+	gets the range: under its binary collation, ``prefix <= x < prefix'``
+	(last character incremented) holds exactly for strings starting with
+	``prefix``.
+	"""
+	last = ord(prefix[-1])
+	if connection.vendor != 'sqlite' or last == sys.maxunicode:
+		return Q(**{f'{name}__startswith': prefix})
+	return Q(**{f'{name}__gte': prefix, f'{name}__lt': prefix[:-1] + chr(last + 1)})
+
+
+def user_queryset(search=None, verified=None, is_active=None, joined_after=None, joined_before=None, **kwargs):
+	users = User.objects.all()
+	if search:
+		# Matched on the indexed expressions themselves, so each branch of
+		# the OR is an index range rather than a scan of the table.
+		term = db_upper(search)
+		users = users.alias(email_upper=Upper('email'), username_upper=Upper('username')).filter(
+			prefix_match('email_upper', term) |
+			prefix_match('username_upper', term) |
+			prefix_match('phone_number', search)
+		)
+	if verified is not None:
+		users = users.filter(verified=verified)
+	if is_active is not None:
+		users = users.filter(is_active=is_active)
+	if joined_after is not None:
+		users = users.filter(date_joined__gte=date_range_bounds(joined_after, joined_after)[0])
+	if joined_before is not None:
+		users = users.filter(date_joined__lt=date_range_bounds(joined_before, joined_before)[1])
+	return users
+
+
+@swagger_auto_schema(methods=['GET'], query_serializer=UserQuerySerializer)
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 
 def get_all_users(request):
 	user = request.user
-	xyz = User.objects.all()
 	if user.is_admin == False:
 		return Response({'message':'unauthorized'}, status=status.HTTP_401_UNAUTHORIZED)
 
-	serializer = UserSerializer(xyz, many=True)
-	data = {'message': 'success',
-			'data': serializer.data}
+	query = UserQuerySerializer(data=request.query_params)
+	query.is_valid(raise_exception=True)
+	users = user_queryset(**query.validated_data)
+
+	if query.validated_data['dump']:
+		rows = users.order_by('id').values(*UserSerializer.Meta.fields).iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+		content = (json.dumps(row, cls=DjangoJSONEncoder) + '\n' for row in rows)
+		response = StreamingHttpResponse(content, content_type='application/x-ndjson')
+		response['Content-Disposition'] = 'attachment; filename="users.ndjson"'
+		return response
+
+	paginator = KeysetPagination(ordering='-date_joined')
+	page = paginator.paginate_queryset(users.only(*UserSerializer.Meta.fields), request)
+	serializer = UserSerializer(page, many=True)
+	return paginator.get_paginated_response(serializer.data)
+
+
+class RegisterView(BaseRegisterView):
+	"""
+	dj_rest_auth's signup in one transaction, so the user, their email
+	address and the queued confirmation email are saved together or not at all.
+	"""
 
-	return Response(data, status=status.HTTP_200_OK)
+	@transaction.atomic
+	def perform_create(self, serializer):
+		return super().perform_create(serializer)
@@ -1,11 +1,27 @@
 from allauth.account.adapter import DefaultAccountAdapter
+from allauth.core import context as allauth_context
 from django.contrib.sites.shortcuts import get_current_site
 from django.urls import reverse
 
 from django.core.mail import EmailMessage
 from django.template.loader import render_to_string
 
+from Account.outbox import queue_message
+
 class CustomAccountAdapter(DefaultAccountAdapter):
+    """
+    Emails are written to the outbox in the current transaction rather than
+    sent during the request; the send_outbox command delivers them.
+    """
+
+    def send_mail(self, template_prefix, email, context):
+        ctx = {
+            "email": email,
+            "current_site": get_current_site(allauth_context.request),
+        }
+        ctx.update(context)
+        queue_message(self.render_mail(template_prefix, email, ctx))
+
     def send_confirmation_mail(self, request, emailconfirmation, signup):
         current_site = get_current_site(request)
         activate_url = reverse(
@@ -19,10 +35,9 @@ class CustomAccountAdapter(DefaultAccountAdapter):
             "site_name": current_site.name,
             "site_domain": current_site.domain,
         }
-        subject = render_to_string("templates/account/email_subject.txt", ctx)
+        subject = render_to_string("templates/email_subject.txt", ctx)
         subject = subject.strip()
-        email_body = render_to_string("templates/account/email_message.txt", ctx)
+        email_body = render_to_string("templates/email_message.txt", ctx)
 
         msg = EmailMessage(subject, email_body, to=[emailconfirmation.email_address.email])
-        msg.send()
-
+        queue_message(msg)
@@ -14,3 +14,7 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Config.settings')
 
 application = get_asgi_application()
+
+from Config.metrics import check_deployment
+
+check_deployment()
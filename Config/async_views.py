@@ -0,0 +1,123 @@
+"""
+Plumbing for the native async views (``<app>/async_views.py``).
+
+DRF's views and authentication classes are synchronous, so the async
+endpoints are plain Django coroutine views wrapped in ``async_api_view``,
+which authenticates with the same JWT cookie/header as the DRF views,
+parses the JSON body, applies the token-bucket throttles and keeps DRF's
+error shapes. The routes also work under WSGI, where Django runs each
+call on an event loop of its own; the provider clients opened on that
+loop are closed when the view returns.
+"""
+import json
+from functools import wraps
+
+from dj_rest_auth.app_settings import api_settings as auth_settings
+from dj_rest_auth.jwt_auth import JWTCookieAuthentication
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import APIException, AuthenticationFailed, NotAuthenticated, Throttled
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from Config.providers import close_async_providers
+from Config.throttling import acheck_throttle
+
+
+class AsyncJWTCookieAuthentication(JWTCookieAuthentication):
+    """
+    ``JWTCookieAuthentication`` with the user lookup on the async ORM.
+    Token parsing and validation are CPU-only and reused as they are.
+    """
+
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            if not auth_settings.JWT_AUTH_COOKIE:
+                return None
+            raw_token = request.COOKIES.get(auth_settings.JWT_AUTH_COOKIE)
+            if auth_settings.JWT_AUTH_COOKIE_ENFORCE_CSRF_ON_UNAUTHENTICATED:
+                self.enforce_csrf(request)
+            elif raw_token is not None and auth_settings.JWT_AUTH_COOKIE_USE_CSRF:
+                self.enforce_csrf(request)
+        else:
+            raw_token = self.get_raw_token(header)
+
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        try:
+            user_id = validated_token[jwt_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken('Token contained no recognizable user identification')
+
+        try:
+            user = await self.user_model.objects.aget(**{jwt_settings.USER_ID_FIELD: user_id})
+        except self.user_model.DoesNotExist:
+            raise AuthenticationFailed('User not found', code='user_not_found')
+
+        if jwt_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+
+        if jwt_settings.CHECK_REVOKE_TOKEN and \
+                validated_token.get(jwt_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed("The user's password has been changed.", code='password_changed')
+
+        return user
+
+
+def error_response(exc):
+    detail = exc.detail if isinstance(exc.detail, (dict, list)) else {'detail': exc.detail}
+    response = JsonResponse(detail, status=exc.status_code, safe=False)
+    if getattr(exc, 'wait', None):
+        response['Retry-After'] = str(exc.wait)
+    return response
+
+
+def async_api_view(methods, authenticated=True, throttle_scope=None):
+    """
+    Async counterpart of ``@api_view`` + ``@permission_classes`` (+
+    ``@throttle_classes`` with ``throttle_scope``).
+
+    Sets ``request.user``/``request.auth`` when ``authenticated`` and
+    ``request.data`` from the JSON body. The view returns a JsonResponse.
+    """
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                return JsonResponse({'detail': f'Method "{request.method}" not allowed.'},
+                                    status=status.HTTP_405_METHOD_NOT_ALLOWED)
+            try:
+                if authenticated:
+                    result = await AsyncJWTCookieAuthentication().aauthenticate(request)
+                    if result is None:
+                        raise NotAuthenticated()
+                    request.user, request.auth = result
+                if throttle_scope:
+                    wait = await acheck_throttle(throttle_scope, request.user.pk if authenticated
+                                                 else request.META.get('REMOTE_ADDR'))
+                    if wait:
+                        raise Throttled(wait)
+                try:
+                    request.data = json.loads(request.body) if request.body else {}
+                except (ValueError, UnicodeDecodeError) as exc:
+                    return JsonResponse({'detail': f'JSON parse error - {exc}'},
+                                        status=status.HTTP_400_BAD_REQUEST)
+            except APIException as exc:
+                return error_response(exc)
+            try:
+                return await view(request, *args, **kwargs)
+            finally:
+                if not isinstance(request, ASGIRequest):
+                    await close_async_providers()
+
+        return csrf_exempt(wrapper)
+    return decorator
@@ -0,0 +1,210 @@
+"""
+Query-count and latency regression harness for the endpoint test suites.
+
+``EndpointBenchmarkMixin.measure`` calls an endpoint ``repeat`` times and
+fails when any call runs more SQL than the bound it is given, or when its
+median latency is slower than the recorded baseline by more than
+``PERF_TOLERANCE`` (a fraction) plus ``PERF_SLACK_MS``. Baselines live in
+``perf_baseline.json`` at the project root; run the suite with
+``PERF_BASELINE_UPDATE=1`` to record the endpoints measured by that run.
+"""
+import json
+import os
+import time
+import unittest
+from decimal import Decimal
+from pathlib import Path
+
+import httpx
+import requests
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+BASELINE_PATH = Path(settings.BASE_DIR) / 'perf_baseline.json'
+TOLERANCE = float(os.getenv('PERF_TOLERANCE', 1.0))
+SLACK_MS = float(os.getenv('PERF_SLACK_MS', 5))
+UPDATE_BASELINE = os.getenv('PERF_BASELINE_UPDATE') == '1'
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+# Rates the benchmarks never exhaust, so every measured request still pays
+# for its per-user and global token buckets.
+BENCHMARK_THROTTLE_RATES = {
+    scope: '100000/min' for scope in ('paystack', 'paystack.global', 'youverify', 'youverify.global')
+}
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def load_baseline():
+    try:
+        with open(BASELINE_PATH) as fh:
+            return json.load(fh)
+    except FileNotFoundError:
+        return {}
+
+
+def provider_response(status_code, payload, asynchronous=False):
+    """A real requests/httpx response to return from a mocked provider call."""
+    if asynchronous:
+        return httpx.Response(status_code, json=payload, request=httpx.Request('POST', 'http://provider.test/'))
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = json.dumps(payload).encode()
+    response.url = 'http://provider.test/'
+    return response
+
+
+def jwt_client(user):
+    """An API client that authenticates as ``user`` with a real access token."""
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+    return client
+
+
+def seed_plans(user, plans, transactions_per_plan, prefix):
+    """
+    Bulk-create ``plans`` active plans for ``user``, each with a history of
+    alternating completed deposits and withdrawals a day apart.
+    """
+    from Plans.models import SavingsPlan, Transaction
+    from Plans.plan_ids import allocate_plan_id
+
+    today = timezone.localdate()
+    created = SavingsPlan.objects.bulk_create([
+        SavingsPlan(
+            user=user, name=f'{prefix} plan {number}', plan_id=allocate_plan_id(),
+            frequency='Daily', total_amount=Decimal('10000.00'), set_payout=Decimal('100.00'),
+            remaining_balance=Decimal('10000.00'), number_of_payouts=100, number_of_payouts_left=100,
+            active=True, date_started=today, next_payout_date=today,
+        )
+        for number in range(plans)
+    ])
+    now = timezone.now()
+    Transaction.objects.bulk_create([
+        Transaction(
+            user=user, savings_plan=plan, type='Deposit' if index % 2 == 0 else 'Withdrawal',
+            date_created=now - timezone.timedelta(days=index), completed=index % 5 != 0,
+            amount=Decimal('100.00'), fee=Decimal('0.00'), amount_paid=Decimal('100.00'),
+            transaction_reference=f'{prefix}-{plan.plan_id}-{index}',
+        )
+        for plan in created for index in range(transactions_per_plan)
+    ], batch_size=1000)
+    return created
+
+
+def create_throttle_buckets(*users):
+    """
+    Create the token buckets of ``users`` and the global ones, so measured
+    requests pay the steady-state throttle cost rather than the insert of
+    a user's first request.
+    """
+    from Account.models import ThrottleBucket
+    from Config.throttling import buckets_for
+
+    keys = {key for scope in ('paystack', 'youverify') for user in users
+            for key, *_ in buckets_for(scope, user.pk)}
+    ThrottleBucket.objects.bulk_create([ThrottleBucket(key=key) for key in keys], ignore_conflicts=True)
+
+
+class EndpointBenchmarkMixin:
+    """
+    Mixin for TestCase classes that exercise endpoints through ``measure``.
+
+    ``covered_prefix`` and ``covered_patterns`` name the URL patterns the
+    class must exercise; once every test in the class has run, the class
+    fails if one of them was never measured. A pattern counts as covered
+    when a measured route equals it or, for included URLconfs (patterns
+    ending in ``/`` passed as ``include_prefixes``), starts with it.
+    """
+    repeat = 10
+    covered_prefix = ''
+    covered_patterns = ()
+    include_prefixes = ()
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.baseline = load_baseline()
+        cls.results = {}
+        cls.routes = set()
+        cls.tests_run = 0
+
+    @classmethod
+    def tearDownClass(cls):
+        try:
+            if UPDATE_BASELINE and cls.results:
+                baseline = load_baseline()
+                baseline.update(cls.results)
+                with open(BASELINE_PATH, 'w') as fh:
+                    json.dump(dict(sorted(baseline.items())), fh, indent=2)
+                    fh.write('\n')
+            if cls.tests_run == len(unittest.TestLoader().getTestCaseNames(cls)):
+                cls.check_coverage()
+        finally:
+            super().tearDownClass()
+
+    @classmethod
+    def check_coverage(cls):
+        missing = []
+        for pattern in cls.covered_patterns:
+            route = cls.covered_prefix + pattern
+            if pattern in cls.include_prefixes:
+                covered = any(hit.startswith(route) for hit in cls.routes)
+            else:
+                covered = route in cls.routes
+            if not covered:
+                missing.append(route)
+        if missing:
+            raise AssertionError(f'{cls.__name__} never measured: {", ".join(missing)}')
+
+    def setUp(self):
+        super().setUp()
+        type(self).tests_run += 1
+
+    def measure(self, client, method, path, max_queries, status=200, name=None, repeat=None, **kwargs):
+        """
+        Call ``client.<method>(path, **kwargs)`` ``repeat`` times and return
+        the last response. Keyword values that are callables are called
+        with the iteration number, for requests that must differ per call.
+        """
+        latencies = []
+        most_queries = 0
+        response = None
+        for iteration in range(repeat or self.repeat):
+            call_kwargs = {key: value(iteration) if callable(value) else value for key, value in kwargs.items()}
+            queries = []
+            with connection.execute_wrapper(lambda execute, sql, *args: queries.append(sql) or execute(sql, *args)):
+                started = time.perf_counter()
+                response = getattr(client, method)(path, HTTP_HOST='localhost', **call_kwargs)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                latencies.append((time.perf_counter() - started) * 1000)
+            self.assertEqual(response.status_code, status, getattr(response, 'content', b'')[:500])
+            self.assertLessEqual(
+                len(queries), max_queries,
+                f'{method.upper()} {path} ran {len(queries)} queries (bound {max_queries}):\n' + '\n'.join(queries),
+            )
+            most_queries = max(most_queries, len(queries))
+
+        type(self).routes.add(response.resolver_match.route)
+        name = name or f'{method.upper()} {response.resolver_match.route}'
+        result = {
+            'p50_ms': round(percentile(latencies, 0.5), 3),
+            'p95_ms': round(percentile(latencies, 0.95), 3),
+            'queries': most_queries,
+        }
+        self.results[name] = result
+
+        baseline = self.baseline.get(name)
+        if baseline and not UPDATE_BASELINE:
+            limit = baseline['p50_ms'] * (1 + TOLERANCE) + SLACK_MS
+            self.assertLessEqual(
+                result['p50_ms'], limit,
+                f'{name} median {result["p50_ms"]}ms regressed past {limit:.1f}ms (baseline {baseline["p50_ms"]}ms)',
+            )
+        return response
@@ -0,0 +1,327 @@
+"""
+Per-route request metrics and the Prometheus ``/metrics`` endpoint.
+
+``metrics_middleware`` times every request and attributes to its resolved
+route the SQL it ran (through a database execute wrapper) and the time it
+spent waiting on providers (reported by ``Config.providers``). Counters
+live in process memory; with ``METRICS_DIR`` set each process also dumps
+them to ``<METRICS_DIR>/<pid>.json`` every ``METRICS_FLUSH_INTERVAL``
+seconds, and ``/metrics`` sums every file so all gunicorn workers are
+reported together. Clear ``METRICS_DIR`` when deploying, as with
+prometheus_client's multiprocess mode. With DEBUG off the server refuses
+to start without ``METRICS_DIR`` and ``METRICS_TOKEN`` (see
+``check_deployment``), so the metrics are neither per-worker nor public.
+"""
+import atexit
+import contextvars
+import glob
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.core.exceptions import ImproperlyConfigured
+from django.dispatch import receiver
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+UNMATCHED_ROUTE = '<unmatched>'
+
+_request = contextvars.ContextVar('request_metrics', default=None)
+
+
+class RequestTimer:
+    """SQL and provider time accumulated by the request being served."""
+    __slots__ = ('queries', 'sql_seconds', 'provider_seconds')
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.provider_seconds = 0.0
+
+
+def add_provider_time(seconds):
+    timer = _request.get()
+    if timer is not None:
+        timer.provider_seconds += seconds
+
+
+def sql_timer(execute, sql, params, many, context):
+    timer = _request.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timer.queries += 1
+        timer.sql_seconds += time.perf_counter() - started
+
+
+@receiver(connection_created)
+def install_sql_timer(sender, connection, **kwargs):
+    # Installed on every connection rather than per request so queries run
+    # from sync_to_async threads (async views) are attributed as well.
+    if sql_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.append(sql_timer)
+
+
+def empty_route():
+    return {
+        'count': 0, 'seconds': 0.0, 'buckets': [0] * len(REQUEST_BUCKETS),
+        'queries': 0, 'sql_seconds': 0.0, 'bytes': 0, 'provider_seconds': 0.0,
+        'statuses': {},
+    }
+
+
+class MetricsStore:
+    """This process's counters, keyed by ``"METHOD route"``."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.routes = {}
+        self.last_flush = time.monotonic()
+
+    def record(self, key, elapsed, status, timer, size):
+        index = bisect_left(REQUEST_BUCKETS, elapsed)
+        with self.lock:
+            route = self.routes.get(key)
+            if route is None:
+                route = self.routes[key] = empty_route()
+            route['count'] += 1
+            route['seconds'] += elapsed
+            if index < len(REQUEST_BUCKETS):
+                route['buckets'][index] += 1
+            route['queries'] += timer.queries
+            route['sql_seconds'] += timer.sql_seconds
+            route['provider_seconds'] += timer.provider_seconds
+            route['bytes'] += size
+            status = str(status)
+            route['statuses'][status] = route['statuses'].get(status, 0) + 1
+
+    def add_bytes(self, key, size):
+        with self.lock:
+            self.routes[key]['bytes'] += size
+
+    def snapshot(self):
+        from Config.providers import provider_metrics
+
+        with self.lock:
+            routes = json.loads(json.dumps(self.routes))
+        return {'routes': routes, 'providers': provider_metrics()}
+
+    def maybe_flush(self):
+        if settings.METRICS_DIR and time.monotonic() - self.last_flush >= settings.METRICS_FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        self.last_flush = time.monotonic()
+        if not settings.METRICS_DIR:
+            return
+        os.makedirs(settings.METRICS_DIR, exist_ok=True)
+        path = os.path.join(settings.METRICS_DIR, f'{os.getpid()}.json')
+        with open(f'{path}.tmp', 'w') as fh:
+            json.dump(self.snapshot(), fh, separators=(',', ':'))
+        os.replace(f'{path}.tmp', path)
+
+
+store = MetricsStore()
+atexit.register(store.flush)
+
+
+def route_key(request):
+    match = request.resolver_match
+    route = f'/{match.route}' if match is not None else UNMATCHED_ROUTE
+    return f'{request.method} {route}'
+
+
+def count_stream(key, chunks):
+    size = 0
+    try:
+        for chunk in chunks:
+            size += len(chunk)
+            yield chunk
+    finally:
+        store.add_bytes(key, size)
+
+
+async def acount_stream(key, chunks):
+    size = 0
+    try:
+        async for chunk in chunks:
+            size += len(chunk)
+            yield chunk
+    finally:
+        store.add_bytes(key, size)
+
+
+def finish(request, response, started, timer, token):
+    elapsed = time.perf_counter() - started
+    _request.reset(token)
+    key = route_key(request)
+    if response.streaming:
+        # Bytes are added when the stream has been sent.
+        size = 0
+        wrap = acount_stream if response.is_async else count_stream
+        response.streaming_content = wrap(key, response.streaming_content)
+    else:
+        size = len(response.content)
+    store.record(key, elapsed, response.status_code, timer, size)
+    store.maybe_flush()
+    return response
+
+
+def metrics_middleware(get_response):
+    """
+    Record latency, SQL, response size and provider time per route.
+    Keep it first in MIDDLEWARE so the timing covers the whole stack.
+    """
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            timer = RequestTimer()
+            token = _request.set(timer)
+            started = time.perf_counter()
+            response = await get_response(request)
+            return finish(request, response, started, timer, token)
+
+        markcoroutinefunction(middleware)
+    else:
+        def middleware(request):
+            timer = RequestTimer()
+            token = _request.set(timer)
+            started = time.perf_counter()
+            response = get_response(request)
+            return finish(request, response, started, timer, token)
+
+    return middleware
+
+
+metrics_middleware.sync_capable = True
+metrics_middleware.async_capable = True
+
+
+def collect():
+    """Sum the counters of every process (this one read live)."""
+    snapshots = [store.snapshot()]
+    if settings.METRICS_DIR:
+        own = os.path.join(settings.METRICS_DIR, f'{os.getpid()}.json')
+        for path in glob.glob(os.path.join(settings.METRICS_DIR, '*.json')):
+            if path == own:
+                continue
+            try:
+                with open(path) as fh:
+                    snapshots.append(json.load(fh))
+            except (OSError, ValueError):
+                continue
+
+    routes, providers = {}, {}
+    for snapshot in snapshots:
+        for key, values in snapshot['routes'].items():
+            total = routes.setdefault(key, empty_route())
+            for field in ('count', 'seconds', 'queries', 'sql_seconds', 'bytes', 'provider_seconds'):
+                total[field] += values[field]
+            total['buckets'] = [a + b for a, b in zip(total['buckets'], values['buckets'])]
+            for status, count in values['statuses'].items():
+                total['statuses'][status] = total['statuses'].get(status, 0) + count
+        for name, values in snapshot['providers'].items():
+            total = providers.setdefault(name, {
+                'calls': 0, 'errors': 0, 'retries': 0, 'seconds': 0.0,
+                'rejections': {}, 'open': 0, 'opened': 0,
+            })
+            for field in ('calls', 'errors', 'retries', 'seconds'):
+                total[field] += values[field]
+            for reason, count in values['rejections'].items():
+                total['rejections'][reason] = total['rejections'].get(reason, 0) + count
+            total['open'] += values['breaker']['state'] != 'closed'
+            total['opened'] += values['breaker']['opened']
+    return routes, providers
+
+
+def label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render(routes, providers):
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for suffix, labels, value in samples:
+            text = ','.join(f'{k}="{label(v)}"' for k, v in labels.items())
+            lines.append(f'{name}{suffix}{{{text}}} {value}')
+
+    def split(key):
+        method, route = key.split(' ', 1)
+        return {'method': method, 'route': route}
+
+    histogram = []
+    for key, values in sorted(routes.items()):
+        labels = split(key)
+        cumulative = 0
+        for bound, count in zip(REQUEST_BUCKETS, values['buckets']):
+            cumulative += count
+            histogram.append(('_bucket', {**labels, 'le': bound}, cumulative))
+        histogram.append(('_bucket', {**labels, 'le': '+Inf'}, values['count']))
+        histogram.append(('_sum', labels, values['seconds']))
+        histogram.append(('_count', labels, values['count']))
+    metric('ajo_http_request_duration_seconds', 'histogram', 'Request latency by route.', histogram)
+    metric('ajo_http_responses_total', 'counter', 'Responses by route and status code.', [
+        ('', {**split(key), 'status': status}, count)
+        for key, values in sorted(routes.items()) for status, count in sorted(values['statuses'].items())
+    ])
+    for field, name, help_text in (
+        ('queries', 'ajo_http_sql_queries_total', 'SQL queries run by requests to the route.'),
+        ('sql_seconds', 'ajo_http_sql_seconds_total', 'Time spent in SQL by requests to the route.'),
+        ('bytes', 'ajo_http_response_bytes_total', 'Response body bytes sent by the route.'),
+        ('provider_seconds', 'ajo_http_provider_seconds_total', 'Time spent waiting on providers by the route.'),
+    ):
+        metric(name, 'counter', help_text, [('', split(key), values[field]) for key, values in sorted(routes.items())])
+
+    for field, name, help_text in (
+        ('calls', 'ajo_provider_calls_total', 'Outbound provider HTTP attempts.'),
+        ('errors', 'ajo_provider_errors_total', 'Provider attempts that failed or returned 5xx.'),
+        ('retries', 'ajo_provider_retries_total', 'Provider attempts that were retried.'),
+        ('seconds', 'ajo_provider_seconds_total', 'Time spent in provider calls.'),
+        ('opened', 'ajo_provider_breaker_opened_total', 'Times the circuit breaker opened.'),
+    ):
+        metric(name, 'counter', help_text,
+               [('', {'provider': provider}, values[field]) for provider, values in sorted(providers.items())])
+    metric('ajo_provider_breaker_open', 'gauge', 'Processes whose breaker for the provider is not closed.',
+           [('', {'provider': provider}, values['open']) for provider, values in sorted(providers.items())])
+    metric('ajo_provider_rejections_total', 'counter', 'Calls refused by the breaker or bulkhead.', [
+        ('', {'provider': provider, 'reason': reason}, count)
+        for provider, values in sorted(providers.items()) for reason, count in sorted(values['rejections'].items())
+    ])
+    return '\n'.join(lines) + '\n'
+
+
+def check_deployment():
+    """
+    Called by Config/wsgi.py and Config/asgi.py when a server loads the
+    project, so tests and management commands are not affected.
+    """
+    if settings.DEBUG:
+        return
+    if not settings.METRICS_DIR:
+        raise ImproperlyConfigured('METRICS_DIR must be set when DEBUG is off, or /metrics would only '
+                                   'report the worker process that happens to serve it.')
+    if not settings.METRICS_TOKEN:
+        raise ImproperlyConfigured('METRICS_TOKEN must be set when DEBUG is off, or /metrics would be public.')
+    os.makedirs(settings.METRICS_DIR, exist_ok=True)
+
+
+def metrics_view(request):
+    """Prometheus text exposition of the aggregated metrics."""
+    if settings.METRICS_TOKEN:
+        allowed = constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {settings.METRICS_TOKEN}')
+    else:
+        allowed = settings.DEBUG
+    if not allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(render(*collect()), content_type='text/plain; version=0.0.4; charset=utf-8')
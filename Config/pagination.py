@@ -0,0 +1,113 @@
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework import status
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+# Largest bigint primary key; a larger id in a cursor would overflow the query.
+MAX_ID = 2 ** 63 - 1
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination keyed on ``(ordering field, id)``.
+
+    Each page is fetched with a ``WHERE (field, id) < (value, id)`` style
+    condition instead of an OFFSET, so the cost of a page does not depend on
+    how deep the client has paged. Cursors are opaque base64 tokens.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self, ordering='-date_created', page_size=None):
+        self.descending = ordering.startswith('-')
+        self.field = ordering.lstrip('-')
+        self.default_page_size = page_size or settings.KEYSET_PAGE_SIZE
+        self.max_page_size = settings.KEYSET_MAX_PAGE_SIZE
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.default_page_size
+        if page_size <= 0:
+            return self.default_page_size
+        return min(page_size, self.max_page_size)
+
+    def encode_cursor(self, obj, reverse):
+        value = getattr(obj, self.field)
+        value = value.isoformat() if hasattr(value, 'isoformat') else str(value)
+        payload = json.dumps({'v': value, 'id': obj.pk, 'r': reverse}, separators=(',', ':'))
+        token = base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request, model):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+            value = model._meta.get_field(self.field).to_python(payload['v'])
+            pk = int(payload['id'])
+            if not 0 < pk <= MAX_ID:
+                raise ValueError(pk)
+            return value, pk, bool(payload['r'])
+        except (TypeError, ValueError, KeyError, OverflowError, ValidationError, binascii.Error, UnicodeEncodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def fetch(self, queryset, cursor, descending):
+        """Return up to ``page_size + 1`` rows following ``cursor``, in walk order."""
+        if cursor:
+            value, pk, _ = cursor
+            lookup = 'lt' if descending else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'{self.field}__{lookup}': value}) |
+                Q(**{self.field: value, f'pk__{lookup}': pk})
+            )
+        prefix = '-' if descending else ''
+        queryset = queryset.order_by(f'{prefix}{self.field}', f'{prefix}pk')
+        return list(queryset[:self.page_size + 1])
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = remove_query_param(request.build_absolute_uri(), self.cursor_query_param)
+        self.page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request, queryset.model)
+        reverse = bool(cursor and cursor[2])
+
+        # Walking backwards flips the sort so the LIMIT still applies next
+        # to the cursor; the rows are put back in display order below.
+        descending = self.descending != reverse
+        rows = self.fetch(queryset, cursor, descending)
+        has_more = len(rows) > self.page_size
+        page = rows[:self.page_size]
+
+        self.next_link = None
+        self.previous_link = None
+        if reverse:
+            page.reverse()
+            if page:
+                self.next_link = self.encode_cursor(page[-1], reverse=False)
+                if has_more:
+                    self.previous_link = self.encode_cursor(page[0], reverse=True)
+        elif page:
+            if has_more:
+                self.next_link = self.encode_cursor(page[-1], reverse=False)
+            if cursor:
+                self.previous_link = self.encode_cursor(page[0], reverse=True)
+        return page
+
+    def get_paginated_response(self, data):
+        return Response({
+            'message': 'success',
+            'next': self.next_link,
+            'previous': self.previous_link,
+            'data': data,
+        }, status=status.HTTP_200_OK)
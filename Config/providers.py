@@ -0,0 +1,426 @@
+import asyncio
+import logging
+import random
+import ssl
+import threading
+import time
+import weakref
+from collections import deque
+
+import certifi
+import httpx
+import requests
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from requests.adapters import HTTPAdapter
+
+from Config.metrics import add_provider_time
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'})
+RETRY_STATUSES = frozenset({502, 503, 504})
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+
+class ProviderUnavailable(Exception):
+    """
+    Raised instead of calling a provider whose breaker is open or whose
+    bulkhead is full. ``retry_after`` is a hint in whole seconds.
+    """
+
+    def __init__(self, provider, reason, retry_after):
+        self.provider = provider
+        self.reason = reason
+        self.retry_after = max(1, int(retry_after + 0.999))
+        super().__init__(f'{provider} unavailable ({reason}), retry after {self.retry_after}s')
+
+
+class ProviderMetrics:
+    """Thread-safe call counters and latency histogram for one provider."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.seconds = 0.0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.rejections = {'breaker': 0, 'bulkhead': 0}
+
+    def reject(self, reason):
+        with self.lock:
+            self.rejections[reason] += 1
+
+    def record(self, elapsed, error=False, retry=False):
+        add_provider_time(elapsed)
+        with self.lock:
+            self.calls += 1
+            self.seconds += elapsed
+            self.errors += error
+            self.retries += retry
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if elapsed <= bound:
+                    self.buckets[index] += 1
+                    break
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'calls': self.calls,
+                'errors': self.errors,
+                'retries': self.retries,
+                'seconds': self.seconds,
+                'buckets': dict(zip(LATENCY_BUCKETS, self.buckets)),
+                'rejections': dict(self.rejections),
+            }
+
+
+class CircuitBreaker:
+    """
+    Failure-rate circuit breaker over a sliding time window.
+
+    Closed: calls go through and their outcomes are kept for ``window``
+    seconds. Once at least ``min_calls`` outcomes are in the window and the
+    failure rate reaches ``failure_rate`` the breaker opens. Open: calls are
+    rejected for ``reset_timeout`` seconds. Half-open: up to
+    ``half_open_calls`` probes are let through; one success closes the
+    breaker, one failure opens it again.
+    """
+
+    def __init__(self, name='', failure_rate=0.5, min_calls=10, window=30, reset_timeout=30,
+                 half_open_calls=1):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.reset_timeout = reset_timeout
+        self.half_open_calls = half_open_calls
+        self.lock = threading.Lock()
+        self.state = CLOSED
+        self.outcomes = deque()
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probes = 0
+        self.opened = 0
+
+    def retry_after(self, now=None):
+        now = time.monotonic() if now is None else now
+        return max(0.0, self.opened_at + self.reset_timeout - now)
+
+    def allow(self):
+        """Return True if a call may go out now."""
+        with self.lock:
+            if self.state == OPEN:
+                if self.retry_after() > 0:
+                    return False
+                self.state = HALF_OPEN
+                self.probes = 0
+            if self.state == HALF_OPEN:
+                if self.probes >= self.half_open_calls:
+                    return False
+                self.probes += 1
+            return True
+
+    def record(self, failed):
+        now = time.monotonic()
+        with self.lock:
+            if self.state == HALF_OPEN:
+                if failed:
+                    self._open(now)
+                else:
+                    self.state = CLOSED
+                    self.outcomes.clear()
+                    self.failures = 0
+                    logger.info('%s circuit closed', self.name)
+                return
+            if self.state == OPEN:
+                return
+
+            self.outcomes.append((now, failed))
+            self.failures += failed
+            while self.outcomes and self.outcomes[0][0] < now - self.window:
+                self.failures -= self.outcomes.popleft()[1]
+            if len(self.outcomes) >= self.min_calls and self.failures / len(self.outcomes) >= self.failure_rate:
+                self._open(now)
+
+    def _open(self, now):
+        self.state = OPEN
+        self.opened_at = now
+        self.opened += 1
+        self.outcomes.clear()
+        self.failures = 0
+        logger.warning('%s circuit opened for %ss', self.name, self.reset_timeout)
+
+    def snapshot(self):
+        with self.lock:
+            return {'state': self.state, 'opened': self.opened}
+
+
+class ProviderClient:
+    """
+    Keep-alive HTTP client for one external provider.
+
+    Connections are pooled per provider, every call gets a connect and a
+    read timeout, and failed calls are retried with jittered exponential
+    backoff when it is safe to do so: always for idempotent calls, and for
+    any call that never reached the provider (connect timeout).
+
+    Calls are also isolated per provider: a circuit breaker fails fast while
+    the provider is unhealthy, and a bulkhead caps the calls in flight so a
+    slow provider can only tie up ``max_concurrent`` of the process's
+    threads. Both raise ``ProviderUnavailable`` rather than waiting. Both
+    are per process: the bulkhead only rejects when the process serves
+    requests on several threads, and each process's breaker counts its own
+    failures.
+    """
+
+    def __init__(self, name, base_url, connect_timeout=3.05, read_timeout=10, retries=2,
+                 backoff=0.25, pool_size=10, max_concurrent=None, bulkhead_wait=0,
+                 breaker=None):
+        self.name = name
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.metrics = ProviderMetrics()
+        self.breaker = breaker or CircuitBreaker()
+        self.bulkhead = threading.BoundedSemaphore(max_concurrent or pool_size)
+        self.bulkhead_wait = bulkhead_wait
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def set_max_concurrent(self, max_concurrent):
+        """Resize the bulkhead. Only safe while no call is in flight, e.g. when a worker starts."""
+        self.bulkhead = threading.BoundedSemaphore(max_concurrent)
+
+    def request(self, method, path, idempotent=None, **kwargs):
+        if self.bulkhead_wait:
+            acquired = self.bulkhead.acquire(timeout=self.bulkhead_wait)
+        else:
+            acquired = self.bulkhead.acquire(blocking=False)
+        if not acquired:
+            self.metrics.reject('bulkhead')
+            raise ProviderUnavailable(self.name, 'too many calls in flight', 1)
+        try:
+            if not self.breaker.allow():
+                self.metrics.reject('breaker')
+                raise ProviderUnavailable(self.name, 'circuit open', self.breaker.retry_after())
+            return self._request(method, path, idempotent, **kwargs)
+        finally:
+            self.bulkhead.release()
+
+    def _request(self, method, path, idempotent, **kwargs):
+        method = method.upper()
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+        url = f'{self.base_url}/{path.lstrip("/")}'
+        kwargs.setdefault('timeout', self.timeout)
+
+        for attempt in range(self.retries + 1):
+            last_attempt = attempt == self.retries
+            started = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except requests.exceptions.RequestException as exc:
+                elapsed = time.perf_counter() - started
+                retry = not last_attempt and (
+                    idempotent and isinstance(exc, (requests.exceptions.ConnectionError,
+                                                    requests.exceptions.Timeout))
+                    or isinstance(exc, requests.exceptions.ConnectTimeout)
+                )
+                self.metrics.record(elapsed, error=True, retry=retry)
+                self.breaker.record(failed=True)
+                logger.warning('%s %s %s failed after %.3fs: %s', self.name, method, path, elapsed, exc)
+                if not retry:
+                    raise
+            else:
+                elapsed = time.perf_counter() - started
+                retry = not last_attempt and idempotent and response.status_code in RETRY_STATUSES
+                self.metrics.record(elapsed, error=response.status_code >= 500, retry=retry)
+                self.breaker.record(failed=response.status_code >= 500)
+                logger.info('%s %s %s -> %s in %.3fs', self.name, method, path, response.status_code, elapsed)
+                if not retry:
+                    return response
+            if not self.breaker.allow():
+                # The failures above tripped the breaker; stop retrying.
+                self.metrics.reject('breaker')
+                raise ProviderUnavailable(self.name, 'circuit open', self.breaker.retry_after())
+            time.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+
+_ssl_context = None
+
+
+def shared_ssl_context():
+    # Building an SSL context loads the CA bundle (tens of milliseconds);
+    # async clients are created per event loop, so they share one.
+    global _ssl_context
+    if _ssl_context is None:
+        _ssl_context = ssl.create_default_context(cafile=certifi.where())
+    return _ssl_context
+
+
+class AsyncProviderClient:
+    """
+    ``httpx`` counterpart of ``ProviderClient`` for async views.
+
+    It shares the breaker and metrics of the sync client for the same
+    provider, so both code paths see one health state. Its bulkhead is
+    sized separately (``ASYNC_MAX_CONCURRENT``): an in-flight async call
+    costs a socket, not a worker thread, so it can be much larger.
+    """
+
+    def __init__(self, sync_client, max_concurrent=500):
+        self.name = sync_client.name
+        self.base_url = sync_client.base_url
+        self.retries = sync_client.retries
+        self.backoff = sync_client.backoff
+        self.metrics = sync_client.metrics
+        self.breaker = sync_client.breaker
+        self.bulkhead = asyncio.Semaphore(max_concurrent)
+        connect_timeout, read_timeout = sync_client.timeout
+        self.client = httpx.AsyncClient(
+            verify=shared_ssl_context(),
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=max_concurrent, max_keepalive_connections=max_concurrent),
+        )
+
+    async def request(self, method, path, idempotent=None, **kwargs):
+        # No await between the check and the acquire, so this cannot race.
+        if self.bulkhead.locked():
+            self.metrics.reject('bulkhead')
+            raise ProviderUnavailable(self.name, 'too many calls in flight', 1)
+        async with self.bulkhead:
+            if not self.breaker.allow():
+                self.metrics.reject('breaker')
+                raise ProviderUnavailable(self.name, 'circuit open', self.breaker.retry_after())
+            return await self._request(method, path, idempotent, **kwargs)
+
+    async def _request(self, method, path, idempotent, **kwargs):
+        method = method.upper()
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+        url = f'{self.base_url}/{path.lstrip("/")}'
+        if kwargs.get('headers'):
+            # requests drops None-valued headers, httpx rejects them.
+            kwargs['headers'] = {key: value for key, value in kwargs['headers'].items() if value is not None}
+
+        for attempt in range(self.retries + 1):
+            last_attempt = attempt == self.retries
+            started = time.perf_counter()
+            try:
+                response = await self.client.request(method, url, **kwargs)
+            except httpx.TransportError as exc:
+                elapsed = time.perf_counter() - started
+                retry = not last_attempt and (idempotent or isinstance(exc, httpx.ConnectTimeout))
+                self.metrics.record(elapsed, error=True, retry=retry)
+                self.breaker.record(failed=True)
+                logger.warning('%s %s %s failed after %.3fs: %r', self.name, method, path, elapsed, exc)
+                if not retry:
+                    raise
+            else:
+                elapsed = time.perf_counter() - started
+                retry = not last_attempt and idempotent and response.status_code in RETRY_STATUSES
+                self.metrics.record(elapsed, error=response.status_code >= 500, retry=retry)
+                self.breaker.record(failed=response.status_code >= 500)
+                logger.info('%s %s %s -> %s in %.3fs', self.name, method, path, response.status_code, elapsed)
+                if not retry:
+                    return response
+            if not self.breaker.allow():
+                self.metrics.reject('breaker')
+                raise ProviderUnavailable(self.name, 'circuit open', self.breaker.retry_after())
+            await asyncio.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    async def get(self, path, **kwargs):
+        return await self.request('GET', path, **kwargs)
+
+    async def post(self, path, **kwargs):
+        return await self.request('POST', path, **kwargs)
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_provider(name):
+    """Return the shared client for ``name`` as configured in ``settings.PROVIDERS``."""
+    client = _clients.get(name)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(name)
+            if client is None:
+                config = settings.PROVIDERS[name]
+                client = _clients[name] = ProviderClient(
+                    name,
+                    config['BASE_URL'],
+                    connect_timeout=config.get('CONNECT_TIMEOUT', 3.05),
+                    read_timeout=config.get('READ_TIMEOUT', 10),
+                    retries=config.get('RETRIES', 2),
+                    backoff=config.get('BACKOFF', 0.25),
+                    pool_size=config.get('POOL_SIZE', 10),
+                    max_concurrent=config.get('MAX_CONCURRENT'),
+                    bulkhead_wait=config.get('BULKHEAD_WAIT', 0),
+                    breaker=CircuitBreaker(
+                        name,
+                        failure_rate=config.get('BREAKER_FAILURE_RATE', 0.5),
+                        min_calls=config.get('BREAKER_MIN_CALLS', 10),
+                        window=config.get('BREAKER_WINDOW', 30),
+                        reset_timeout=config.get('BREAKER_RESET_TIMEOUT', 30),
+                    ),
+                )
+    return client
+
+
+# httpx clients and asyncio semaphores belong to the event loop they were
+# first used on, so async clients are kept per loop. A loop that ends with
+# its request (async views served under WSGI) closes them with
+# close_async_providers.
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_provider(name):
+    """Return the async client for ``name`` on the running event loop."""
+    clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+    client = clients.get(name)
+    if client is None:
+        client = clients[name] = AsyncProviderClient(
+            get_provider(name),
+            max_concurrent=settings.PROVIDERS[name].get('ASYNC_MAX_CONCURRENT', 500),
+        )
+    return client
+
+
+async def close_async_providers():
+    """Close the async clients of the running event loop."""
+    for client in _async_clients.pop(asyncio.get_running_loop(), {}).values():
+        await client.aclose()
+
+
+def provider_metrics():
+    return {
+        name: {**client.metrics.snapshot(), 'breaker': client.breaker.snapshot()}
+        for name, client in list(_clients.items())
+    }
+
+
+@receiver(setting_changed)
+def reset_providers(setting, **kwargs):
+    if setting == 'PROVIDERS':
+        with _clients_lock:
+            _clients.clear()
+        _async_clients.clear()
@@ -0,0 +1,142 @@
+"""
+Precomputed OpenAPI schema.
+
+Introspecting every view and serializer takes tens of milliseconds, so the
+schema is built once per code version instead of per request. The
+generate_schema command writes ``openapi-<version>.json`` and ``.yaml`` to
+``SCHEMA_DIR`` at deploy time; each process loads the artifact for its own
+version on first use, or builds the schema itself when there is none, and
+serves the encoded bytes from memory with an ETag and a gzipped copy.
+"""
+import gzip
+import hashlib
+import threading
+from functools import lru_cache, wraps
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+from drf_yasg import openapi
+from drf_yasg.codecs import OpenAPICodecJson, OpenAPICodecYaml
+from drf_yasg.generators import OpenAPISchemaGenerator
+
+API_INFO = openapi.Info(
+    title="AJO API",
+    default_version='v1',
+    description="Test description",
+    terms_of_service="https://www.google.com/policies/terms/",
+    contact=openapi.Contact(email="adewalemaxwell11@gmail.com"),
+    license=openapi.License(name="BSD License"),
+)
+CODECS = {
+    'json': (OpenAPICodecJson, 'application/json'),
+    'yaml': (OpenAPICodecYaml, 'application/yaml'),
+}
+# ``?format=`` values drf_yasg's schema view answers with the schema itself.
+SPEC_FORMATS = {'openapi': 'json', 'json': 'json', 'yaml': 'yaml'}
+
+
+@lru_cache(maxsize=None)
+def code_version():
+    """
+    ``CODE_VERSION`` when the deployment sets it (e.g. the git commit),
+    otherwise a digest of the project's Python sources.
+    """
+    if settings.CODE_VERSION:
+        return settings.CODE_VERSION
+    base_dir = Path(settings.BASE_DIR).resolve()
+    roots = {Path(config.path).resolve() for config in apps.get_app_configs()}
+    roots.add(Path(__file__).resolve().parent)
+    digest = hashlib.sha256()
+    for root in sorted(root for root in roots if root.is_relative_to(base_dir)):
+        for path in sorted(root.rglob('*.py')):
+            digest.update(str(path.relative_to(base_dir)).encode())
+            digest.update(path.read_bytes())
+    return digest.hexdigest()[:12]
+
+
+def artifact_path(fmt, version=None, directory=None):
+    return Path(directory or settings.SCHEMA_DIR) / f'openapi-{version or code_version()}.{fmt}'
+
+
+def build_schema():
+    """
+    Introspect every endpoint. Built without a request, the schema has no
+    ``host``, so clients resolve paths against the host that served it.
+    """
+    return OpenAPISchemaGenerator(API_INFO).get_schema(request=None, public=True)
+
+
+def encode_schema(schema):
+    return {name: codec(validators=[]).encode(schema) for name, (codec, _) in CODECS.items()}
+
+
+class SchemaDocument:
+    """One encoding of the schema, ready to send."""
+    __slots__ = ('body', 'gzipped', 'etag', 'content_type')
+
+    def __init__(self, body, content_type):
+        self.body = body
+        self.gzipped = gzip.compress(body, mtime=0)
+        self.etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        self.content_type = content_type
+
+
+_documents = {}
+_lock = threading.Lock()
+
+
+def schema_document(fmt):
+    """The schema document of this process's code version, loaded once."""
+    version = code_version()
+    documents = _documents.get(version)
+    if documents is None:
+        with _lock:
+            documents = _documents.get(version)
+            if documents is None:
+                try:
+                    encoded = {name: artifact_path(name).read_bytes() for name in CODECS}
+                except OSError:
+                    encoded = encode_schema(build_schema())
+                documents = {name: SchemaDocument(body, CODECS[name][1]) for name, body in encoded.items()}
+                _documents.clear()
+                _documents[version] = documents
+    return documents[fmt]
+
+
+def schema_response(request, fmt):
+    document = schema_document(fmt)
+    if_none_match = parse_etags(request.headers.get('If-None-Match', ''))
+    if document.etag in if_none_match or '*' in if_none_match:
+        response = HttpResponseNotModified()
+    elif 'gzip' in request.headers.get('Accept-Encoding', ''):
+        response = HttpResponse(document.gzipped, content_type=document.content_type)
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = HttpResponse(document.body, content_type=document.content_type)
+    response['ETag'] = document.etag
+    response['Vary'] = 'Accept-Encoding'
+    # Clients may keep the schema but must revalidate, which costs a 304.
+    response['Cache-Control'] = 'public, no-cache'
+    return response
+
+
+def schema_json_view(request):
+    return schema_response(request, 'json')
+
+
+def schema_yaml_view(request):
+    return schema_response(request, 'yaml')
+
+
+def serve_precomputed_spec(view):
+    """Answer drf_yasg UI views' ``?format=openapi`` requests from the precomputed schema."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        fmt = SPEC_FORMATS.get(request.GET.get('format'))
+        if fmt is not None and request.method in ('GET', 'HEAD'):
+            return schema_response(request, fmt)
+        return view(request, *args, **kwargs)
+    return wrapper
@@ -54,11 +54,14 @@ INSTALLED_APPS = [
     'corsheaders',
     'Account',
     'Plans',
+    'Payment',
+    'Verification',
     'storages',
     'rest_framework_simplejwt.token_blacklist',
 ]
 
 MIDDLEWARE = [
+    'Config.metrics.metrics_middleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -107,6 +110,15 @@ import dj_database_url
 db_from_env = dj_database_url.config(conn_max_age=600)
 DATABASES['default'].update(db_from_env)
 
+CACHES = {
+    'default': {
+        # Use django.core.cache.backends.filebased.FileBasedCache with a
+        # directory LOCATION to share the cache between gunicorn workers.
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'ajo'),
+    }
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -189,6 +201,17 @@ REST_FRAMEWORK = {
     ]
 }
 
+KEYSET_PAGE_SIZE = int(os.getenv('KEYSET_PAGE_SIZE', 50))
+KEYSET_MAX_PAGE_SIZE = int(os.getenv('KEYSET_MAX_PAGE_SIZE', 500))
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', 2000))
+PLAN_ID_BLOCK_SIZE = int(os.getenv('PLAN_ID_BLOCK_SIZE', 100))
+PLANS_CACHE_TIMEOUT = int(os.getenv('PLANS_CACHE_TIMEOUT', 300))
+# Completed transactions older than this many days are moved to the archive
+# table by archive_transactions. Requests for ranges starting after the
+# horizon never read the archive, so only ever lower it: raising it would
+# hide archived rows newer than the new horizon from those requests.
+TRANSACTION_ARCHIVE_AFTER_DAYS = int(os.getenv('TRANSACTION_ARCHIVE_AFTER_DAYS', 730))
+
 CORS_ALLOWED_ORIGINS = [
     'http://localhost:3000',
     'http://localhost:3001',
@@ -235,11 +258,86 @@ SIMPLE_JWT = {
 ACCOUNT_ADAPTER = 'Config.adapters.CustomAccountAdapter'
 
 
+# Outbound HTTP clients (Config/providers.py). MAX_CONCURRENT is the bulkhead
+# size (ASYNC_MAX_CONCURRENT for the async views); the breaker opens when BREAKER_FAILURE_RATE of at least
+# BREAKER_MIN_CALLS calls in the last BREAKER_WINDOW seconds failed, and
+# stays open for BREAKER_RESET_TIMEOUT seconds.
+#
+# Bulkheads and breakers are per worker process. A process only has as many
+# calls in flight as it has threads, so MAX_CONCURRENT defaults to half of
+# WORKER_THREADS (set it to gunicorn's --threads): one slow provider can then
+# hold at most half of a worker's threads. With sync workers (one thread) it
+# never rejects and the read timeout is what bounds a stuck call. The whole
+# deployment has at most workers x MAX_CONCURRENT calls in flight, and each
+# worker opens its breaker after seeing BREAKER_MIN_CALLS calls itself.
+WORKER_THREADS = int(os.getenv('WORKER_THREADS', 1))
+PROVIDERS = {
+    'paystack': {
+        'BASE_URL': os.getenv('PAYSTACK_BASE_URL', 'https://api.paystack.co'),
+        'CONNECT_TIMEOUT': float(os.getenv('PAYSTACK_CONNECT_TIMEOUT', 3.05)),
+        'READ_TIMEOUT': float(os.getenv('PAYSTACK_READ_TIMEOUT', 10)),
+        'RETRIES': int(os.getenv('PAYSTACK_RETRIES', 2)),
+        'POOL_SIZE': int(os.getenv('PAYSTACK_POOL_SIZE', 20)),
+        'MAX_CONCURRENT': int(os.getenv('PAYSTACK_MAX_CONCURRENT', max(1, WORKER_THREADS // 2))),
+        'ASYNC_MAX_CONCURRENT': int(os.getenv('PAYSTACK_ASYNC_MAX_CONCURRENT', 500)),
+        'BREAKER_FAILURE_RATE': float(os.getenv('PAYSTACK_BREAKER_FAILURE_RATE', 0.5)),
+        'BREAKER_MIN_CALLS': int(os.getenv('PAYSTACK_BREAKER_MIN_CALLS', 10)),
+        'BREAKER_WINDOW': float(os.getenv('PAYSTACK_BREAKER_WINDOW', 30)),
+        'BREAKER_RESET_TIMEOUT': float(os.getenv('PAYSTACK_BREAKER_RESET_TIMEOUT', 30)),
+    },
+    'youverify': {
+        'BASE_URL': os.getenv('YOUVERIFY_BASE_URL', 'https://api.sandbox.youverify.co'),
+        'CONNECT_TIMEOUT': float(os.getenv('YOUVERIFY_CONNECT_TIMEOUT', 3.05)),
+        'READ_TIMEOUT': float(os.getenv('YOUVERIFY_READ_TIMEOUT', 15)),
+        'RETRIES': int(os.getenv('YOUVERIFY_RETRIES', 2)),
+        'POOL_SIZE': int(os.getenv('YOUVERIFY_POOL_SIZE', 20)),
+        'MAX_CONCURRENT': int(os.getenv('YOUVERIFY_MAX_CONCURRENT', max(1, WORKER_THREADS // 2))),
+        'ASYNC_MAX_CONCURRENT': int(os.getenv('YOUVERIFY_ASYNC_MAX_CONCURRENT', 500)),
+        'BREAKER_FAILURE_RATE': float(os.getenv('YOUVERIFY_BREAKER_FAILURE_RATE', 0.5)),
+        'BREAKER_MIN_CALLS': int(os.getenv('YOUVERIFY_BREAKER_MIN_CALLS', 10)),
+        'BREAKER_WINDOW': float(os.getenv('YOUVERIFY_BREAKER_WINDOW', 30)),
+        'BREAKER_RESET_TIMEOUT': float(os.getenv('YOUVERIFY_BREAKER_RESET_TIMEOUT', 30)),
+    },
+}
+
+# 'sync' applies Paystack events inside the webhook request, 'queue' only
+# stores them for the process_webhooks command.
+PAYSTACK_WEBHOOK_MODE = os.getenv('PAYSTACK_WEBHOOK_MODE', 'sync')
+
+# Request metrics (Config/metrics.py). METRICS_DIR is a directory shared by
+# the worker processes, so /metrics sums all of them, and METRICS_TOKEN the
+# bearer token /metrics requires. Both must be set when DEBUG is off.
+METRICS_DIR = os.getenv('METRICS_DIR')
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 5))
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+# Token-bucket throttles of the provider-backed endpoints (Config/throttling.py)
+# as 'N/period': each user may burst N calls, refilled evenly over the period,
+# and '<scope>.global' is one bucket shared by all users. Buckets are rows of
+# Account.ThrottleBucket, so every worker shares them through the database.
+THROTTLE_RATES = {
+    'paystack': os.getenv('PAYSTACK_USER_THROTTLE', '10/min'),
+    'paystack.global': os.getenv('PAYSTACK_GLOBAL_THROTTLE', '600/min'),
+    'youverify': os.getenv('YOUVERIFY_USER_THROTTLE', '5/min'),
+    'youverify.global': os.getenv('YOUVERIFY_GLOBAL_THROTTLE', '300/min'),
+}
+
+VERIFICATION_WORKERS = int(os.getenv('VERIFICATION_WORKERS', 8))
+VERIFICATION_LONG_POLL_MAX = float(os.getenv('VERIFICATION_LONG_POLL_MAX', 20))
+VERIFICATION_POLL_INTERVAL = float(os.getenv('VERIFICATION_POLL_INTERVAL', 0.5))
+
 
 
 
 
+
+# Precomputed OpenAPI schema (Config/schema.py). Set CODE_VERSION to the
+# deployed commit to skip hashing the sources at startup.
+CODE_VERSION = os.getenv('CODE_VERSION')
+SCHEMA_DIR = os.getenv('SCHEMA_DIR', BASE_DIR / 'schema')
+
 SWAGGER_SETTINGS = {
+    'SPEC_URL': 'openapi-json',
     'PERSIST_AUTH': True,  
     'USE_SESSION_AUTH': False, 
     'SECURITY_DEFINITIONS': {
@@ -251,3 +349,7 @@ SWAGGER_SETTINGS = {
         }
     },
 }
+
+REDOC_SETTINGS = {
+    'SPEC_URL': 'openapi-json',
+}
@@ -0,0 +1,387 @@
+import gzip
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import requests
+from allauth.account.forms import default_token_generator
+from allauth.account.utils import user_pk_to_url_str
+from django.core.exceptions import ImproperlyConfigured
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from Account.models import ThrottleBucket, User
+from Config.benchmark import FAST_HASHERS, EndpointBenchmarkMixin, jwt_client, provider_response, seed_plans
+from Config.metrics import check_deployment
+from Config.providers import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, ProviderClient, ProviderUnavailable
+from Config.throttling import check_throttle, parse_rate
+from Config.urls import urlpatterns
+
+APP_PREFIXES = ('Account/', 'Verification/', 'Plans/', 'Payment/')
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, ACCOUNT_EMAIL_VERIFICATION='none')
+class ProjectEndpointTests(EndpointBenchmarkMixin, TestCase):
+    """
+    The project-level routes in Config/urls.py; each app's own routes are
+    covered by the suite in its tests.py.
+    """
+    covered_patterns = [str(p.pattern) for p in urlpatterns if str(p.pattern) not in APP_PREFIXES]
+    include_prefixes = ('admin/', 'auth/', 'registration/')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='member@example.com', username='member', password='pass')
+        cls.superuser = User.objects.create_superuser(email='root@example.com', username='root', password='pass')
+        seed_plans(cls.user, plans=20, transactions_per_plan=100, prefix='member')
+
+    def test_admin_index(self):
+        client = Client()
+        client.force_login(self.superuser)
+        self.measure(client, 'get', '/admin/', max_queries=3)
+
+    def test_admin_transaction_changelist(self):
+        client = Client()
+        client.force_login(self.superuser)
+        self.measure(client, 'get', '/admin/Plans/transaction/', max_queries=5, name='GET admin/ (changelist)')
+
+    def test_swagger_ui(self):
+        self.measure(Client(), 'get', '/', max_queries=0, name='GET / (swagger)')
+
+    def test_openapi_schema(self):
+        self.measure(Client(), 'get', '/', max_queries=0, repeat=3, name='GET / (schema)', data={'format': 'openapi'})
+
+    def test_openapi_json(self):
+        response = self.measure(Client(), 'get', '/openapi.json', max_queries=0, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(response.content))['info']['title'], 'AJO API')
+        self.measure(Client(), 'get', '/openapi.json', max_queries=0, status=304, name='GET openapi.json (etag)',
+                     HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_openapi_yaml(self):
+        response = self.measure(Client(), 'get', '/openapi.yaml', max_queries=0)
+        self.assertTrue(response.content.startswith(b"swagger: '2.0'"))
+
+    def test_redoc(self):
+        self.measure(Client(), 'get', '/redoc/', max_queries=0)
+
+    def test_login(self):
+        self.measure(APIClient(), 'post', '/auth/login/', max_queries=10, format='json',
+                     data={'username': self.user.username, 'password': 'pass'})
+
+    def test_user_details(self):
+        self.measure(jwt_client(self.user), 'get', '/auth/user/', max_queries=1)
+
+    def test_token_refresh(self):
+        self.measure(APIClient(), 'post', '/auth/token/refresh/', max_queries=13, format='json',
+                     data=lambda i: {'refresh': str(RefreshToken.for_user(self.user))})
+
+    def test_password_change(self):
+        self.measure(jwt_client(self.user), 'post', '/auth/password/change/', max_queries=12, format='json',
+                     data={'new_password1': 'Another-pass-123', 'new_password2': 'Another-pass-123'})
+
+    def test_password_reset(self):
+        self.measure(APIClient(), 'post', '/auth/password/reset/', max_queries=9, format='json',
+                     data={'email': self.user.email})
+
+    def test_password_reset_confirm(self):
+        uid = user_pk_to_url_str(self.user)
+        token = default_token_generator.make_token(self.user)
+        self.measure(APIClient(), 'post', f'/auth/password/reset/confirm/{uid}/{token}', max_queries=4,
+                     repeat=1, format='json',
+                     data={'uid': uid, 'token': token, 'new_password1': 'Reset-pass-123',
+                           'new_password2': 'Reset-pass-123'})
+
+    def test_register(self):
+        self.measure(APIClient(), 'post', '/registration/', max_queries=18, status=201, format='json',
+                     data=lambda i: {'username': f'new{i}', 'email': f'new{i}@example.com',
+                                     'first_name': 'New', 'last_name': 'Member', 'phone_number': f'+2348100{i:06d}',
+                                     'password1': 'Register-pass-123', 'password2': 'Register-pass-123'})
+
+    @override_settings(METRICS_TOKEN='scrape-token')
+    def test_metrics(self):
+        response = self.measure(Client(), 'get', '/metrics', max_queries=0, HTTP_AUTHORIZATION='Bearer scrape-token')
+        self.assertIn(b'ajo_http_request_duration_seconds_bucket', response.content)
+
+
+class MetricsAccessTests(SimpleTestCase):
+    def test_token_is_required(self):
+        with self.settings(METRICS_TOKEN='scrape-token'):
+            self.assertEqual(Client().get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        # Without a token /metrics is only open while developing.
+        with self.settings(METRICS_TOKEN=None, DEBUG=False):
+            self.assertEqual(Client().get('/metrics').status_code, 403)
+        with self.settings(METRICS_TOKEN=None, DEBUG=True):
+            self.assertEqual(Client().get('/metrics').status_code, 200)
+
+    def test_deployment_needs_shared_dir_and_token(self):
+        with self.settings(DEBUG=False, METRICS_DIR=None, METRICS_TOKEN='scrape-token'):
+            with self.assertRaisesMessage(ImproperlyConfigured, 'METRICS_DIR'):
+                check_deployment()
+        with self.settings(DEBUG=False, METRICS_DIR='/tmp/ajo-metrics-test', METRICS_TOKEN=None):
+            with self.assertRaisesMessage(ImproperlyConfigured, 'METRICS_TOKEN'):
+                check_deployment()
+        with self.settings(DEBUG=True, METRICS_DIR=None, METRICS_TOKEN=None):
+            check_deployment()
+
+
+@override_settings(THROTTLE_RATES={'provider': '3/min', 'provider.global': '5/min'})
+class ThrottleTests(TestCase):
+    def check_at(self, now, ident):
+        with mock.patch('Config.throttling.time.time', return_value=now):
+            return check_throttle('provider', ident)
+
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate('10/min'), (10, 6.0))
+        self.assertEqual(parse_rate('2/hour'), (2, 1800.0))
+
+    def test_burst_then_refill(self):
+        self.assertEqual([self.check_at(1000, 'a') for _ in range(3)], [0, 0, 0])
+        # Empty: one token comes back every 20 seconds.
+        self.assertAlmostEqual(self.check_at(1000, 'a'), 20)
+        self.assertAlmostEqual(self.check_at(1015, 'a'), 5)
+        self.assertEqual(self.check_at(1020, 'a'), 0)
+        self.assertAlmostEqual(self.check_at(1020, 'a'), 20)
+        # A long idle period refills the bucket to its capacity only.
+        self.assertEqual([self.check_at(5000, 'a') for _ in range(3)], [0, 0, 0])
+        self.assertGreater(self.check_at(5000, 'a'), 0)
+
+    def test_global_bucket_is_shared(self):
+        self.assertEqual([self.check_at(1000, 'a') for _ in range(3)], [0, 0, 0])
+        self.assertEqual([self.check_at(1000, 'b') for _ in range(2)], [0, 0])
+        # b has tokens left but the global bucket is empty.
+        self.assertAlmostEqual(self.check_at(1000, 'b'), 12)
+
+    def test_refused_request_takes_no_tokens(self):
+        self.assertEqual([self.check_at(1000, 'a') for _ in range(3)], [0, 0, 0])
+        for _ in range(10):
+            self.check_at(1000, 'a')
+        # The refusals did not drain the global bucket.
+        self.assertEqual([self.check_at(1000, 'b') for _ in range(2)], [0, 0])
+
+    def test_global_refusal_gives_back_user_token(self):
+        self.assertEqual([self.check_at(1000, 'a') for _ in range(3)], [0, 0, 0])
+        self.assertEqual([self.check_at(1000, 'b') for _ in range(2)], [0, 0])
+        self.assertAlmostEqual(self.check_at(1000, 'b'), 12)
+        # Had the refused request kept b's third token, b would wait 8 more seconds.
+        self.assertEqual(self.check_at(1012, 'b'), 0)
+
+    def test_allowed_request_costs_two_updates(self):
+        self.check_at(1000, 'a')
+        with self.assertNumQueries(2):
+            self.assertEqual(self.check_at(1000, 'a'), 0)
+        self.assertEqual(ThrottleBucket.objects.count(), 2)
+
+    @override_settings(THROTTLE_RATES={})
+    def test_unconfigured_scope(self):
+        self.assertEqual(self.check_at(1000, 'a'), 0)
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        self.now = 1000.0
+        clock = mock.patch('Config.providers.time.monotonic', side_effect=lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+        self.breaker = CircuitBreaker('stub', failure_rate=0.5, min_calls=4, window=10, reset_timeout=30)
+
+    def record(self, *outcomes):
+        for failed in outcomes:
+            self.breaker.record(failed=failed)
+
+    def trip(self):
+        self.record(True, True, True, True)
+        self.assertEqual(self.breaker.state, OPEN)
+
+    def test_opens_at_the_failure_rate(self):
+        # Two failures in three calls: too few calls to judge.
+        self.record(True, False, True)
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertTrue(self.breaker.allow())
+        self.record(False)
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertFalse(self.breaker.allow())
+        self.assertEqual(self.breaker.retry_after(), 30)
+        self.assertEqual(self.breaker.snapshot(), {'state': OPEN, 'opened': 1})
+
+    def test_failures_leave_the_window(self):
+        self.record(True, True, True)
+        self.now += 11
+        # The three old failures no longer count: 1 of 4, then 2 of 5.
+        self.record(False, False, False, True, True)
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.record(True)
+        self.assertEqual(self.breaker.state, OPEN)
+
+    def test_half_open_probe_closes_or_reopens(self):
+        self.trip()
+        self.now += 29
+        self.assertFalse(self.breaker.allow())
+        self.assertEqual(self.breaker.retry_after(), 1)
+        self.now += 1
+        self.assertTrue(self.breaker.allow())
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        # One probe at a time.
+        self.assertFalse(self.breaker.allow())
+        self.record(True)
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertEqual(self.breaker.retry_after(), 30)
+
+        self.now += 30
+        self.assertTrue(self.breaker.allow())
+        self.record(False)
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertTrue(self.breaker.allow())
+        # The failures from before the probe are forgotten.
+        self.record(True, True, True)
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertEqual(self.breaker.snapshot()['opened'], 2)
+
+
+class ProviderIsolationTests(SimpleTestCase):
+    def provider_client(self, **kwargs):
+        return ProviderClient('stub', 'http://stub.invalid', retries=0, **kwargs)
+
+    def test_bulkhead_rejects_calls_over_the_limit(self):
+        client = self.provider_client(max_concurrent=1)
+        started, release = threading.Event(), threading.Event()
+
+        def slow_call(*args, **kwargs):
+            started.set()
+            release.wait(5)
+            return provider_response(200, {})
+
+        with mock.patch.object(client.session, 'request', side_effect=slow_call) as session:
+            caller = threading.Thread(target=client.get, args=('/slow',))
+            caller.start()
+            started.wait(5)
+            with self.assertRaises(ProviderUnavailable) as raised:
+                client.get('/fast')
+            release.set()
+            caller.join()
+            self.assertEqual(client.get('/fast').status_code, 200)
+        self.assertEqual((raised.exception.reason, raised.exception.retry_after), ('too many calls in flight', 1))
+        self.assertEqual(session.call_count, 2)
+        self.assertEqual(client.metrics.snapshot()['rejections'], {'breaker': 0, 'bulkhead': 1})
+
+    def test_open_breaker_fails_fast(self):
+        client = self.provider_client(breaker=CircuitBreaker('stub', min_calls=2, reset_timeout=30))
+        with mock.patch.object(client.session, 'request', return_value=provider_response(500, {})) as session:
+            client.post('/charge')
+            client.post('/charge')
+            with self.assertRaises(ProviderUnavailable) as raised:
+                client.post('/charge')
+        self.assertEqual(session.call_count, 2)
+        self.assertEqual((raised.exception.reason, raised.exception.retry_after), ('circuit open', 30))
+        self.assertEqual(client.metrics.snapshot()['rejections'], {'breaker': 1, 'bulkhead': 0})
+
+
+class StubProviderHandler(BaseHTTPRequestHandler):
+    """
+    A local provider: ``/ok`` answers at once, ``/slow`` after half a
+    second and ``/flaky`` with 503 until it has failed ``server.failures``
+    times. Every request is logged with the client port it came from.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def respond(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        self.rfile.read(length)
+        self.server.log.append((self.command, self.path, self.client_address[1]))
+        status = 200
+        if self.path == '/slow':
+            time.sleep(0.5)
+        elif self.path == '/flaky' and self.server.failures > 0:
+            self.server.failures -= 1
+            status = 503
+        body = json.dumps({'status': status}).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = respond
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubProviderServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # The client hung up on /slow after its read timeout.
+        pass
+
+
+class ProviderClientTests(SimpleTestCase):
+    """ProviderClient against a real HTTP server on localhost."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = StubProviderServer(('127.0.0.1', 0), StubProviderHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.log = []
+        self.server.failures = 0
+
+    def provider_client(self, **kwargs):
+        client = ProviderClient('stub', f'http://127.0.0.1:{self.server.server_port}', **kwargs)
+        self.addCleanup(client.session.close)
+        return client
+
+    def requests_to(self, path):
+        return [(method, port) for method, logged_path, port in self.server.log if logged_path == path]
+
+    def test_connections_are_reused(self):
+        client = self.provider_client()
+        for _ in range(5):
+            self.assertEqual(client.get('/ok').status_code, 200)
+        client.post('/ok', json={'amount': 100})
+        ports = {port for _, port in self.requests_to('/ok')}
+        self.assertEqual((len(self.server.log), len(ports)), (6, 1))
+
+    def test_read_timeout(self):
+        client = self.provider_client(read_timeout=0.1, retries=0)
+        started = time.perf_counter()
+        with self.assertRaises(requests.exceptions.ReadTimeout), self.assertLogs('Config.providers', 'WARNING'):
+            client.get('/slow')
+        self.assertLess(time.perf_counter() - started, 0.4)
+        self.assertEqual(client.metrics.snapshot()['errors'], 1)
+
+    def test_idempotent_calls_are_retried_with_backoff(self):
+        self.server.failures = 2
+        client = self.provider_client(retries=2, backoff=0.01)
+        with mock.patch('Config.providers.random.uniform', side_effect=lambda low, high: high) as jitter:
+            self.assertEqual(client.get('/flaky').status_code, 200)
+        self.assertEqual(len(self.requests_to('/flaky')), 3)
+        # Each wait is drawn from a window twice as long as the one before.
+        self.assertEqual([call.args for call in jitter.call_args_list], [(0, 0.01), (0, 0.02)])
+        self.assertEqual(client.metrics.snapshot()['retries'], 2)
+
+    def test_idempotent_timeout_is_retried(self):
+        client = self.provider_client(read_timeout=0.1, retries=1, backoff=0)
+        with self.assertRaises(requests.exceptions.ReadTimeout), self.assertLogs('Config.providers', 'WARNING'):
+            client.get('/slow')
+        self.assertEqual(len(self.requests_to('/slow')), 2)
+
+    def test_non_idempotent_calls_are_not_retried(self):
+        self.server.failures = 2
+        client = self.provider_client(read_timeout=0.1, retries=2, backoff=0)
+        self.assertEqual(client.post('/flaky', json={}).status_code, 503)
+        with self.assertRaises(requests.exceptions.ReadTimeout), self.assertLogs('Config.providers', 'WARNING'):
+            client.post('/slow', json={})
+        self.assertEqual((len(self.requests_to('/flaky')), len(self.requests_to('/slow'))), (1, 1))
+        self.assertEqual(client.metrics.snapshot()['retries'], 0)
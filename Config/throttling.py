@@ -0,0 +1,110 @@
+"""
+Token-bucket throttles for the endpoints that call a paid provider.
+
+Each throttle scope has a bucket per user and one shared by all users,
+configured in ``THROTTLE_RATES`` as ``'<scope>'`` and ``'<scope>.global'``
+with DRF's ``'N/period'`` syntax: a bucket holds N tokens and refills
+evenly over the period. A request takes one token from both buckets or is
+refused with a ``Retry-After`` of the time until both have one.
+
+Buckets are ThrottleBucket rows, so every worker process shares them
+through the database. Each is stored as a single number, the time at
+which it would be full again (the generic cell rate algorithm), and a
+token is taken with one conditional UPDATE: the database applies
+concurrent UPDATEs of a row one after the other, re-checking the
+condition each time, so no two requests get the same token. The user's
+bucket is debited first and given its token back if the global one turns
+out to be empty, so an allowed request costs two UPDATEs.
+"""
+import time
+from functools import lru_cache
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from rest_framework.throttling import BaseThrottle
+
+from Account.models import ThrottleBucket
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+@lru_cache(maxsize=None)
+def parse_rate(rate):
+    """``'10/min'`` -> ``(10, 6.0)``: capacity and seconds per token."""
+    count, period = rate.split('/')
+    count = int(count)
+    return count, PERIODS[period[0]] / count
+
+
+def buckets_for(scope, ident):
+    """``[(key, capacity, seconds per token)]`` of the buckets configured for ``scope``, the user's first."""
+    buckets = []
+    rates = settings.THROTTLE_RATES
+    if rates.get(scope):
+        buckets.append((f'{scope}:{ident}', *parse_rate(rates[scope])))
+    if rates.get(f'{scope}.global'):
+        buckets.append((f'{scope}.global', *parse_rate(rates[f'{scope}.global'])))
+    return buckets
+
+
+def take_token(key, capacity, interval, now):
+    """Take a token from one bucket; returns 0, or the seconds until it has one."""
+    # (full_at - now) / interval tokens are in use; one must be left.
+    limit = now + (capacity - 1) * interval
+    for _ in range(2):
+        if ThrottleBucket.objects.filter(key=key, full_at__lte=limit).update(
+                full_at=Greatest(F('full_at'), Value(now)) + interval):
+            return 0
+        # Empty, or not created yet, which means full.
+        bucket, created = ThrottleBucket.objects.get_or_create(key=key, defaults={'full_at': now + interval})
+        if created:
+            return 0
+        if bucket.full_at > limit:
+            return bucket.full_at - limit
+        # Another request created the bucket between the two queries.
+    return interval
+
+
+def check_throttle(scope, ident):
+    """Take a request's tokens; returns 0 if it may proceed, else seconds to wait."""
+    now = time.time()
+    taken = []
+    for key, capacity, interval in buckets_for(scope, ident):
+        wait = take_token(key, capacity, interval, now)
+        if wait:
+            for key, interval in taken:
+                ThrottleBucket.objects.filter(key=key).update(full_at=F('full_at') - interval)
+            return wait
+        taken.append((key, interval))
+    return 0
+
+
+async def acheck_throttle(scope, ident):
+    """``check_throttle`` for the async views."""
+    return await sync_to_async(check_throttle)(scope, ident)
+
+
+def throttle_ident(request):
+    return request.user.pk if request.user and request.user.is_authenticated else None
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """DRF throttle over the per-user and global buckets of ``scope``."""
+    scope = None
+
+    def allow_request(self, request, view):
+        self.retry_after = check_throttle(self.scope, throttle_ident(request) or self.get_ident(request))
+        return not self.retry_after
+
+    def wait(self):
+        return self.retry_after
+
+
+class PaystackThrottle(TokenBucketThrottle):
+    scope = 'paystack'
+
+
+class YouverifyThrottle(TokenBucketThrottle):
+    scope = 'youverify'
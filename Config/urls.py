@@ -18,27 +18,25 @@ from django.contrib import admin
 from django.urls import path, include
 from rest_framework import permissions
 from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
 from dj_rest_auth.views import PasswordResetConfirmView
+from Account.views import RegisterView
+from Config.metrics import metrics_view
+from Config.schema import API_INFO, schema_json_view, schema_yaml_view, serve_precomputed_spec
 
 schema_view = get_schema_view(
-   openapi.Info(
-      title="AJO API",
-      default_version='v1',
-      description="Test description",
-      terms_of_service="https://www.google.com/policies/terms/",
-      contact=openapi.Contact(email="adewalemaxwell11@gmail.com"),
-      license=openapi.License(name="BSD License"),
-   ),
+   API_INFO,
    public=True,
    permission_classes=[permissions.AllowAny],
 )
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
-    path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
+    path('', serve_precomputed_spec(schema_view.with_ui('swagger', cache_timeout=0)), name='schema-swagger-ui'),
+    path('redoc/', serve_precomputed_spec(schema_view.with_ui('redoc', cache_timeout=0)), name='schema-redoc'),
+    path('openapi.json', schema_json_view, name='openapi-json'),
+    path('openapi.yaml', schema_yaml_view, name='openapi-yaml'),
     path('auth/', include('dj_rest_auth.urls')),
+    path('registration/', RegisterView.as_view(), name='rest_register'),
     path('registration/', include('dj_rest_auth.registration.urls')),
     path('auth/password/reset/confirm/<str:uidb64>/<str:token>', PasswordResetConfirmView.as_view(),
             name='password_reset_confirm'),
@@ -46,4 +44,5 @@ urlpatterns = [
     path('Verification/', include('Verification.urls')),
     path('Plans/', include('Plans.urls')),
     path('Payment/', include('Payment.urls')),
+    path('metrics', metrics_view, name='metrics'),
 ]
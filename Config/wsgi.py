@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Config.settings')
 
 application = get_wsgi_application()
+
+from Config.metrics import check_deployment
+
+check_deployment()
@@ -0,0 +1,93 @@
+"""
+Async versions of the Paystack endpoints, for ASGI deployments.
+
+They behave like the views in ``views.py`` but await the provider call and
+use the async ORM, so a worker can keep many Paystack calls in flight.
+"""
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+from django.utils import timezone
+from rest_framework import status
+
+from Config.async_views import async_api_view
+from Config.providers import ProviderUnavailable, get_async_provider
+from Plans.cache import bump_user_versions
+from Plans.models import SavingsPlan, Transaction
+from .models import WebhookEvent
+from .serializers import DepositSerializer
+from .views import deposit_request, dispatch_event, queued_event, signature_matches
+
+
+@async_api_view(['POST'], throttle_scope='paystack')
+async def initialize_deposit(request):
+    user = request.user
+    serializer = DepositSerializer(data=request.data)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    amount = serializer.validated_data['amount']
+    email = serializer.validated_data['email']
+    plan_id = serializer.validated_data['plan_id']
+
+    plan = await SavingsPlan.objects.filter(user=user, plan_id=plan_id).afirst()
+    if not plan:
+        return JsonResponse({'message': 'Savings plan not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    if plan.total_amount != amount:
+        return JsonResponse({'message': 'amount does not match savings plan total amount'},
+                            status=status.HTTP_400_BAD_REQUEST)
+    if user.email != email:
+        return JsonResponse({'message': 'email address not valid'}, status=status.HTTP_404_NOT_FOUND)
+
+    headers, request_body = deposit_request(amount, email)
+    try:
+        r = await get_async_provider('paystack').post('/transaction/initialize', headers=headers, json=request_body)
+        r.raise_for_status()
+        response = r.json()
+    except ProviderUnavailable as exc:
+        return JsonResponse({'message': 'Payment service is temporarily unavailable. Please try again later.'},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            headers={'Retry-After': str(exc.retry_after)})
+    except httpx.TimeoutException:
+        return JsonResponse({'message': 'Payment service is temporarily unavailable. Please try again later.'},
+                            status=status.HTTP_504_GATEWAY_TIMEOUT)
+    except httpx.HTTPError:
+        return JsonResponse({'message': 'An error occurred while initializing payment. Please try again later.'},
+                            status=status.HTTP_502_BAD_GATEWAY)
+
+    await Transaction.objects.acreate(
+        user=user,
+        type='Deposit',
+        date_created=timezone.now(),
+        savings_plan=plan,
+        amount=amount,
+        fee=100,
+        amount_paid=amount + 100,
+        transaction_reference=response['data']['reference'],
+        completed=False
+    )
+    await sync_to_async(bump_user_versions)([user.pk])
+    return JsonResponse({'message': 'Transaction initiated. Service fee of 100 naira added.',
+                         'data': response}, status=status.HTTP_200_OK)
+
+
+@async_api_view(['POST'], authenticated=False)
+async def paystack_webhook(request):
+    signature = request.headers.get('x-paystack-signature')
+    if not signature:
+        return JsonResponse({'error': 'No signature'}, status=status.HTTP_400_BAD_REQUEST)
+
+    if not signature_matches(request.body.decode('utf-8'), signature):
+        return JsonResponse({'error': 'Invalid signature'}, status=status.HTTP_400_BAD_REQUEST)
+
+    payload = request.data
+    if settings.PAYSTACK_WEBHOOK_MODE == 'queue':
+        await WebhookEvent.objects.abulk_create([queued_event(payload, request.body)], ignore_conflicts=True)
+        return JsonResponse({'status': 'queued'}, status=status.HTTP_200_OK)
+
+    # Applying an event is one database transaction, which the async ORM
+    # cannot hold open; run it in the sync thread.
+    response = await sync_to_async(dispatch_event)(payload.get('event'), payload.get('data'))
+    return JsonResponse(response.data, status=response.status_code)
@@ -0,0 +1,80 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from Payment.models import WebhookEvent
+from Payment.views import dispatch_event
+
+
+class EventNotApplied(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Apply queued Paystack webhook events in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument('--max-attempts', type=int, default=8)
+        parser.add_argument('--retry-delay', type=int, default=30,
+                            help='Base delay in seconds before a failed event is retried; doubles per attempt.')
+        parser.add_argument('--watch', action='store_true', help='Keep running and poll for new events.')
+        parser.add_argument('--interval', type=float, default=1.0, help='Seconds between polls with --watch.')
+
+    def handle(self, *args, **options):
+        while True:
+            handled = 0
+            while True:
+                count = self.process_batch(options)
+                handled += count
+                if count < options['batch_size']:
+                    break
+            if handled:
+                self.stdout.write(f'handled {handled} webhook events')
+            if not options['watch']:
+                return
+            time.sleep(options['interval'])
+
+    def process_batch(self, options):
+        now = timezone.now()
+        with transaction.atomic():
+            # SKIP LOCKED lets several workers drain the queue side by side.
+            events = list(
+                WebhookEvent.objects
+                .select_for_update(skip_locked=True)
+                .filter(status='Pending', next_attempt_at__lte=now)
+                .order_by('next_attempt_at', 'id')[:options['batch_size']]
+            )
+            for event in events:
+                event.attempts += 1
+                try:
+                    # Each event runs in its own savepoint so a failure is
+                    # rolled back without losing the rest of the batch.
+                    with transaction.atomic():
+                        response = dispatch_event(event.event, event.payload.get('data') or {})
+                        if response.status_code >= 400:
+                            raise EventNotApplied(response.data)
+                except Exception as e:
+                    error = str(e)
+                else:
+                    error = None
+
+                if error is None:
+                    event.status = 'Processed'
+                    event.processed_at = now
+                    event.last_error = ''
+                elif event.attempts >= options['max_attempts']:
+                    event.status = 'Failed'
+                    event.last_error = error
+                else:
+                    # The transaction may not be written yet when Paystack
+                    # is quicker than initialize_deposit, so retry later.
+                    event.last_error = error
+                    event.next_attempt_at = now + timedelta(seconds=options['retry_delay'] * 2 ** (event.attempts - 1))
+            WebhookEvent.objects.bulk_update(
+                events, ['status', 'attempts', 'last_error', 'next_attempt_at', 'processed_at']
+            )
+        return len(events)
@@ -1,3 +1,31 @@
 from django.db import models
+from django.utils import timezone
 
-# Create your models here.
+
+class WebhookEvent(models.Model):
+    status_choices = (
+        ('Pending', 'Pending'),
+        ('Processed', 'Processed'),
+        ('Failed', 'Failed'),
+    )
+    event = models.CharField(max_length=100)
+    reference = models.CharField(max_length=250)
+    payload = models.JSONField()
+    status = models.CharField(choices=status_choices, max_length=20, default='Pending')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+    received_at = models.DateTimeField(auto_now_add=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    processed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['event', 'reference'], name='unique_webhook_event'),
+        ]
+        indexes = [
+            models.Index(fields=['next_attempt_at', 'id'], condition=models.Q(status='Pending'),
+                         name='webhook_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.event} {self.reference}'
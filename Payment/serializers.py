@@ -9,4 +9,9 @@ class DepositSerializer(serializers.Serializer):
 
     amount = serializers.IntegerField(validators=[is_positive])
     email = serializers.EmailField()
-    plan_id = serializers.CharField()
\ No newline at end of file
+    plan_id = serializers.CharField()
+
+class CircleContributionSerializer(serializers.Serializer):
+
+    circle_id = serializers.IntegerField()
+    email = serializers.EmailField()
@@ -1,3 +1,232 @@
-from django.test import TestCase
+import hashlib
+import hmac
+import json
+import os
+from decimal import Decimal
+from itertools import count
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from Account.models import User
+from Config.benchmark import (
+    BENCHMARK_THROTTLE_RATES, FAST_HASHERS, EndpointBenchmarkMixin, create_throttle_buckets, jwt_client,
+    provider_response, seed_plans,
+)
+from Config.providers import AsyncProviderClient, ProviderClient
+from Payment.models import WebhookEvent
+from Payment.urls import urlpatterns
+from Plans.circles import create_circle, member_contribution_status, start_circle
+from Plans.ledger import plan_balance
+from Plans.models import Circle, CircleContribution, CircleMember, LedgerEntry, SavingsPlan, Transaction
+
+SECRET = 'test-paystack-secret'
+
+
+def paystack_initialized(references):
+    def respond(*args, **kwargs):
+        return {'status': True, 'data': {'reference': next(references), 'authorization_url': 'https://pay.test/'}}
+    return respond
+
+
+def webhook_body(reference):
+    return json.dumps({'event': 'charge.success', 'data': {'reference': reference, 'status': 'success'}})
+
+
+def sign(body):
+    return hmac.new(SECRET.encode(), body.encode(), digestmod=hashlib.sha512).hexdigest()
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, THROTTLE_RATES=BENCHMARK_THROTTLE_RATES)
+@mock.patch.dict(os.environ, {'PAYSTACK_SECRET_KEY': SECRET})
+class PaymentEndpointTests(EndpointBenchmarkMixin, TestCase):
+    covered_prefix = 'Payment/'
+    covered_patterns = [str(pattern.pattern) for pattern in urlpatterns]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='payer@example.com', username='payer', password='pass')
+        seed_plans(cls.user, plans=20, transactions_per_plan=100, prefix='payer')
+        cls.plan = SavingsPlan.objects.filter(user=cls.user).first()
+        cls.circle = create_circle(cls.user, 'payers', 'Weekly', Decimal('2500.00'))
+        members = User.objects.bulk_create([
+            User(email=f'circle{number}@example.com', username=f'circle{number}') for number in range(1999)
+        ])
+        CircleMember.objects.bulk_create([
+            CircleMember(circle=cls.circle, user=member, position=position)
+            for position, member in enumerate(members, 1)
+        ])
+        Circle.objects.filter(pk=cls.circle.pk).update(member_count=2000)
+        cls.circle = start_circle(cls.circle.id)
+        create_throttle_buckets(cls.user)
+
+    def setUp(self):
+        super().setUp()
+        # Cached Plans responses outlive each test.
+        cache.clear()
+
+    def pending_deposits(self, prefix, number):
+        references = [f'{prefix}-{index}' for index in range(number)]
+        plans = SavingsPlan.objects.bulk_create([
+            SavingsPlan(user=self.user, name='pending', plan_id=f'P{prefix[:3]}{index:06d}', frequency='Weekly',
+                        total_amount=Decimal('5000.00'), set_payout=Decimal('500.00'),
+                        remaining_balance=Decimal('5000.00'))
+            for index in range(number)
+        ])
+        Transaction.objects.bulk_create([
+            Transaction(user=self.user, savings_plan=plan, type='Deposit', date_created=timezone.now(),
+                        amount=Decimal('5000.00'), fee=Decimal('100.00'), amount_paid=Decimal('5100.00'),
+                        transaction_reference=reference)
+            for plan, reference in zip(plans, references)
+        ])
+        return references
+
+    def deposit_body(self):
+        return {'amount': int(self.plan.total_amount), 'email': self.user.email, 'plan_id': self.plan.plan_id}
+
+    def test_initialize_deposit(self):
+        references = (f'init-{number}' for number in count())
+        with mock.patch.object(ProviderClient, 'request', side_effect=lambda *args, **kwargs: provider_response(
+                200, paystack_initialized(references)())):
+            self.measure(jwt_client(self.user), 'post', '/Payment/initialize_deposit/', max_queries=5,
+                         data=self.deposit_body(), format='json')
+        self.assertTrue(Transaction.objects.filter(transaction_reference='init-0', completed=False).exists())
+
+    def test_async_initialize_deposit(self):
+        references = (f'async-init-{number}' for number in count())
+        with mock.patch.object(AsyncProviderClient, 'request', new=mock.AsyncMock(
+                side_effect=lambda *args, **kwargs: provider_response(
+                    200, paystack_initialized(references)(), asynchronous=True))):
+            self.measure(jwt_client(self.user), 'post', '/Payment/async/initialize_deposit/', max_queries=5,
+                         data=self.deposit_body(), format='json')
+        self.assertTrue(Transaction.objects.filter(transaction_reference='async-init-0').exists())
+
+    def test_async_clients_closed_under_wsgi(self):
+        # The test client is a WSGI one, so each call runs on a loop of its own.
+        references = iter(['wsgi-0', 'wsgi-1'])
+        with mock.patch.object(AsyncProviderClient, 'request', new=mock.AsyncMock(
+                side_effect=lambda *args, **kwargs: provider_response(
+                    200, paystack_initialized(references)(), asynchronous=True))), \
+                mock.patch.object(AsyncProviderClient, 'aclose', autospec=True) as aclose:
+            client = jwt_client(self.user)
+            for _ in range(2):
+                self.assertEqual(client.post('/Payment/async/initialize_deposit/', self.deposit_body(),
+                                             format='json').status_code, 200)
+        self.assertEqual(aclose.await_count, 2)
+        self.assertEqual(len({call.args[0] for call in aclose.await_args_list}), 2)
+
+    def test_initialize_deposit_throttled(self):
+        references = (f'throttled-{number}' for number in count())
+        with self.settings(THROTTLE_RATES={'paystack': '1/hour', 'paystack.global': '100000/min'}), \
+                mock.patch.object(ProviderClient, 'request', side_effect=lambda *args, **kwargs: provider_response(
+                    200, paystack_initialized(references)())) as provider:
+            client = jwt_client(self.user)
+            self.assertEqual(client.post('/Payment/initialize_deposit/', self.deposit_body(), format='json')
+                             .status_code, 200)
+            response = self.measure(client, 'post', '/Payment/initialize_deposit/', max_queries=3, status=429,
+                                    name='POST Payment/initialize_deposit/ (throttled)',
+                                    data=self.deposit_body(), format='json')
+            self.assertEqual(provider.call_count, 1)
+            self.assertTrue(3590 <= int(response['Retry-After']) <= 3600)
+
+    def test_async_initialize_deposit_throttled(self):
+        with self.settings(THROTTLE_RATES={'paystack': '10/min', 'paystack.global': '1/min'}), \
+                mock.patch.object(AsyncProviderClient, 'request', new=mock.AsyncMock(
+                    return_value=provider_response(200, paystack_initialized(iter(['async-throttled']))(),
+                                                   asynchronous=True))) as provider:
+            self.assertEqual(jwt_client(self.user).post('/Payment/async/initialize_deposit/', self.deposit_body(),
+                                                        format='json').status_code, 200)
+            # The global bucket is shared by every user.
+            other = User.objects.create_user(email='other-payer@example.com', username='other-payer', password='pass')
+            create_throttle_buckets(other)
+            response = self.measure(jwt_client(other), 'post', '/Payment/async/initialize_deposit/', max_queries=5,
+                                    status=429, name='POST Payment/async/initialize_deposit/ (throttled)',
+                                    data=self.deposit_body(), format='json')
+            self.assertEqual(provider.await_count, 1)
+            self.assertTrue(50 <= int(response['Retry-After']) <= 60)
+
+    def test_initialize_circle_contribution(self):
+        references = (f'circle-{number}' for number in count())
+        with mock.patch.object(ProviderClient, 'request', side_effect=lambda *args, **kwargs: provider_response(
+                200, paystack_initialized(references)())):
+            self.measure(jwt_client(self.user), 'post', '/Payment/initialize_circle_contribution/', max_queries=9,
+                         data={'circle_id': self.circle.id, 'email': self.user.email}, format='json')
+        contribution = CircleContribution.objects.get(transaction_reference='circle-0')
+        self.assertEqual((contribution.cycle, contribution.amount, contribution.member.position),
+                         (0, Decimal('2500.00'), 0))
+
+        body = webhook_body('circle-0')
+        Client().post('/Payment/paystack-webhook/', body, content_type='application/json',
+                      HTTP_X_PAYSTACK_SIGNATURE=sign(body))
+        self.assertEqual(member_contribution_status(contribution.member, 0), 'Paid')
+        # The pot plan is never scheduled for payouts of its own.
+        self.assertIsNone(SavingsPlan.objects.get(pk=self.circle.savings_plan_id).next_payout_date)
+        with mock.patch.object(ProviderClient, 'request') as provider:
+            response = jwt_client(self.user).post('/Payment/initialize_circle_contribution/', format='json',
+                                                  data={'circle_id': self.circle.id, 'email': self.user.email})
+        self.assertEqual(response.status_code, 400)
+        provider.assert_not_called()
+
+    def test_paystack_webhook(self):
+        references = self.pending_deposits('sync', self.repeat)
+        response = self.measure(
+            Client(), 'post', '/Payment/paystack-webhook/', max_queries=14, content_type='application/json',
+            data=lambda i: webhook_body(references[i]),
+            HTTP_X_PAYSTACK_SIGNATURE=lambda i: sign(webhook_body(references[i])),
+        )
+        self.assertEqual(response.json(), {'status': 'success'})
+        self.assertEqual(Transaction.objects.filter(transaction_reference__in=references, completed=True).count(),
+                         len(references))
+
+    def post_event(self, event, reference):
+        body = json.dumps({'event': event, 'data': {'reference': reference, 'status': event.split('.')[1]}})
+        return Client().post('/Payment/paystack-webhook/', body, content_type='application/json',
+                             HTTP_X_PAYSTACK_SIGNATURE=sign(body)).json()
+
+    def test_paystack_webhook_redelivery(self):
+        [reference] = self.pending_deposits('redeliver', 1)
+        self.assertEqual(self.post_event('charge.success', reference), {'status': 'success'})
+        self.assertEqual(self.post_event('charge.success', reference), {'status': 'already_processed'})
+        deposit = Transaction.objects.get(transaction_reference=reference)
+        self.assertTrue(deposit.completed)
+        self.assertEqual(LedgerEntry.objects.filter(transaction=deposit).count(), 3)
+
+        # A failure delivered after the success changes nothing.
+        self.assertEqual(self.post_event('charge.failed', reference), {'status': 'already_processed'})
+        deposit.refresh_from_db()
+        self.assertTrue(deposit.completed)
+        self.assertTrue(deposit.savings_plan.active)
+        self.assertEqual(plan_balance(deposit.savings_plan_id), Decimal('5000.00'))
+
+    def test_paystack_webhook_failure(self):
+        [reference] = self.pending_deposits('failed', 1)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.post_event('charge.failed', reference), {'status': 'failed_handled'})
+        # The pending deposit is only looked up, not rewritten.
+        self.assertFalse([query for query in queries if query['sql'].startswith('UPDATE "Plans_transaction"')])
+        self.assertFalse(Transaction.objects.get(transaction_reference=reference).completed)
+        self.assertEqual(self.post_event('charge.failed', 'unknown-reference'), {'error': 'Transaction not found'})
+
+    @override_settings(PAYSTACK_WEBHOOK_MODE='queue')
+    def test_paystack_webhook_queued(self):
+        response = self.measure(
+            Client(), 'post', '/Payment/paystack-webhook/', max_queries=1, content_type='application/json',
+            name='POST Payment/paystack-webhook/ (queue)',
+            data=lambda i: webhook_body(f'queued-{i}'),
+            HTTP_X_PAYSTACK_SIGNATURE=lambda i: sign(webhook_body(f'queued-{i}')),
+        )
+        self.assertEqual(response.json(), {'status': 'queued'})
+        self.assertEqual(WebhookEvent.objects.count(), self.repeat)
+
+    def test_async_paystack_webhook(self):
+        references = self.pending_deposits('async', self.repeat)
+        response = self.measure(
+            Client(), 'post', '/Payment/async/paystack-webhook/', max_queries=14, content_type='application/json',
+            data=lambda i: webhook_body(references[i]),
+            HTTP_X_PAYSTACK_SIGNATURE=lambda i: sign(webhook_body(references[i])),
+        )
+        self.assertEqual(response.json(), {'status': 'success'})
@@ -1,7 +1,10 @@
-from . import views
+from . import views, async_views
 from django.urls import path
 
 urlpatterns = [
     path('initialize_deposit/', views.initialize_deposit),
+    path('initialize_circle_contribution/', views.initialize_circle_contribution),
     path('paystack-webhook/', views.paystack_webhook),
+    path('async/initialize_deposit/', async_views.initialize_deposit),
+    path('async/paystack-webhook/', async_views.paystack_webhook),
 ]
\ No newline at end of file
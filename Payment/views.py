@@ -1,5 +1,10 @@
-from Plans.models import SavingsPlan, Transaction
-from rest_framework.decorators import api_view, permission_classes
+from Plans.models import ArchivedTransaction, SavingsPlan, Transaction
+from Plans.payouts import first_payout_date_expression
+from Plans.ledger import record_transactions
+from Plans.cache import bump_user_versions
+from Plans.circles import member_contribution_status, record_contribution
+from Plans.models import CircleMember
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
 from rest_framework import status
 from rest_framework.response import Response
 import requests
@@ -9,16 +14,23 @@ from django.views.decorators.http import require_POST
 import hashlib
 import hmac
 import json
-from .serializers import DepositSerializer
+from .serializers import CircleContributionSerializer, DepositSerializer
+from .models import WebhookEvent
 import os
 from drf_yasg.utils import swagger_auto_schema
 from Account.models import User
+from Config.providers import ProviderUnavailable, get_provider
+from Config.throttling import PaystackThrottle
 from django.utils import timezone
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce
 
 @swagger_auto_schema(methods=['POST'], request_body=DepositSerializer)
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
-
+@throttle_classes([PaystackThrottle])
 def initialize_deposit(request):
     user = request.user
     serializer = DepositSerializer(data=request.data)
@@ -36,15 +48,21 @@ def initialize_deposit(request):
     if user.email != email:
         return Response({'message': 'email address not valid'}, status=status.HTTP_404_NOT_FOUND)
     
-    url = "https://api.paystack.co/transaction/initialize"
-    headers = {"authorization": f"Bearer {os.getenv('PAYSTACK_SECRET_KEY')}"}
-    request_body = {
-        'amount' : int(amount * 100) + (100*100),
-        'email' : email,
-    }
-    r = requests.post(url, headers=headers, json=request_body)
-    r.raise_for_status()
-    response = r.json()
+    headers, request_body = deposit_request(amount, email)
+    try:
+        r = get_provider('paystack').post('/transaction/initialize', headers=headers, json=request_body)
+        r.raise_for_status()
+        response = r.json()
+    except ProviderUnavailable as exc:
+        return Response({'message': 'Payment service is temporarily unavailable. Please try again later.'},
+                        status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                        headers={'Retry-After': str(exc.retry_after)})
+    except requests.exceptions.Timeout:
+        return Response({'message': 'Payment service is temporarily unavailable. Please try again later.'},
+                        status=status.HTTP_504_GATEWAY_TIMEOUT)
+    except requests.exceptions.RequestException:
+        return Response({'message': 'An error occurred while initializing payment. Please try again later.'},
+                        status=status.HTTP_502_BAD_GATEWAY)
     
     Transaction.objects.create(
         user = user,
@@ -57,11 +75,72 @@ def initialize_deposit(request):
         transaction_reference = response['data']['reference'],
         completed = False
     )
+    bump_user_versions([user.pk])
     data = {'message': 'Transaction initiated. Service fee of 100 naira added.',
             'data': response}
     
     return Response(data, status=status.HTTP_200_OK)
 
+@swagger_auto_schema(methods=['POST'], request_body=CircleContributionSerializer)
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@throttle_classes([PaystackThrottle])
+def initialize_circle_contribution(request):
+    user = request.user
+    serializer = CircleContributionSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    email = serializer.validated_data['email']
+
+    try:
+        member = CircleMember.objects.select_related('circle').get(
+            circle_id=serializer.validated_data['circle_id'], user=user)
+    except CircleMember.DoesNotExist:
+        return Response({'message': 'Savings circle not found'}, status=status.HTTP_404_NOT_FOUND)
+    circle = member.circle
+    if not circle.active:
+        return Response({'message': 'savings circle is not running'}, status=status.HTTP_400_BAD_REQUEST)
+    if user.email != email:
+        return Response({'message': 'email address not valid'}, status=status.HTTP_404_NOT_FOUND)
+    if member_contribution_status(member, circle.current_cycle) == 'Paid':
+        return Response({'message': 'contribution for this cycle already paid'}, status=status.HTTP_400_BAD_REQUEST)
+
+    amount = circle.contribution
+    headers, request_body = deposit_request(amount, email)
+    try:
+        r = get_provider('paystack').post('/transaction/initialize', headers=headers, json=request_body)
+        r.raise_for_status()
+        response = r.json()
+    except ProviderUnavailable as exc:
+        return Response({'message': 'Payment service is temporarily unavailable. Please try again later.'},
+                        status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                        headers={'Retry-After': str(exc.retry_after)})
+    except requests.exceptions.Timeout:
+        return Response({'message': 'Payment service is temporarily unavailable. Please try again later.'},
+                        status=status.HTTP_504_GATEWAY_TIMEOUT)
+    except requests.exceptions.RequestException:
+        return Response({'message': 'An error occurred while initializing payment. Please try again later.'},
+                        status=status.HTTP_502_BAD_GATEWAY)
+
+    reference = response['data']['reference']
+    with transaction.atomic():
+        Transaction.objects.create(
+            user = user,
+            type = 'Deposit',
+            date_created = timezone.now(),
+            savings_plan_id = circle.savings_plan_id,
+            amount = amount,
+            fee = 100,
+            amount_paid = amount + 100,
+            transaction_reference = reference,
+            completed = False
+        )
+        record_contribution(circle, member, reference)
+    bump_user_versions([user.pk])
+    data = {'message': 'Contribution initiated. Service fee of 100 naira added.',
+            'data': response}
+
+    return Response(data, status=status.HTTP_200_OK)
+
 @csrf_exempt
 @require_POST
 @api_view(['POST'])
@@ -71,7 +150,6 @@ def paystack_webhook(request):
     Paystack webhook to handle payment events
     """
     # Skip authentication for webhooks - Paystack can't authenticate
-    paystack_secret = os.getenv('PAYSTACK_SECRET_KEY')
     signature = request.headers.get('x-paystack-signature')
     
     if not signature:
@@ -79,13 +157,7 @@ def paystack_webhook(request):
     
     # Verify signature instead of using Django auth
     body = request.body.decode('utf-8')
-    computed_signature = hmac.new(
-        paystack_secret.encode('utf-8'),
-        body.encode('utf-8'),
-        digestmod=hashlib.sha512
-    ).hexdigest()
-    
-    if not hmac.compare_digest(computed_signature, signature):
+    if not signature_matches(body, signature):
         return Response({'error': 'Invalid signature'}, status=status.HTTP_400_BAD_REQUEST)
     
     # Parse the webhook payload
@@ -96,7 +168,51 @@ def paystack_webhook(request):
     
     event = payload.get('event')
     data = payload.get('data')
-    
+
+    if settings.PAYSTACK_WEBHOOK_MODE == 'queue':
+        # A single INSERT; redeliveries of the same event hit the unique
+        # constraint and are dropped by the database.
+        WebhookEvent.objects.bulk_create([queued_event(payload, request.body)], ignore_conflicts=True)
+        return Response({'status': 'queued'}, status=status.HTTP_200_OK)
+
+    return dispatch_event(event, data)
+
+def deposit_request(amount, email):
+    """
+    Headers and body for a Paystack transaction initialization
+    """
+    headers = {"authorization": f"Bearer {os.getenv('PAYSTACK_SECRET_KEY')}"}
+    request_body = {
+        'amount' : int(amount * 100) + (100*100),
+        'email' : email,
+    }
+    return headers, request_body
+
+def signature_matches(body, signature):
+    """
+    Check a webhook body against its x-paystack-signature header
+    """
+    paystack_secret = os.getenv('PAYSTACK_SECRET_KEY')
+    computed_signature = hmac.new(
+        paystack_secret.encode('utf-8'),
+        body.encode('utf-8'),
+        digestmod=hashlib.sha512
+    ).hexdigest()
+    return hmac.compare_digest(computed_signature, signature)
+
+def queued_event(payload, raw_body):
+    """
+    Unsaved WebhookEvent for the queue; its (event, reference) pair is
+    unique so redeliveries of the same event are dropped by the database.
+    """
+    data = payload.get('data') or {}
+    reference = data.get('reference') or str(data.get('id') or '') or hashlib.sha256(raw_body).hexdigest()
+    return WebhookEvent(event=payload.get('event') or '', reference=reference, payload=payload)
+
+def dispatch_event(event, data):
+    """
+    Apply a verified Paystack event, from the webhook or the queue worker
+    """
     # Handle different events
     if event == 'charge.success':
         return handle_successful_payment(data)
@@ -112,34 +228,40 @@ def handle_successful_payment(data):
     Handle successful payment webhook
     """
     reference = data.get('reference')
+    today = timezone.localdate()
 
-
-    
     try:
-        # Find the transaction
-        transaction = Transaction.objects.get(
-            transaction_reference=reference,
-            completed=False
-        )
-        
-        # Update transaction status
-        transaction.completed = True
-        transaction.save()
-        
-
-        if transaction.savings_plan:
-            plan = transaction.savings_plan
-
-            plan.active = True
-            plan.save()
-        
-        
-        return Response({'status': 'success'}, status=status.HTTP_200_OK)
-        
-    except Transaction.DoesNotExist:
+        with transaction.atomic():
+            # The completed=False condition makes the UPDATE itself decide
+            # which delivery wins: only the first one sees a changed row.
+            updated = Transaction.objects.filter(
+                transaction_reference=reference,
+                completed=False
+            ).update(completed=True)
+
+            if updated:
+                SavingsPlan.objects.filter(
+                    savings_plan_transaction__transaction_reference=reference,
+                    active=False
+                ).update(
+                    active=True,
+                    date_started=Coalesce(F('date_started'), Value(today)),
+                    next_payout_date=Coalesce(F('next_payout_date'), first_payout_date_expression(today)),
+                )
+                record_transactions(Transaction.objects.filter(transaction_reference=reference))
+                user_ids = list(Transaction.objects.filter(transaction_reference=reference)
+                                .values_list('user_id', flat=True))
+                transaction.on_commit(lambda: bump_user_versions(user_ids))
+                return Response({'status': 'success'}, status=status.HTTP_200_OK)
+
+        if Transaction.objects.filter(transaction_reference=reference).exists() or \
+                ArchivedTransaction.objects.filter(transaction_reference=reference).exists():
+            return Response({'status': 'already_processed'}, status=status.HTTP_200_OK)
+
         # Log this for investigation
         print(f"Transaction with reference {reference} not found")
         return Response({'error': 'Transaction not found'}, status=status.HTTP_404_NOT_FOUND)
+
     except Exception as e:
         # Log the error for investigation
         print(f"Error processing webhook: {str(e)}")
@@ -150,13 +272,14 @@ def handle_failed_payment(data):
     Handle failed payment webhook
     """
     reference = data.get('reference')
-    
-    try:
-        transaction = Transaction.objects.get(transaction_reference=reference)
-        transaction.completed = False
-        transaction.save()
-        
-        return Response({'status': 'failed_handled'}, status=status.HTTP_200_OK)
-        
-    except Transaction.DoesNotExist:
+
+    # A failure leaves a pending deposit as it is, so nothing is written. One
+    # arriving after (or redelivered alongside) a success must not
+    # un-complete a deposit whose plan was activated and posted.
+    if not Transaction.objects.filter(transaction_reference=reference, completed=False).exists():
+        if Transaction.objects.filter(transaction_reference=reference).exists() or \
+                ArchivedTransaction.objects.filter(transaction_reference=reference).exists():
+            return Response({'status': 'already_processed'}, status=status.HTTP_200_OK)
         return Response({'error': 'Transaction not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    return Response({'status': 'failed_handled'}, status=status.HTTP_200_OK)
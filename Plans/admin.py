@@ -1,5 +1,13 @@
 from django.contrib import admin
-from .models import SavingsPlan, Transaction
+from .models import (SavingsPlan, Transaction, LedgerEntry, BalanceSnapshot, ArchivedTransaction, Circle,
+                     CircleMember, CircleContribution, CirclePayout)
 
 admin.site.register(SavingsPlan)
-admin.site.register(Transaction)
\ No newline at end of file
+admin.site.register(Transaction)
+admin.site.register(LedgerEntry)
+admin.site.register(BalanceSnapshot)
+admin.site.register(ArchivedTransaction)
+admin.site.register(Circle)
+admin.site.register(CircleMember)
+admin.site.register(CircleContribution)
+admin.site.register(CirclePayout)
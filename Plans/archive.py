@@ -0,0 +1,115 @@
+"""
+Cold storage for completed transactions.
+
+``archive_transactions`` moves completed transactions older than
+``TRANSACTION_ARCHIVE_AFTER_DAYS`` into ArchivedTransaction in id-ordered
+batches, so the live table and its indexes only cover recent history. The
+user transaction endpoints read the archive as well only when the range
+they were asked for reaches back past the cutoff.
+"""
+import heapq
+from datetime import timedelta
+from itertools import islice
+from operator import attrgetter
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from Config.pagination import KeysetPagination
+
+from .models import ArchivedTransaction, Transaction
+from .queries import date_range_bounds, transaction_queryset
+
+ARCHIVED_FIELDS = ('id', 'user_id', 'type', 'date_created', 'savings_plan_id', 'completed',
+                   'amount', 'fee', 'amount_paid', 'transaction_reference')
+
+
+def archive_cutoff(today=None):
+    """Start of the oldest local day whose transactions are kept live."""
+    today = today or timezone.localdate()
+    cutoff_date = today - timedelta(days=settings.TRANSACTION_ARCHIVE_AFTER_DAYS)
+    return date_range_bounds(cutoff_date, cutoff_date)[0]
+
+
+def archived_queryset(user, start_date=None, completed=None, **filters):
+    """
+    The archive counterpart of ``transaction_queryset``, or None when the
+    filters rule the archive out: it only holds completed transactions
+    from before the cutoff.
+    """
+    if completed is False:
+        return None
+    if start_date is not None and date_range_bounds(start_date, start_date)[0] >= archive_cutoff():
+        return None
+    return transaction_queryset(user, start_date=start_date, completed=completed,
+                                model=ArchivedTransaction, **filters)
+
+
+class ArchiveKeysetPagination(KeysetPagination):
+    """
+    Keyset pagination over live transactions that also reads ``archive``
+    for pages reaching back past the cutoff. Archived rows keep their ids,
+    so cursors stay valid when rows move between the tables.
+    """
+
+    def __init__(self, archive, ordering='-date_created', page_size=None):
+        super().__init__(ordering=ordering, page_size=page_size)
+        self.archive = archive
+        self.cutoff = archive_cutoff()
+
+    def needs_archive(self, rows, cursor, descending):
+        if self.archive is None:
+            return False
+        if self.field != 'date_created':
+            return True
+        if descending:
+            # Archived rows are all older than the cutoff, so they cannot
+            # displace a full page of live rows from after it.
+            return len(rows) <= self.page_size or rows[-1].date_created < self.cutoff
+        return cursor is None or cursor[0] < self.cutoff
+
+    def fetch(self, queryset, cursor, descending):
+        rows = super().fetch(queryset, cursor, descending)
+        if not self.needs_archive(rows, cursor, descending):
+            return rows
+        archived = super().fetch(self.archive, cursor, descending)
+        merged = heapq.merge(rows, archived, key=attrgetter(self.field, 'pk'), reverse=descending)
+        return list(islice(merged, self.page_size + 1))
+
+
+def archive_batch(cutoff, batch_size):
+    """
+    Move up to ``batch_size`` completed transactions created before
+    ``cutoff`` into the archive and return how many moved. Rows are
+    claimed with ``SKIP LOCKED`` so a concurrent run takes other rows.
+    """
+    with transaction.atomic():
+        rows = list(
+            Transaction.objects.filter(completed=True, date_created__lt=cutoff)
+            .select_for_update(skip_locked=True)
+            .order_by('id')
+            .values(*ARCHIVED_FIELDS)[:batch_size]
+        )
+        if not rows:
+            return 0
+        now = timezone.now()
+        ArchivedTransaction.objects.bulk_create(
+            [ArchivedTransaction(**row, date_archived=now) for row in rows],
+            ignore_conflicts=True,
+        )
+        Transaction.objects.filter(id__in=[row['id'] for row in rows]).delete()
+    return len(rows)
+
+
+def archive_transactions(cutoff=None, batch_size=5000, max_batches=None):
+    """Archive in batches until nothing is left or ``max_batches`` ran."""
+    cutoff = cutoff or archive_cutoff()
+    total = batches = 0
+    while max_batches is None or batches < max_batches:
+        moved = archive_batch(cutoff, batch_size)
+        if not moved:
+            break
+        total += moved
+        batches += 1
+    return total
@@ -0,0 +1,62 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def version_key(user_id):
+    return f'plans:version:{user_id}'
+
+
+def user_version(user_id):
+    """
+    Current cache version for a user's Plans data. A missing counter is
+    seeded from the clock rather than 1, so an evicted counter can never
+    come back to a version that older cached responses were stored under.
+    """
+    version = cache.get(version_key(user_id))
+    if version is None:
+        cache.add(version_key(user_id), time.time_ns())
+        version = cache.get(version_key(user_id))
+    return version
+
+
+def bump_user_versions(user_ids):
+    """Invalidate every cached Plans response of the given users."""
+    for user_id in set(user_ids):
+        try:
+            cache.incr(version_key(user_id))
+        except ValueError:
+            cache.add(version_key(user_id), time.time_ns())
+
+
+def cached_user_response(view):
+    """
+    Cache a GET view's 200 responses per user, endpoint and query string
+    under the user's current version, and answer ``If-None-Match`` with 304
+    while that version is unchanged. Writers call ``bump_user_versions``.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        version = user_version(request.user.pk)
+        digest = hashlib.md5(request.build_absolute_uri().encode('utf-8')).hexdigest()
+        key = f'plans:response:{request.user.pk}:{version}:{view.__name__}:{digest}'
+        etag = '"%s"' % hashlib.md5(key.encode('utf-8')).hexdigest()
+
+        if etag in request.headers.get('If-None-Match', ''):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        data = cache.get(key)
+        if data is not None:
+            return Response(data, status=status.HTTP_200_OK, headers={'ETag': etag})
+
+        response = view(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(key, response.data, settings.PLANS_CACHE_TIMEOUT)
+            response['ETag'] = etag
+        return response
+    return wrapper
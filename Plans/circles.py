@@ -0,0 +1,225 @@
+"""
+Rotating savings circles (ajo).
+
+Members hold positions 0..N-1 in the order they joined and the member at
+position ``c`` receives the pot of cycle ``c``, so the next recipient is a
+lookup on the unique (circle, position) index. A member's contribution
+status is read through the (member, cycle) index and a cycle's totals
+through (circle, cycle, status), so neither depends on the circle's size.
+
+Members pay through the Payment app, which records a CircleContribution
+next to the deposit Transaction. close_due_cycles closes due circles in
+batches: contributions are matched to completed deposits, the pots paid
+out and the circles advanced with a fixed number of queries per batch.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Exists, F, OuterRef, Sum
+from django.utils import timezone
+
+from .cache import bump_user_versions
+from .ledger import record_transactions
+from .models import Circle, CircleContribution, CircleMember, CirclePayout, SavingsPlan, Transaction
+from .payouts import first_payout_date, next_payout_after
+from .plan_ids import allocate_plan_id
+
+ZERO = Decimal('0.00')
+
+
+class CircleError(Exception):
+    """A circle operation that is not allowed in the circle's current state."""
+
+
+def circle_payout_reference(circle_id, cycle):
+    return f'CIRCLE-{circle_id}-{cycle}'
+
+
+def completed_deposit():
+    """Whether the deposit behind an outer CircleContribution has completed."""
+    return Exists(Transaction.objects.filter(
+        transaction_reference=OuterRef('transaction_reference'), type='Deposit', completed=True,
+    ))
+
+
+@transaction.atomic
+def create_circle(owner, name, frequency, contribution):
+    """
+    Create a circle with ``owner`` as its first member. The circle's pot
+    plan is created active with no payouts of its own, so payment webhooks
+    do not activate it and run_payouts never pays from it.
+    """
+    pot = SavingsPlan.objects.create(
+        user=owner, name=f'{name} (circle)', plan_id=allocate_plan_id(), frequency=frequency,
+        total_amount=contribution, set_payout=contribution, remaining_balance=ZERO,
+        number_of_payouts=0, number_of_payouts_left=0, active=True,
+    )
+    circle = Circle.objects.create(owner=owner, name=name, savings_plan=pot, frequency=frequency,
+                                   contribution=contribution, member_count=1)
+    CircleMember.objects.create(circle=circle, user=owner, position=0)
+    transaction.on_commit(lambda: bump_user_versions([owner.id]))
+    return circle
+
+
+@transaction.atomic
+def join_circle(circle_id, user):
+    """Add ``user`` at the next free position. Joins to one circle are serialized on its row."""
+    circle = Circle.objects.select_for_update().get(pk=circle_id)
+    if circle.date_started is not None:
+        raise CircleError('This circle has already started.')
+    try:
+        with transaction.atomic():
+            member = CircleMember.objects.create(circle=circle, user=user, position=circle.member_count)
+    except IntegrityError:
+        raise CircleError('You are already a member of this circle.')
+    Circle.objects.filter(pk=circle.pk).update(member_count=F('member_count') + 1)
+    return member
+
+
+@transaction.atomic
+def start_circle(circle_id, today=None, owner=None):
+    """
+    Start the rotation of a circle, of ``owner``'s circles only when given.
+    The circle's row is locked as in join_circle, so a join cannot land
+    after the member count was checked.
+    """
+    circles = Circle.objects.select_for_update(of=('self',)).select_related('savings_plan')
+    circle = circles.get(pk=circle_id, **({'owner': owner} if owner else {}))
+    if circle.date_started is not None:
+        raise CircleError('This circle has already started.')
+    if circle.member_count < 2:
+        raise CircleError('A circle needs at least two members to start.')
+    today = today or timezone.localdate()
+    circle.active = True
+    circle.date_started = today
+    circle.current_cycle = 0
+    circle.next_close_date = first_payout_date(circle.frequency, today)
+    circle.save(update_fields=['active', 'date_started', 'current_cycle', 'next_close_date'])
+    return circle
+
+
+def next_recipient(circle):
+    """The member receiving the pot of the current cycle, or None when the circle is not running."""
+    if not circle.active:
+        return None
+    return CircleMember.objects.select_related('user').get(circle=circle, position=circle.current_cycle)
+
+
+def member_contribution_status(member, cycle):
+    """
+    ``'Paid'``, ``'Pending'``, ``'Missed'`` or None for ``member`` in
+    ``cycle``. A contribution whose deposit has completed counts as paid
+    before the cycle closes.
+    """
+    statuses = {
+        'Paid' if settled else status
+        for status, settled in CircleContribution.objects.filter(member=member, cycle=cycle)
+        .annotate(settled=completed_deposit()).values_list('status', 'settled')
+    }
+    return next((status for status in ('Paid', 'Pending', 'Missed') if status in statuses), None)
+
+
+def cycle_summary(circle):
+    """Contribution count and total per status for the circle's current cycle."""
+    rows = (
+        CircleContribution.objects.filter(circle=circle, cycle=circle.current_cycle)
+        .values('status').annotate(count=Count('id'), total=Sum('amount')).order_by()
+    )
+    return {row['status']: {'count': row['count'], 'total': row['total']} for row in rows}
+
+
+def record_contribution(circle, member, reference):
+    return CircleContribution.objects.create(circle=circle, member=member, cycle=circle.current_cycle,
+                                             amount=circle.contribution, transaction_reference=reference)
+
+
+def close_cycle_batch(today, batch_size):
+    """
+    Close the current cycle of up to ``batch_size`` due circles and return
+    how many were closed. Circles are claimed with ``SKIP LOCKED`` so
+    several workers can share the work, as in run_payouts.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        circles = list(
+            Circle.objects.filter(active=True, next_close_date__lte=today)
+            .select_for_update(skip_locked=True)
+            .order_by('next_close_date', 'id')[:batch_size]
+        )
+        if not circles:
+            return 0
+        ids = [circle.id for circle in circles]
+
+        contributions = CircleContribution.objects.filter(circle_id__in=ids, cycle=F('circle__current_cycle'))
+        contributions.filter(completed_deposit(), status='Pending').update(status='Paid', date_paid=now)
+        contributions.filter(status='Pending').update(status='Missed')
+        totals = {
+            row['circle_id']: row
+            for row in contributions.filter(status='Paid').values('circle_id')
+            .annotate(total=Sum('amount'), paid=Count('id')).order_by()
+        }
+        recipients = {
+            member.circle_id: member
+            for member in CircleMember.objects.filter(circle_id__in=ids, position=F('circle__current_cycle'))
+        }
+
+        withdrawals, payouts = [], []
+        for circle in circles:
+            recipient = recipients[circle.id]
+            row = totals.get(circle.id, {'total': ZERO, 'paid': 0})
+            reference = circle_payout_reference(circle.id, circle.current_cycle) if row['total'] else ''
+            if row['total']:
+                # A debit of the pot plan, so it is the owner's; the recipient
+                # is recorded on the CirclePayout.
+                withdrawals.append(Transaction(
+                    user_id=circle.owner_id,
+                    savings_plan_id=circle.savings_plan_id,
+                    type='Withdrawal',
+                    date_created=now,
+                    completed=True,
+                    amount=row['total'],
+                    fee=ZERO,
+                    amount_paid=row['total'],
+                    transaction_reference=reference,
+                ))
+            payouts.append(CirclePayout(circle_id=circle.id, cycle=circle.current_cycle, recipient=recipient,
+                                        amount=row['total'], contributions_paid=row['paid'],
+                                        transaction_reference=reference, date_created=now))
+
+        Transaction.objects.bulk_create(withdrawals)
+        record_transactions(Transaction.objects.filter(
+            type='Withdrawal',
+            transaction_reference__in=[withdrawal.transaction_reference for withdrawal in withdrawals],
+        ))
+        CirclePayout.objects.bulk_create(payouts)
+
+        groups = defaultdict(list)
+        for circle in circles:
+            if circle.current_cycle + 1 < circle.member_count:
+                next_date = next_payout_after(circle.frequency, circle.next_close_date,
+                                              circle.date_started or circle.next_close_date)
+            else:
+                # Every member has received the pot once.
+                next_date = None
+            groups[next_date].append(circle.id)
+        for next_date, group in groups.items():
+            Circle.objects.filter(id__in=group).update(
+                current_cycle=F('current_cycle') + 1,
+                next_close_date=next_date,
+                active=next_date is not None,
+            )
+        user_ids = [circle.owner_id for circle in circles] + [member.user_id for member in recipients.values()]
+        transaction.on_commit(lambda: bump_user_versions(user_ids))
+    return len(circles)
+
+
+def close_due_cycles(today=None, batch_size=500):
+    """Close every cycle due on or before ``today``; returns how many were closed."""
+    today = today or timezone.localdate()
+    total = 0
+    while True:
+        closed = close_cycle_batch(today, batch_size)
+        if not closed:
+            return total
+        total += closed
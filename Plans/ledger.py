@@ -0,0 +1,179 @@
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import ArchivedTransaction, BalanceSnapshot, LedgerEntry, SavingsPlan, Transaction
+
+ZERO = Decimal('0.00')
+
+
+def postings(transaction):
+    """
+    Yield ``(account, amount)`` pairs for a completed transaction. A deposit
+    moves the amount paid out of Funding into the plan and the fee account;
+    a withdrawal moves money out of the plan into Payouts.
+    """
+    if transaction['type'] == 'Deposit':
+        yield 'Plan', transaction['amount']
+        yield 'Fees', transaction['fee']
+        yield 'Funding', -transaction['amount_paid']
+    else:
+        yield 'Plan', -transaction['amount']
+        yield 'Payouts', transaction['amount']
+
+
+def record_transactions(transactions):
+    """
+    Post ledger entries for the given completed transactions in one bulk
+    insert. ``transactions`` is a Transaction queryset. Transactions that
+    were already posted are skipped by the unique (transaction, account)
+    constraint.
+    """
+    now = timezone.now()
+    entries = [
+        LedgerEntry(
+            savings_plan_id=row['savings_plan_id'],
+            transaction_id=row['id'],
+            account=account,
+            amount=amount,
+            date_created=now,
+        )
+        for row in transactions.filter(completed=True).values(
+            'id', 'savings_plan_id', 'type', 'amount', 'fee', 'amount_paid')
+        for account, amount in postings(row)
+        if amount
+    ]
+    LedgerEntry.objects.bulk_create(entries, ignore_conflicts=True)
+    return len(entries)
+
+
+def plan_balance(savings_plan_id):
+    """
+    Current balance of a plan: its snapshot plus the entries posted since.
+    Snapshots are refreshed by the snapshot_balances command, so the delta
+    stays short however long the plan has been running.
+    """
+    snapshot = BalanceSnapshot.objects.filter(savings_plan_id=savings_plan_id) \
+        .values('balance', 'last_entry_id').first() or {'balance': ZERO, 'last_entry_id': 0}
+    delta = LedgerEntry.objects.filter(
+        savings_plan_id=savings_plan_id,
+        account='Plan',
+        id__gt=snapshot['last_entry_id'],
+    ).aggregate(total=Sum('amount'))['total'] or ZERO
+    return snapshot['balance'] + delta
+
+
+def available_to_withdraw(plan, balance):
+    """The payout the plan may release now: its next payout once it is due."""
+    if not plan.active or plan.next_payout_date is None or plan.next_payout_date > timezone.localdate():
+        return ZERO
+    return max(min(plan.set_payout, balance), ZERO)
+
+
+def settled_high_water():
+    """
+    The highest ledger entry id below which no entry can still appear.
+
+    The newest committed id alone is not safe on PostgreSQL: ids are drawn
+    from the sequence before commit, so a transaction still in flight may
+    commit an entry with a lower id afterwards, and a snapshot past it
+    would leave that entry out of every balance for good. Every INSERT
+    holds the table's ROW EXCLUSIVE lock until its transaction ends, so
+    once an EXCLUSIVE lock is granted every id drawn so far is committed
+    or rolled back, and later inserts draw higher ids. The lock is
+    released as soon as the id is read; readers are never blocked.
+    SQLite runs one write transaction at a time, so ids commit in order.
+    """
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(f'LOCK TABLE {connection.ops.quote_name(LedgerEntry._meta.db_table)} '
+                               f'IN EXCLUSIVE MODE')
+        return LedgerEntry.objects.order_by('-id').values_list('id', flat=True).first()
+
+
+def refresh_snapshots(batch_size=10000):
+    """
+    Roll every snapshot forward from its own watermark to the settled high
+    water mark (see ``settled_high_water``), creating snapshots for plans
+    that have none. Work is split into plan id ranges and each range is
+    one INSERT plus one UPDATE.
+    """
+    high_water = settled_high_water()
+    if high_water is None:
+        return 0
+    last_plan = SavingsPlan.objects.order_by('-id').values_list('id', flat=True).first() or 0
+    updated = 0
+    for start in range(0, last_plan + 1, batch_size):
+        plan_range = {'savings_plan_id__gte': start, 'savings_plan_id__lt': start + batch_size}
+        plan_ids = LedgerEntry.objects.filter(**plan_range, account='Plan', id__lte=high_water) \
+            .values_list('savings_plan_id', flat=True).distinct()
+        BalanceSnapshot.objects.bulk_create(
+            [BalanceSnapshot(savings_plan_id=plan_id) for plan_id in plan_ids],
+            ignore_conflicts=True,
+        )
+        delta = LedgerEntry.objects.filter(
+            savings_plan_id=OuterRef('savings_plan_id'),
+            account='Plan',
+            id__gt=OuterRef('last_entry_id'),
+            id__lte=high_water,
+        ).values('savings_plan_id').annotate(total=Sum('amount')).values('total')
+        updated += BalanceSnapshot.objects.filter(**plan_range, last_entry_id__lt=high_water).update(
+            balance=F('balance') + Coalesce(Subquery(delta), Value(ZERO)),
+            last_entry_id=high_water,
+        )
+    return updated
+
+
+def transaction_totals(plan_range, type):
+    """Completed transaction amounts of ``type`` per plan, archived ones included."""
+    totals = {}
+    for model in (Transaction, ArchivedTransaction):
+        rows = model.objects.filter(**plan_range, completed=True, type=type) \
+            .values('savings_plan_id').annotate(total=Sum('amount')) \
+            .values_list('savings_plan_id', 'total')
+        for plan_id, total in rows:
+            totals[plan_id] = totals.get(plan_id, ZERO) + total
+    return totals
+
+
+def ledger_drift(batch_size=10000):
+    """
+    Re-derive balances in bulk and yield ``(savings_plan_id, problem)`` for
+    every plan whose ledger disagrees with its snapshot or transactions,
+    and for every transaction whose postings do not balance.
+    """
+    unbalanced = LedgerEntry.objects.values('transaction_id', 'savings_plan_id') \
+        .annotate(total=Sum('amount')).exclude(total=0)
+    for row in unbalanced.iterator():
+        yield row['savings_plan_id'], f'transaction {row["transaction_id"]} postings sum to {row["total"]}'
+
+    last_plan = SavingsPlan.objects.order_by('-id').values_list('id', flat=True).first() or 0
+    for start in range(0, last_plan + 1, batch_size):
+        plan_range = {'savings_plan_id__gte': start, 'savings_plan_id__lt': start + batch_size}
+        ledger = dict(
+            LedgerEntry.objects.filter(**plan_range, account='Plan')
+            .values('savings_plan_id').annotate(total=Sum('amount'))
+            .values_list('savings_plan_id', 'total')
+        )
+        deposits = transaction_totals(plan_range, 'Deposit')
+        withdrawals = transaction_totals(plan_range, 'Withdrawal')
+        for plan_id in set(ledger) | set(deposits) | set(withdrawals):
+            expected = deposits.get(plan_id, ZERO) - withdrawals.get(plan_id, ZERO)
+            if ledger.get(plan_id, ZERO) != expected:
+                yield plan_id, f'ledger balance {ledger.get(plan_id, ZERO)} != transactions {expected}'
+
+        snapshot_at = LedgerEntry.objects.filter(
+            savings_plan_id=OuterRef('savings_plan_id'),
+            account='Plan',
+            id__lte=OuterRef('last_entry_id'),
+        ).values('savings_plan_id').annotate(total=Sum('amount')).values('total')
+        snapshots = BalanceSnapshot.objects.filter(**plan_range) \
+            .annotate(derived=Coalesce(Subquery(snapshot_at), Value(ZERO))) \
+            .exclude(balance=F('derived')) \
+            .values_list('savings_plan_id', 'balance', 'derived')
+        for plan_id, balance, derived in snapshots:
+            yield plan_id, f'snapshot balance {balance} != ledger {derived}'
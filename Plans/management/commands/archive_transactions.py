@@ -0,0 +1,36 @@
+import time
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from Plans.archive import archive_cutoff, archive_transactions
+from Plans.queries import date_range_bounds
+
+
+class Command(BaseCommand):
+    help = (
+        'Move completed transactions older than TRANSACTION_ARCHIVE_AFTER_DAYS '
+        'into the archive table in batches.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', type=date.fromisoformat,
+                            help='Archive only transactions created before this date (YYYY-MM-DD); '
+                                 'it may not be later than the configured horizon.')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Transactions moved per database transaction.')
+        parser.add_argument('--max-batches', type=int, help='Stop after this many batches.')
+
+    def handle(self, *args, **options):
+        cutoff = archive_cutoff()
+        if options['before']:
+            before = date_range_bounds(options['before'], options['before'])[0]
+            if before > cutoff:
+                horizon = timezone.localdate() - timedelta(days=settings.TRANSACTION_ARCHIVE_AFTER_DAYS)
+                raise CommandError(f'--before may not be later than the archive horizon ({horizon}).')
+            cutoff = before
+        started = time.monotonic()
+        moved = archive_transactions(cutoff, batch_size=options['batch_size'], max_batches=options['max_batches'])
+        self.stdout.write(f'archived {moved} transactions created before {cutoff:%Y-%m-%d} '
+                          f'in {time.monotonic() - started:.1f}s')
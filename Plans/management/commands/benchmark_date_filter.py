@@ -0,0 +1,138 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from Account.models import User
+from Plans.models import SavingsPlan, Transaction
+from Plans.queries import date_range_bounds
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed synthetic transactions and compare the query plan and latency of '
+        'the old date-cast filter with the indexed half-open range filter. '
+        'Run it against a scratch database: it writes --rows transactions.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=2_000_000)
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--days', type=int, default=3 * 365)
+        parser.add_argument('--batch-size', type=int, default=10_000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--window', type=int, default=30, help='Days covered by the filtered range.')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--skip-seed', action='store_true', help='Reuse rows from a previous run.')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        if not options['skip_seed']:
+            self.seed(rng, options)
+
+        user = User.objects.filter(username__startswith='bench_date_').order_by('id').first()
+        if user is None:
+            self.stderr.write('No benchmark users found; run without --skip-seed first.')
+            return
+
+        end_date = timezone.localdate()
+        start_date = end_date - timedelta(days=options['window'] - 1)
+        start, end = date_range_bounds(start_date, end_date)
+
+        before = Transaction.objects.filter(
+            user=user,
+            date_created__date__gte=start_date,
+            date_created__date__lt=end_date + timedelta(days=1),
+        )
+        after = Transaction.objects.filter(
+            user=user,
+            date_created__gte=start,
+            date_created__lt=end,
+        ).order_by('date_created', 'id')
+
+        # .all() hands out a fresh queryset so nothing is served from the
+        # result cache of a previous iteration.
+        def run_before():
+            rows = list(before.all())
+            return before.all().count(), rows
+
+        def run_after():
+            rows = list(after.all())
+            return len(rows), rows
+
+        for label, queryset, runner in (('before', before, run_before), ('after', after, run_after)):
+            self.stdout.write(self.style.MIGRATE_HEADING(f'== {label}'))
+            self.stdout.write(str(queryset.query))
+            self.stdout.write(queryset.explain())
+            timings = []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                count, _rows = runner()
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            p95 = timings[max(0, int(len(timings) * 0.95) - 1)]
+            self.stdout.write(
+                f'rows={count} median={statistics.median(timings):.2f}ms '
+                f'p95={p95:.2f}ms min={timings[0]:.2f}ms'
+            )
+
+    def seed(self, rng, options):
+        password = make_password(None)
+        now = timezone.now()
+        User.objects.bulk_create([
+            User(
+                username=f'bench_date_{i}',
+                email=f'bench_date_{i}@example.com',
+                password=password,
+                date_joined=now,
+            )
+            for i in range(options['users'])
+        ], batch_size=options['batch_size'])
+        users = list(User.objects.filter(username__startswith='bench_date_').order_by('id'))
+        SavingsPlan.objects.bulk_create([
+            SavingsPlan(
+                user=user,
+                name=f'bench {user.pk}',
+                plan_id=f'B{user.pk}',
+                frequency='Daily',
+                total_amount=Decimal('100000.00'),
+                set_payout=Decimal('1000.00'),
+                remaining_balance=Decimal('100000.00'),
+            )
+            for user in users
+        ], batch_size=options['batch_size'])
+        plans = list(SavingsPlan.objects.filter(user__in=users).order_by('user_id'))
+
+        # The first user gets a heavy share so the measured user looks like
+        # one of our long-running daily savers.
+        weights = [len(plans)] + [1] * (len(plans) - 1)
+        horizon = options['days'] * 86400
+        written = 0
+        while written < options['rows']:
+            size = min(options['batch_size'], options['rows'] - written)
+            batch = []
+            for plan in rng.choices(plans, weights=weights, k=size):
+                amount = Decimal(rng.randint(100, 50_000))
+                batch.append(Transaction(
+                    user_id=plan.user_id,
+                    savings_plan=plan,
+                    type=rng.choice(('Deposit', 'Withdrawal')),
+                    date_created=now - timedelta(seconds=rng.randrange(horizon)),
+                    completed=rng.random() < 0.9,
+                    amount=amount,
+                    fee=Decimal('100.00'),
+                    amount_paid=amount + 100,
+                    transaction_reference=f'bench-{written + len(batch)}',
+                ))
+            Transaction.objects.bulk_create(batch)
+            written += size
+            self.stdout.write(f'seeded {written}/{options["rows"]} transactions', ending='\r')
+        self.stdout.write('')
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
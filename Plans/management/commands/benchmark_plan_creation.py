@@ -0,0 +1,68 @@
+import time
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from Account.models import User
+from Plans.models import SavingsPlan
+from Plans.plan_ids import allocate_plan_id
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure create_savings_plan throughput with 1k, 100k and 1M existing '
+        'plans. Run it against a scratch database: it writes the seed plans.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 100_000, 1_000_000])
+        parser.add_argument('--creates', type=int, default=500, help='Plans created through the API per size.')
+        parser.add_argument('--batch-size', type=int, default=10_000)
+
+    def handle(self, *args, **options):
+        user, _ = User.objects.get_or_create(
+            username='bench_plans',
+            defaults={'email': 'bench_plans@example.com', 'password': make_password(None),
+                      'date_joined': timezone.now()},
+        )
+        client = APIClient()
+        client.force_authenticate(user)
+        body = {'name': 'bench', 'frequency': 'Daily', 'total_amount': '1000.00', 'set_payout': '100.00'}
+
+        for size in sorted(options['sizes']):
+            self.seed(user, size, options['batch_size'])
+            reset_queries()
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                for _ in range(options['creates']):
+                    response = client.post('/Plans/savings-plans/', body, format='json', HTTP_HOST='localhost')
+                    assert response.status_code == 201, response.content
+                elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'existing={SavingsPlan.objects.count() - options["creates"]:>9} '
+                f'creates={options["creates"]} {options["creates"] / elapsed:8.1f} plans/s '
+                f'queries/create={len(queries) / options["creates"]:.2f}'
+            )
+
+    def seed(self, user, size, batch_size):
+        missing = size - SavingsPlan.objects.count()
+        while missing > 0:
+            count = min(batch_size, missing)
+            SavingsPlan.objects.bulk_create([
+                SavingsPlan(
+                    user=user,
+                    name='seed',
+                    plan_id=allocate_plan_id(),
+                    frequency='Daily',
+                    total_amount=Decimal('1000.00'),
+                    set_payout=Decimal('100.00'),
+                    remaining_balance=Decimal('1000.00'),
+                )
+                for _ in range(count)
+            ])
+            missing -= count
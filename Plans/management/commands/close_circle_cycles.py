@@ -0,0 +1,27 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from Plans.circles import close_due_cycles
+
+
+class Command(BaseCommand):
+    help = 'Close the current cycle of every savings circle whose close date has arrived and pay out its pot.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', type=date.fromisoformat, help='Run as of this date (YYYY-MM-DD).')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--watch', action='store_true', help='Keep running and poll for due circles.')
+        parser.add_argument('--interval', type=int, default=60, help='Seconds between polls with --watch.')
+
+    def handle(self, *args, **options):
+        while True:
+            today = options['date'] or timezone.localdate()
+            started = time.monotonic()
+            closed = close_due_cycles(today, batch_size=options['batch_size'])
+            self.stdout.write(f'{today}: closed {closed} circle cycles in {time.monotonic() - started:.1f}s')
+            if not options['watch']:
+                return
+            time.sleep(options['interval'])
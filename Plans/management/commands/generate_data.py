@@ -0,0 +1,283 @@
+import math
+import multiprocessing
+import random
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from decimal import ROUND_UP, Decimal
+
+from allauth.account.models import EmailAddress
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+from django.utils import timezone
+
+from Account.models import User
+from Plans.ledger import record_transactions, refresh_snapshots
+from Plans.models import SavingsPlan, Transaction
+from Plans.payouts import first_payout_date, next_payout_after, payout_reference
+from Plans.plan_ids import LAST_PLAN_NUMBER, encode_plan_id, reserve_block
+
+FEE = Decimal('100.00')
+ZERO = Decimal('0.00')
+CENT = Decimal('0.01')
+TRANSACTION_FIELDS = ('type', 'completed', 'date_created', 'amount', 'fee', 'amount_paid', 'transaction_reference')
+# Payout counts drawn uniformly per frequency, roughly one to six months of
+# daily saving, two months to a year of weekly and a quarter to two years
+# of monthly.
+PAYOUT_RANGES = {
+    'Daily': (30, 180),
+    'Weekly': (8, 52),
+    'Monthly': (3, 24),
+}
+FIRST_NAMES = ('Ada', 'Bola', 'Chidi', 'Dayo', 'Emeka', 'Funmi', 'Gbenga', 'Halima', 'Ifeoma', 'Kunle',
+               'Ngozi', 'Segun', 'Tunde', 'Uche', 'Yetunde', 'Zainab')
+LAST_NAMES = ('Adeyemi', 'Bello', 'Eze', 'Ibrahim', 'Nwosu', 'Obi', 'Okafor', 'Okonkwo', 'Olawale', 'Usman')
+
+
+def frequency_weights(value):
+    """Parse ``Daily=2,Weekly=5,Monthly=3`` into (frequencies, weights)."""
+    try:
+        pairs = [item.split('=') for item in value.split(',')]
+        weights = {name.strip(): float(weight) for name, weight in pairs}
+    except ValueError:
+        raise CommandError(f'Invalid --frequencies {value!r}; expected e.g. Daily=2,Weekly=5,Monthly=3')
+    unknown = set(weights) - set(PAYOUT_RANGES)
+    if unknown or not any(weights.values()):
+        raise CommandError(f'Invalid --frequencies {value!r}')
+    return list(weights), list(weights.values())
+
+
+@contextmanager
+def explicit_timestamps(*fields):
+    """Let bulk_create keep backdated values for ``auto_now_add`` fields."""
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def build_plan(rng, user, plan_number, options, as_of, now):
+    """
+    Return a plan for ``user`` and its transactions: the checkout deposit
+    and, once the deposit went through, every payout that would have been
+    made up to ``as_of``, leaving the plan's counters where run_payouts
+    would have left them. Transactions are ``TRANSACTION_FIELDS`` tuples
+    without the user and plan ids, which are only known after insert.
+    """
+    frequency = rng.choices(options['frequency_names'], options['frequency_weights'])[0]
+    low, high = PAYOUT_RANGES[frequency]
+    total = Decimal(max(1, round(options['amount_median'] * math.exp(rng.gauss(0, options['amount_sigma'])), -2)))
+    total = total.quantize(CENT)
+    set_payout = (total / rng.randint(low, high)).quantize(CENT, rounding=ROUND_UP)
+    number_of_payouts = int((total / set_payout).to_integral_value(rounding=ROUND_UP))
+    span = max(0.0, (now - user.date_joined).total_seconds())
+    date_created = user.date_joined + timedelta(seconds=rng.uniform(0, span))
+
+    plan = SavingsPlan(
+        user=user, name=f'{frequency} savings {plan_number % 1000}', date_created=date_created,
+        plan_id=encode_plan_id(plan_number), frequency=frequency, total_amount=total, set_payout=set_payout,
+        remaining_balance=total, number_of_payouts=number_of_payouts, number_of_payouts_left=number_of_payouts,
+    )
+    funded = rng.random() < options['funded']
+    deposited = date_created + timedelta(seconds=rng.randint(30, 600))
+    transactions = [('Deposit', funded, deposited, total, FEE, total + FEE, f'{rng.getrandbits(64):016x}')]
+    if not funded:
+        return plan, transactions
+
+    plan.active = True
+    plan.date_started = timezone.localtime(deposited).date()
+    payout_date = first_payout_date(frequency, plan.date_started)
+    tz = timezone.get_current_timezone()
+    while plan.number_of_payouts_left and payout_date <= as_of:
+        amount = min(set_payout, plan.remaining_balance)
+        paid_at = datetime.combine(payout_date, datetime.min.time(), tz) + timedelta(seconds=rng.randint(0, 3600))
+        transactions.append(('Withdrawal', True, paid_at, amount, ZERO, amount,
+                             payout_reference(plan.plan_id, payout_date)))
+        plan.remaining_balance -= amount
+        plan.number_of_payouts_left -= 1
+        payout_date = next_payout_after(frequency, payout_date, plan.date_started)
+    plan.next_payout_date = payout_date if plan.number_of_payouts_left else None
+    plan.active = plan.number_of_payouts_left > 0
+    return plan, transactions
+
+
+def insert_transactions(rows, batch_size):
+    """
+    Insert ``('user', 'savings_plan', *TRANSACTION_FIELDS)`` tuples with
+    executemany. Building and compiling a model instance per row costs
+    bulk_create far more than the insert itself at these volumes.
+    """
+    fields = [Transaction._meta.get_field(name) for name in ('user', 'savings_plan') + TRANSACTION_FIELDS]
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        connection.ops.quote_name(Transaction._meta.db_table),
+        ', '.join(connection.ops.quote_name(field.column) for field in fields),
+        ', '.join(['%s'] * len(fields)),
+    )
+    adapt = connection.ops.adapt_datetimefield_value
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            cursor.executemany(sql, [
+                (user_id, plan_id, kind, completed, adapt(created), amount, fee, paid, reference)
+                for user_id, plan_id, kind, completed, created, amount, fee, paid, reference
+                in rows[start:start + batch_size]
+            ])
+
+
+def generate_chunk(chunk, options):
+    """
+    Write users ``chunk * chunk_size`` onwards with their email addresses,
+    plans and transactions in one database transaction.
+
+    Every chunk draws from its own ``Random`` seeded with ``(seed, chunk)``
+    and numbers its plans from its own slice of the reserved plan id block,
+    so its rows are the same whichever process writes it and in what order.
+    """
+    started = time.monotonic()
+    rng = random.Random(f'{options["seed"]}:{chunk}')
+    as_of = options['as_of']
+    now = timezone.make_aware(datetime.combine(as_of, datetime.max.time().replace(microsecond=0)))
+    horizon = options['years'] * 365 * 86400
+    first = chunk * options['chunk_size']
+    last = min(first + options['chunk_size'], options['users'])
+    batch_size = options['batch_size']
+
+    if connection.vendor == 'sqlite' and not connection.in_atomic_block:
+        with connection.cursor() as cursor:
+            # Parallel workers queue on SQLite's single writer lock.
+            cursor.execute('PRAGMA busy_timeout = 600000')
+            cursor.execute('PRAGMA synchronous = OFF')
+
+    users = []
+    for number in range(first, last):
+        username = f'{options["prefix"]}{number:07d}'
+        date_joined = now - timedelta(seconds=rng.uniform(0, horizon))
+        verified = rng.random() < options['verified']
+        users.append(User(
+            username=username, email=f'{username}@example.com', password=options['password'],
+            first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES),
+            phone_number=f'+2340{options["phone_base"] + number:09d}',
+            date_of_birth=date(1960, 1, 1) + timedelta(days=rng.randrange(45 * 365)),
+            date_joined=date_joined, verified=verified,
+            verification_date=date_joined + timedelta(hours=rng.uniform(0, 72)) if verified else None,
+        ))
+
+    plans, transactions = [], []
+    plan_number = options['plan_base'] + first * options['max_plans']
+    for user in users:
+        count = min(options['max_plans'], round(rng.expovariate(1 / options['plans_per_user'])))
+        for offset in range(count):
+            plan, history = build_plan(rng, user, plan_number + offset, options, as_of, now)
+            plans.append(plan)
+            transactions.append(history)
+        plan_number += options['max_plans']
+
+    with transaction.atomic():
+        User.objects.bulk_create(users, batch_size=batch_size)
+        EmailAddress.objects.bulk_create([
+            EmailAddress(user=user, email=user.email, verified=True, primary=True) for user in users
+        ], batch_size=batch_size)
+        # Plans were built against unsaved users; bulk_create picks up the ids
+        # the users were given by the insert above.
+        SavingsPlan.objects.bulk_create(plans, batch_size=batch_size)
+        rows = [(plan.user_id, plan.pk, *row) for plan, history in zip(plans, transactions) for row in history]
+        insert_transactions(rows, batch_size)
+        entries = 0
+        if options['ledger']:
+            entries = record_transactions(Transaction.objects.filter(user_id__in=[user.pk for user in users]))
+    return {
+        'users': len(users), 'plans': len(plans), 'transactions': len(rows),
+        'entries': entries, 'seconds': time.monotonic() - started,
+    }
+
+
+def run_chunk(args):
+    return generate_chunk(*args)
+
+
+class Command(BaseCommand):
+    help = (
+        'Bulk-generate synthetic users, savings plans and transactions for load '
+        'and query testing. Output is deterministic for a given --seed, --as-of '
+        'and set of distribution options: usernames, amounts, dates and references '
+        'are the same on every run, plan ids too when the plan id sequence starts '
+        'at the same value, and only surrogate primary keys depend on insert order '
+        'when --workers is above 1. Run it against a scratch database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10_000)
+        parser.add_argument('--plans-per-user', type=float, default=3.0,
+                            help='Mean of the exponential distribution of plans per user.')
+        parser.add_argument('--max-plans', type=int, default=20, help='Upper bound on plans per user.')
+        parser.add_argument('--frequencies', default='Daily=2,Weekly=5,Monthly=3',
+                            help='Relative weights of the plan frequencies.')
+        parser.add_argument('--amount-median', type=float, default=200_000,
+                            help='Median plan total in naira; totals are log-normal around it.')
+        parser.add_argument('--amount-sigma', type=float, default=1.0, help='Log-normal spread of plan totals.')
+        parser.add_argument('--funded', type=float, default=0.85,
+                            help='Share of plans whose deposit completed; the rest stay pending.')
+        parser.add_argument('--verified', type=float, default=0.7, help='Share of users with a verified BVN.')
+        parser.add_argument('--years', type=float, default=3.0, help='How far back users joined.')
+        parser.add_argument('--as-of', type=date.fromisoformat, help='Generate history up to this date (YYYY-MM-DD).')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--prefix', default='gen', help='Username prefix; must not be in use yet.')
+        parser.add_argument('--password', default='password', help='Password of every generated user.')
+        parser.add_argument('--workers', type=int, default=1, help='Processes writing chunks in parallel.')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Users per chunk and per transaction.')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per INSERT.')
+        parser.add_argument('--ledger', action='store_true',
+                            help='Also post ledger entries and refresh balance snapshots.')
+
+    def handle(self, *args, **options):
+        if User.objects.filter(username__startswith=options['prefix']).exists():
+            raise CommandError(f'Users prefixed {options["prefix"]!r} already exist; pick another --prefix.')
+        options['frequency_names'], options['frequency_weights'] = frequency_weights(options['frequencies'])
+        options['as_of'] = options['as_of'] or timezone.localdate()
+        # Hashing is deliberately slow, so every user shares one hash.
+        options['password'] = make_password(options['password'])
+        # One block covers every plan any user could get, so plan ids follow
+        # from the user number alone.
+        options['plan_base'] = reserve_block(options['users'] * options['max_plans'])
+        if options['plan_base'] + options['users'] * options['max_plans'] - 1 > LAST_PLAN_NUMBER:
+            raise CommandError('Not enough plan ids left for this many users.')
+        options['phone_base'] = random.Random(f'{options["seed"]}:{options["prefix"]}').randrange(10 ** 8)
+        options = {key: value for key, value in options.items()
+                   if key not in ('stdout', 'stderr', 'skip_checks')}
+
+        chunks = [(chunk, options) for chunk in range(math.ceil(options['users'] / options['chunk_size']))]
+        totals = {'users': 0, 'plans': 0, 'transactions': 0, 'entries': 0}
+        started = time.monotonic()
+        fields = (SavingsPlan._meta.get_field('date_created'), User._meta.get_field('date_joined'))
+        with explicit_timestamps(*fields):
+            if options['workers'] > 1:
+                # Children must open their own connections after the fork.
+                connections.close_all()
+                with multiprocessing.get_context('fork').Pool(options['workers']) as pool:
+                    results = pool.imap_unordered(run_chunk, chunks)
+                    self.report(results, totals, started)
+            else:
+                self.report(map(run_chunk, chunks), totals, started)
+        if options['ledger']:
+            refresh_snapshots()
+
+        elapsed = time.monotonic() - started
+        rows = totals['users'] + totals['plans'] + totals['transactions'] + totals['entries']
+        self.stdout.write(
+            f'generated {totals["users"]} users, {totals["plans"]} plans, {totals["transactions"]} transactions '
+            f'and {totals["entries"]} ledger entries in {elapsed:.1f}s ({rows / elapsed:,.0f} rows/s)'
+        )
+
+    def report(self, results, totals, started):
+        for result in results:
+            for key in totals:
+                totals[key] += result[key]
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f'{totals["users"]} users  {totals["transactions"]} transactions  '
+                f'{totals["transactions"] / elapsed:,.0f} transactions/s', ending='\r'
+            )
+        self.stdout.write('')
@@ -0,0 +1,27 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from Plans.payouts import run_due_payouts
+
+
+class Command(BaseCommand):
+    help = 'Pay out every active savings plan whose next payout date has arrived.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', type=date.fromisoformat, help='Run as of this date (YYYY-MM-DD).')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--watch', action='store_true', help='Keep running and poll for due plans.')
+        parser.add_argument('--interval', type=int, default=60, help='Seconds between polls with --watch.')
+
+    def handle(self, *args, **options):
+        while True:
+            today = options['date'] or timezone.localdate()
+            started = time.monotonic()
+            paid = run_due_payouts(today, batch_size=options['batch_size'])
+            self.stdout.write(f'{today}: paid out {paid} plans in {time.monotonic() - started:.1f}s')
+            if not options['watch']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from Plans.ledger import refresh_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Roll plan balance snapshots forward to the latest ledger entry.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000, help='Plans per UPDATE.')
+
+    def handle(self, *args, **options):
+        updated = refresh_snapshots(batch_size=options['batch_size'])
+        self.stdout.write(f'refreshed {updated} balance snapshots')
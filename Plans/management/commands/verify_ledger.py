@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from Plans.ledger import ledger_drift
+
+
+class Command(BaseCommand):
+    help = 'Re-derive plan balances from the ledger and transactions and report any drift.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000, help='Plans per aggregate query.')
+
+    def handle(self, *args, **options):
+        problems = 0
+        for plan_id, problem in ledger_drift(batch_size=options['batch_size']):
+            problems += 1
+            self.stdout.write(f'plan {plan_id}: {problem}')
+        if problems:
+            raise CommandError(f'{problems} ledger discrepancies found')
+        self.stdout.write(self.style.SUCCESS('ledger is consistent'))
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.14 on 2026-10-18 11:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Plans', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='savingsplan',
+            index=models.Index(fields=['user', 'date_created', 'id'], name='plan_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'date_created', 'id'], name='txn_user_created_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.0.14 on 2026-10-18 11:08
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Plans', '0003_transaction_filter_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='savingsplan',
+            name='next_payout_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='savingsplan',
+            index=models.Index(condition=models.Q(('active', True)), fields=['next_payout_date', 'id'], name='plan_due_payout_idx'),
+        ),
+    ]
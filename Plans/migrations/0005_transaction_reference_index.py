@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-18 11:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Plans', '0004_savingsplan_next_payout_date'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='transaction',
+            name='transaction_reference',
+            field=models.CharField(db_index=True, max_length=250),
+        ),
+    ]
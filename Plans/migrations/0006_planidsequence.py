@@ -0,0 +1,27 @@
+# Generated by Django 5.0.14 on 2026-10-18 11:11
+
+from django.db import migrations, models
+
+
+def create_plan_id_sequence(apps, schema_editor):
+    PlanIdSequence = apps.get_model('Plans', 'PlanIdSequence')
+    PlanIdSequence.objects.get_or_create(name='plan_id', defaults={'next_value': 10000})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Plans', '0005_transaction_reference_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlanIdSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('next_value', models.PositiveBigIntegerField()),
+            ],
+        ),
+        migrations.RunPython(create_plan_id_sequence, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.0.14 on 2026-10-18 11:15
+
+import django.db.models.deletion
+import django.utils.timezone
+from decimal import Decimal
+from django.db import migrations, models
+
+
+def post_completed_transactions(apps, schema_editor):
+    Transaction = apps.get_model('Plans', 'Transaction')
+    LedgerEntry = apps.get_model('Plans', 'LedgerEntry')
+    entries = []
+    completed = Transaction.objects.filter(completed=True).values(
+        'id', 'savings_plan_id', 'type', 'amount', 'fee', 'amount_paid', 'date_created')
+    for row in completed.iterator(chunk_size=5000):
+        if row['type'] == 'Deposit':
+            postings = [('Plan', row['amount']), ('Fees', row['fee']), ('Funding', -row['amount_paid'])]
+        else:
+            postings = [('Plan', -row['amount']), ('Payouts', row['amount'])]
+        entries.extend(
+            LedgerEntry(savings_plan_id=row['savings_plan_id'], transaction_id=row['id'],
+                        account=account, amount=amount, date_created=row['date_created'])
+            for account, amount in postings if amount
+        )
+        if len(entries) >= 5000:
+            LedgerEntry.objects.bulk_create(entries, ignore_conflicts=True)
+            entries = []
+    LedgerEntry.objects.bulk_create(entries, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Plans', '0006_planidsequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BalanceSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('balance', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('last_entry_id', models.BigIntegerField(default=0)),
+                ('date_updated', models.DateTimeField(auto_now=True)),
+                ('savings_plan', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='balance_snapshot', to='Plans.savingsplan')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('account', models.CharField(choices=[('Plan', 'Plan'), ('Funding', 'Funding'), ('Fees', 'Fees'), ('Payouts', 'Payouts')], max_length=20)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('date_created', models.DateTimeField(default=django.utils.timezone.now)),
+                ('savings_plan', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entries', to='Plans.savingsplan')),
+                ('transaction', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='ledger_entries', to='Plans.transaction')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['savings_plan', 'account', 'id'], name='ledger_plan_account_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='ledgerentry',
+            constraint=models.UniqueConstraint(fields=('transaction', 'account'), name='unique_ledger_posting'),
+        ),
+        migrations.RunPython(post_completed_transactions, migrations.RunPython.noop),
+    ]
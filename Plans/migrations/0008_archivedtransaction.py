@@ -0,0 +1,36 @@
+# Generated by Django 5.0.14 on 2026-10-18 11:48
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Plans', '0007_ledger'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedTransaction',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('type', models.CharField(choices=[('Deposit', 'Deposit'), ('Withdrawal', 'Withdrawal')], max_length=30)),
+                ('date_created', models.DateTimeField()),
+                ('completed', models.BooleanField(default=True)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('fee', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('amount_paid', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('transaction_reference', models.CharField(db_index=True, max_length=250)),
+                ('date_archived', models.DateTimeField(default=django.utils.timezone.now)),
+                ('savings_plan', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='savings_plan_archived_transaction', to='Plans.savingsplan')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_archived_transactions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'date_created', 'id'], name='archived_user_created_idx')],
+            },
+        ),
+    ]
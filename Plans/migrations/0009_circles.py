@@ -0,0 +1,97 @@
+# Generated by Django 5.0.14 on 2026-10-18 12:07
+
+import django.core.validators
+import django.db.models.deletion
+import django.utils.timezone
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Plans', '0008_archivedtransaction'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Circle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=250)),
+                ('frequency', models.CharField(choices=[('Daily', 'Daily'), ('Weekly', 'Weekly'), ('Monthly', 'Monthly')], max_length=30)),
+                ('contribution', models.DecimalField(decimal_places=2, max_digits=12, validators=[django.core.validators.MinValueValidator(Decimal('0.01'))])),
+                ('member_count', models.PositiveIntegerField(default=0)),
+                ('current_cycle', models.PositiveIntegerField(default=0)),
+                ('active', models.BooleanField(default=False)),
+                ('date_started', models.DateField(blank=True, null=True)),
+                ('next_close_date', models.DateField(blank=True, null=True)),
+                ('date_created', models.DateTimeField(auto_now_add=True)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='owned_circles', to=settings.AUTH_USER_MODEL)),
+                ('savings_plan', models.OneToOneField(on_delete=django.db.models.deletion.PROTECT, related_name='circle', to='Plans.savingsplan')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CircleMember',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField()),
+                ('date_joined', models.DateTimeField(auto_now_add=True)),
+                ('circle', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='members', to='Plans.circle')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='circle_memberships', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CircleContribution',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cycle', models.PositiveIntegerField()),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('transaction_reference', models.CharField(max_length=250, unique=True)),
+                ('status', models.CharField(choices=[('Pending', 'Pending'), ('Paid', 'Paid'), ('Missed', 'Missed')], default='Pending', max_length=20)),
+                ('date_created', models.DateTimeField(default=django.utils.timezone.now)),
+                ('date_paid', models.DateTimeField(blank=True, null=True)),
+                ('circle', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='contributions', to='Plans.circle')),
+                ('member', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='contributions', to='Plans.circlemember')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CirclePayout',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cycle', models.PositiveIntegerField()),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('contributions_paid', models.PositiveIntegerField()),
+                ('transaction_reference', models.CharField(blank=True, max_length=250)),
+                ('date_created', models.DateTimeField(default=django.utils.timezone.now)),
+                ('circle', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payouts', to='Plans.circle')),
+                ('recipient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payouts', to='Plans.circlemember')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='circle',
+            index=models.Index(condition=models.Q(('active', True)), fields=['next_close_date', 'id'], name='circle_due_close_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='circlemember',
+            constraint=models.UniqueConstraint(fields=('circle', 'position'), name='circle_member_position_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='circlemember',
+            constraint=models.UniqueConstraint(fields=('circle', 'user'), name='circle_member_user_uniq'),
+        ),
+        migrations.AddIndex(
+            model_name='circlecontribution',
+            index=models.Index(fields=['circle', 'cycle', 'status'], name='circle_contribution_cycle_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='circlecontribution',
+            index=models.Index(fields=['member', 'cycle'], name='circle_contribution_member_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='circlepayout',
+            constraint=models.UniqueConstraint(fields=('circle', 'cycle'), name='circle_payout_cycle_uniq'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.0.14 on 2026-10-18 12:26
+
+import django.core.validators
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Plans', '0009_circles'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='transaction',
+            name='fee',
+            field=models.DecimalField(decimal_places=2, max_digits=12, validators=[django.core.validators.MinValueValidator(Decimal('0.00'))]),
+        ),
+    ]
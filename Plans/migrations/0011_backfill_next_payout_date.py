@@ -0,0 +1,36 @@
+from django.db import migrations
+from django.utils import timezone
+
+from Plans.payouts import first_payout_date, first_payout_date_expression, next_payout_after
+
+
+def backfill_next_payout_date(apps, schema_editor):
+    """
+    Schedule the plans that were active before next_payout_date existed,
+    which run_payouts would otherwise never pay. Plans without a start date
+    get the rule of payment activation, as if activated today; the others
+    their next payout after today on their own schedule.
+    """
+    SavingsPlan = apps.get_model('Plans', 'SavingsPlan')
+    today = timezone.localdate()
+    unscheduled = SavingsPlan.objects.filter(active=True, number_of_payouts_left__gt=0, next_payout_date=None)
+    unscheduled.filter(date_started=None).update(
+        date_started=today,
+        next_payout_date=first_payout_date_expression(today),
+    )
+    for frequency, date_started in unscheduled.values_list('frequency', 'date_started').distinct().order_by():
+        payout_date = first_payout_date(frequency, date_started)
+        while payout_date <= today:
+            payout_date = next_payout_after(frequency, payout_date, date_started)
+        unscheduled.filter(frequency=frequency, date_started=date_started).update(next_payout_date=payout_date)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Plans', '0010_transaction_fee_validator'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_next_payout_date, migrations.RunPython.noop),
+    ]
@@ -2,6 +2,7 @@ from django.db import models
 from Account.models import User
 from django.core.validators import MinValueValidator
 from decimal import Decimal
+from django.utils import timezone
 
 class SavingsPlan(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='user_savings_plans')
@@ -33,6 +34,14 @@ class SavingsPlan(models.Model):
     number_of_payouts_left = models.PositiveIntegerField(default=0)
     active = models.BooleanField(default=False)
     date_started = models.DateField(blank=True, null=True)
+    next_payout_date = models.DateField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'date_created', 'id'], name='plan_user_created_idx'),
+            models.Index(fields=['next_payout_date', 'id'], condition=models.Q(active=True),
+                         name='plan_due_payout_idx'),
+        ]
 
     def __str__(self):
         return self.name + ' ' + self.user.first_name
@@ -53,18 +62,209 @@ class Transaction(models.Model):
         decimal_places= 2,
         validators=[MinValueValidator(Decimal('0.01'))]
     )
+    # Payouts carry no fee.
     fee = models.DecimalField(
         max_digits= 12,
         decimal_places= 2,
-        validators=[MinValueValidator(Decimal('0.01'))]
+        validators=[MinValueValidator(Decimal('0.00'))]
     )
     amount_paid = models.DecimalField(
         max_digits= 12,
         decimal_places= 2,
         validators=[MinValueValidator(Decimal('0.01'))]
     )
-    transaction_reference = models.CharField(max_length=250, blank=False, null=False)
+    transaction_reference = models.CharField(max_length=250, blank=False, null=False, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'date_created', 'id'], name='txn_user_created_idx'),
+            models.Index(fields=['user', 'type', 'date_created'], name='txn_user_type_created_idx'),
+            models.Index(fields=['user', 'completed', 'date_created'], name='txn_user_done_created_idx'),
+        ]
+
+    def __str__(self):
+        return self.type
+
+
+class PlanIdSequence(models.Model):
+    name = models.CharField(max_length=50, unique=True)
+    next_value = models.PositiveBigIntegerField()
+
+    def __str__(self):
+        return self.name
+
+
+class LedgerEntry(models.Model):
+    """
+    One immutable posting of a completed transaction. Every transaction
+    posts entries that sum to zero across accounts; the balance of a plan
+    is the sum of its ``Plan`` account entries.
+    """
+    account_choices = (
+        ('Plan', 'Plan'),
+        ('Funding', 'Funding'),
+        ('Fees', 'Fees'),
+        ('Payouts', 'Payouts'),
+    )
+    savings_plan = models.ForeignKey(SavingsPlan, on_delete=models.CASCADE, related_name='ledger_entries')
+    transaction = models.ForeignKey(Transaction, on_delete=models.DO_NOTHING, db_constraint=False,
+                                    related_name='ledger_entries')
+    account = models.CharField(choices=account_choices, max_length=20)
+    amount = models.DecimalField(max_digits=14, decimal_places=2)
+    date_created = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['transaction', 'account'], name='unique_ledger_posting'),
+        ]
+        indexes = [
+            models.Index(fields=['savings_plan', 'account', 'id'], name='ledger_plan_account_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            raise ValueError('Ledger entries are immutable.')
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError('Ledger entries are immutable.')
+
+    def __str__(self):
+        return f'{self.account} {self.amount}'
+
+
+class BalanceSnapshot(models.Model):
+    """Plan balance as of ledger entry ``last_entry_id``."""
+    savings_plan = models.OneToOneField(SavingsPlan, on_delete=models.CASCADE, related_name='balance_snapshot')
+    balance = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    last_entry_id = models.BigIntegerField(default=0)
+    date_updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.savings_plan_id} {self.balance}'
+
+
+class ArchivedTransaction(models.Model):
+    """
+    A completed transaction moved out of ``Transaction`` by the
+    archive_transactions command. It keeps its original id, so ledger
+    entries and keyset cursors still identify it.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='user_archived_transactions')
+    type = models.CharField(choices=Transaction.transaction_types, max_length=30)
+    date_created = models.DateTimeField()
+    savings_plan = models.ForeignKey(SavingsPlan, on_delete=models.CASCADE,
+                                     related_name='savings_plan_archived_transaction')
+    completed = models.BooleanField(default=True)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    fee = models.DecimalField(max_digits=12, decimal_places=2)
+    amount_paid = models.DecimalField(max_digits=12, decimal_places=2)
+    transaction_reference = models.CharField(max_length=250, db_index=True)
+    date_archived = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'date_created', 'id'], name='archived_user_created_idx'),
+        ]
 
     def __str__(self):
         return self.type
-    
\ No newline at end of file
+
+
+class Circle(models.Model):
+    """
+    A rotating savings group (ajo). Every member contributes ``contribution``
+    each cycle and the member at position ``current_cycle`` receives the
+    pot, so a circle of N members runs for N cycles. Contributions are paid
+    into and payouts made from the circle's ``savings_plan``.
+    """
+    name = models.CharField(max_length=250)
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='owned_circles')
+    savings_plan = models.OneToOneField(SavingsPlan, on_delete=models.PROTECT, related_name='circle')
+    frequency = models.CharField(choices=SavingsPlan.frequency_choices, max_length=30)
+    contribution = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        validators=[MinValueValidator(Decimal('0.01'))]
+    )
+    member_count = models.PositiveIntegerField(default=0)
+    current_cycle = models.PositiveIntegerField(default=0)
+    active = models.BooleanField(default=False)
+    date_started = models.DateField(blank=True, null=True)
+    next_close_date = models.DateField(blank=True, null=True)
+    date_created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['next_close_date', 'id'], condition=models.Q(active=True),
+                         name='circle_due_close_idx'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class CircleMember(models.Model):
+    """A member of a circle; ``position`` is the cycle in which they receive the pot."""
+    circle = models.ForeignKey(Circle, on_delete=models.CASCADE, related_name='members')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='circle_memberships')
+    position = models.PositiveIntegerField()
+    date_joined = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['circle', 'position'], name='circle_member_position_uniq'),
+            models.UniqueConstraint(fields=['circle', 'user'], name='circle_member_user_uniq'),
+        ]
+
+    def __str__(self):
+        return f'{self.circle_id} #{self.position}'
+
+
+class CircleContribution(models.Model):
+    """
+    A member's payment towards one cycle, matched to its deposit
+    ``Transaction`` by reference when the cycle closes.
+    """
+    status_choices = (
+        ('Pending', 'Pending'),
+        ('Paid', 'Paid'),
+        ('Missed', 'Missed'),
+    )
+    circle = models.ForeignKey(Circle, on_delete=models.CASCADE, related_name='contributions')
+    member = models.ForeignKey(CircleMember, on_delete=models.CASCADE, related_name='contributions')
+    cycle = models.PositiveIntegerField()
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    transaction_reference = models.CharField(max_length=250, unique=True)
+    status = models.CharField(choices=status_choices, max_length=20, default='Pending')
+    date_created = models.DateTimeField(default=timezone.now)
+    date_paid = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['circle', 'cycle', 'status'], name='circle_contribution_cycle_idx'),
+            models.Index(fields=['member', 'cycle'], name='circle_contribution_member_idx'),
+        ]
+
+    def __str__(self):
+        return self.transaction_reference
+
+
+class CirclePayout(models.Model):
+    """The pot of one closed cycle, paid to the member at that position."""
+    circle = models.ForeignKey(Circle, on_delete=models.CASCADE, related_name='payouts')
+    cycle = models.PositiveIntegerField()
+    recipient = models.ForeignKey(CircleMember, on_delete=models.CASCADE, related_name='payouts')
+    amount = models.DecimalField(max_digits=14, decimal_places=2)
+    contributions_paid = models.PositiveIntegerField()
+    transaction_reference = models.CharField(max_length=250, blank=True)
+    date_created = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['circle', 'cycle'], name='circle_payout_cycle_uniq'),
+        ]
+
+    def __str__(self):
+        return f'{self.circle_id} cycle {self.cycle}'
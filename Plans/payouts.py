@@ -0,0 +1,143 @@
+import calendar
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, DateField, F, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .cache import bump_user_versions
+from .ledger import record_transactions
+from .models import SavingsPlan, Transaction
+
+PAYOUT_INTERVALS = {
+    'Daily': timedelta(days=1),
+    'Weekly': timedelta(weeks=1),
+}
+
+
+def add_months(day, months):
+    """Shift ``day`` by ``months``, clamping to the end of shorter months."""
+    month_index = day.month - 1 + months
+    year = day.year + month_index // 12
+    month = month_index % 12 + 1
+    return day.replace(year=year, month=month, day=min(day.day, calendar.monthrange(year, month)[1]))
+
+
+def next_payout_after(frequency, current, date_started):
+    """
+    Return the payout date following ``current`` for a plan started on
+    ``date_started``. Monthly plans stay anchored to the start day, so a plan
+    started on the 31st pays on the last day of shorter months and goes back
+    to the 31st afterwards.
+    """
+    if frequency == 'Monthly':
+        months = (current.year - date_started.year) * 12 + current.month - date_started.month
+        return add_months(date_started, months + 1)
+    return current + PAYOUT_INTERVALS[frequency]
+
+
+def first_payout_date(frequency, date_started):
+    return next_payout_after(frequency, date_started, date_started)
+
+
+def first_payout_date_expression(date_started):
+    """
+    SQL expression giving the first payout date of a plan starting on
+    ``date_started``, chosen by the plan's ``frequency`` column.
+    """
+    return Case(
+        *[When(frequency=frequency, then=Value(first_payout_date(frequency, date_started)))
+          for frequency, _ in SavingsPlan.frequency_choices],
+        output_field=DateField(),
+    )
+
+
+def payout_reference(plan_id, payout_date):
+    return f'PAYOUT-{plan_id}-{payout_date:%Y%m%d}'
+
+
+def due_plans(today):
+    # Matches the condition of the partial plan_due_payout_idx index.
+    return SavingsPlan.objects.filter(
+        active=True,
+        next_payout_date__lte=today,
+        number_of_payouts_left__gt=0,
+    )
+
+
+def process_payout_batch(today, batch_size):
+    """
+    Pay out one batch of due plans and return how many were paid.
+
+    Rows are claimed with ``SELECT ... FOR UPDATE SKIP LOCKED`` so several
+    workers can drain the same day in parallel without paying a plan twice.
+    Withdrawals are written with one bulk insert and the plan counters are
+    moved with one UPDATE per distinct next payout date in the batch. A
+    plan is deactivated with its last payout.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        plans = list(
+            due_plans(today)
+            .select_for_update(skip_locked=True)
+            .order_by('next_payout_date', 'id')
+            .values('id', 'user_id', 'plan_id', 'frequency', 'set_payout', 'remaining_balance',
+                    'number_of_payouts_left', 'next_payout_date', 'date_started')[:batch_size]
+        )
+        if not plans:
+            return 0
+
+        withdrawals = []
+        groups = defaultdict(list)
+        for plan in plans:
+            amount = min(plan['set_payout'], plan['remaining_balance'])
+            withdrawals.append(Transaction(
+                user_id=plan['user_id'],
+                savings_plan_id=plan['id'],
+                type='Withdrawal',
+                date_created=now,
+                completed=True,
+                amount=amount,
+                fee=Decimal('0.00'),
+                amount_paid=amount,
+                transaction_reference=payout_reference(plan['plan_id'], plan['next_payout_date']),
+            ))
+            if plan['number_of_payouts_left'] > 1:
+                next_date = next_payout_after(
+                    plan['frequency'],
+                    plan['next_payout_date'],
+                    plan['date_started'] or plan['next_payout_date'],
+                )
+            else:
+                next_date = None
+            groups[next_date].append(plan['id'])
+
+        Transaction.objects.bulk_create(withdrawals, batch_size=batch_size)
+        record_transactions(Transaction.objects.filter(
+            type='Withdrawal',
+            transaction_reference__in=[withdrawal.transaction_reference for withdrawal in withdrawals],
+        ))
+        user_ids = [plan['user_id'] for plan in plans]
+        transaction.on_commit(lambda: bump_user_versions(user_ids))
+        for next_date, ids in groups.items():
+            SavingsPlan.objects.filter(id__in=ids).update(
+                number_of_payouts_left=F('number_of_payouts_left') - 1,
+                remaining_balance=Greatest(F('remaining_balance') - F('set_payout'), Value(Decimal('0.00'))),
+                next_payout_date=next_date,
+                active=next_date is not None,
+            )
+    return len(plans)
+
+
+def run_due_payouts(today=None, batch_size=1000):
+    """Drain every plan due on or before ``today``; returns the payout count."""
+    today = today or timezone.localdate()
+    total = 0
+    while True:
+        paid = process_payout_batch(today, batch_size)
+        if not paid:
+            return total
+        total += paid
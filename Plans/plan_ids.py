@@ -0,0 +1,103 @@
+import threading
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+
+from .models import PlanIdSequence
+
+# Legacy plan ids are four random digits. Counters start at 10000, so every
+# allocated id has at least six characters and can never collide with one.
+FIRST_PLAN_NUMBER = 10000
+# plan_id is a CharField(max_length=10): nine counter digits plus a check digit.
+LAST_PLAN_NUMBER = 999_999_999
+
+
+def luhn_check_digit(number):
+    total = 0
+    for index, digit in enumerate(reversed(str(number))):
+        value = int(digit)
+        if index % 2 == 0:
+            value *= 2
+            if value > 9:
+                value -= 9
+        total += value
+    return (10 - total % 10) % 10
+
+
+def encode_plan_id(number):
+    """Render a counter value as a plan id with a trailing Luhn check digit."""
+    return f'{number}{luhn_check_digit(number)}'
+
+
+def is_valid_plan_id(plan_id):
+    return plan_id.isdigit() and len(plan_id) > 1 and \
+        luhn_check_digit(int(plan_id[:-1])) == int(plan_id[-1])
+
+
+def reserve_block(size, name='plan_id'):
+    """
+    Reserve ``size`` consecutive counter values and return the first one.
+
+    This is one UPDATE on the sequence row plus a read of the new value, and
+    it only runs once per block rather than once per plan.
+    """
+    with transaction.atomic():
+        sequence = PlanIdSequence.objects.filter(name=name)
+        if not sequence.update(next_value=F('next_value') + size):
+            PlanIdSequence.objects.get_or_create(name=name, defaults={'next_value': FIRST_PLAN_NUMBER})
+            sequence.update(next_value=F('next_value') + size)
+        end = PlanIdSequence.objects.filter(name=name).values_list('next_value', flat=True).get()
+    start = end - size
+    if end - 1 > LAST_PLAN_NUMBER:
+        raise RuntimeError('The plan_id space is exhausted.')
+    return start
+
+
+class PlanIdAllocator:
+    """
+    Hand out plan ids from blocks reserved in the database.
+
+    Ids within a block are issued from memory, so most plans are created
+    without any allocation query. A block reserved inside an open
+    transaction is only kept for later calls once that transaction commits;
+    if it rolls back the reservation is undone and must not be reused.
+    """
+
+    def __init__(self, block_size):
+        self.block_size = block_size
+        self.lock = threading.Lock()
+        self.next_value = 0
+        self.end_value = 0
+
+    def add_block(self, start, end):
+        with self.lock:
+            self.next_value, self.end_value = start, end
+
+    def allocate(self):
+        with self.lock:
+            if self.next_value < self.end_value:
+                number = self.next_value
+                self.next_value += 1
+                return encode_plan_id(number)
+
+        start = reserve_block(self.block_size)
+        end = start + self.block_size
+        if connection.in_atomic_block:
+            transaction.on_commit(lambda: self.add_block(start + 1, end))
+        else:
+            self.add_block(start + 1, end)
+        return encode_plan_id(start)
+
+
+_allocator = None
+_allocator_lock = threading.Lock()
+
+
+def allocate_plan_id():
+    global _allocator
+    if _allocator is None:
+        with _allocator_lock:
+            if _allocator is None:
+                _allocator = PlanIdAllocator(settings.PLAN_ID_BLOCK_SIZE)
+    return _allocator.allocate()
@@ -0,0 +1,52 @@
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+from .models import Transaction
+
+
+def date_range_bounds(start_date, end_date):
+    """
+    Return the aware ``[start, end)`` datetimes covering the local calendar
+    days from ``start_date`` to ``end_date`` inclusive.
+    """
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(start_date, time.min), tz)
+    end = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min), tz)
+    return start, end
+
+
+def transaction_queryset(user, type=None, completed=None, plan_id=None, start_date=None,
+                         end_date=None, min_amount=None, max_amount=None, fields=None, model=Transaction):
+    """
+    Build a single user-scoped transaction queryset from optional filters.
+
+    Every filter leads with ``user`` so one of the composite Transaction
+    indexes applies. ``fields`` limits the selected columns; the plan is
+    joined only when ``plan_id`` is filtered on or requested. ``model`` may
+    be ArchivedTransaction to build the same query against the archive.
+    """
+    transactions = model.objects.filter(user=user)
+    if type is not None:
+        transactions = transactions.filter(type=type)
+    if completed is not None:
+        transactions = transactions.filter(completed=completed)
+    if plan_id is not None:
+        transactions = transactions.filter(savings_plan__plan_id=plan_id)
+    if start_date is not None:
+        transactions = transactions.filter(date_created__gte=date_range_bounds(start_date, start_date)[0])
+    if end_date is not None:
+        transactions = transactions.filter(date_created__lt=date_range_bounds(end_date, end_date)[1])
+    if min_amount is not None:
+        transactions = transactions.filter(amount__gte=min_amount)
+    if max_amount is not None:
+        transactions = transactions.filter(amount__lte=max_amount)
+
+    if fields is None or 'plan_id' in fields:
+        transactions = transactions.select_related('savings_plan')
+    if fields is not None:
+        # The keyset paginator needs the ordering columns and the pk.
+        columns = {'id', 'date_created', 'amount'}
+        columns.update('savings_plan__plan_id' if name == 'plan_id' else name for name in fields)
+        transactions = transactions.only(*columns)
+    return transactions
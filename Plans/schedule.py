@@ -0,0 +1,94 @@
+"""
+Upcoming payouts.
+
+Only a plan's next payout is stored (``next_payout_date``, kept by plan
+activation and run_payouts); the ones after it follow from the plan's
+frequency, start date, payout amount and remaining balance. The payout
+calendar jumps each plan's schedule straight to the first payout inside
+the requested window and merges the per-plan streams in date order, so it
+reads one row per plan and computes only the payouts it returns.
+"""
+import heapq
+from collections import defaultdict
+from decimal import Decimal
+from itertools import islice
+
+from .models import SavingsPlan
+from .payouts import PAYOUT_INTERVALS, add_months
+
+SCHEDULE_FIELDS = ('id', 'plan_id', 'name', 'frequency', 'set_payout', 'remaining_balance',
+                   'number_of_payouts_left', 'next_payout_date', 'date_started')
+
+
+def months_between(earlier, later):
+    return (later.year - earlier.year) * 12 + later.month - earlier.month
+
+
+def nth_payout_date(plan, index):
+    """Date of the payout ``index`` payouts after the plan's next one."""
+    current = plan['next_payout_date']
+    if plan['frequency'] == 'Monthly':
+        # Monthly plans stay anchored to their start day, as in run_payouts.
+        anchor = plan['date_started'] or current
+        return add_months(anchor, months_between(anchor, current) + index)
+    return current + PAYOUT_INTERVALS[plan['frequency']] * index
+
+
+def first_index_from(plan, start):
+    """Index of the plan's first payout on or after ``start``, without stepping through the earlier ones."""
+    current = plan['next_payout_date']
+    if current >= start:
+        return 0
+    if plan['frequency'] == 'Monthly':
+        index = months_between(current, start)
+        return index if nth_payout_date(plan, index) >= start else index + 1
+    return -(-(start - current).days // PAYOUT_INTERVALS[plan['frequency']].days)
+
+
+def plan_payouts(plan, start, end):
+    """
+    Yield ``(date, amount, plan)`` for the payouts of ``plan`` (a dict of
+    ``SCHEDULE_FIELDS``) falling between ``start`` and ``end`` inclusive.
+    """
+    if plan['next_payout_date'] is None:
+        return
+    set_payout, remaining = plan['set_payout'], plan['remaining_balance']
+    for index in range(first_index_from(plan, start), plan['number_of_payouts_left']):
+        payout_date = nth_payout_date(plan, index)
+        if payout_date > end:
+            return
+        # run_payouts pays the lesser of the two and never takes the
+        # balance below zero.
+        yield payout_date, min(set_payout, max(remaining - set_payout * index, Decimal('0.00'))), plan
+
+
+def payout_calendar(user, start, end, limit):
+    """The first ``limit`` payouts of ``user``'s active plans between ``start`` and ``end``."""
+    plans = (
+        SavingsPlan.objects.filter(user=user, active=True, number_of_payouts_left__gt=0, next_payout_date__lte=end)
+        .order_by('id')
+        .values(*SCHEDULE_FIELDS)
+    )
+    merged = heapq.merge(*(plan_payouts(plan, start, end) for plan in plans), key=lambda payout: payout[0])
+    return list(islice(merged, limit))
+
+
+def daily_liability(start, end):
+    """
+    Number of payouts and total amount due per day between ``start`` and
+    ``end``, across the platform. Every plan's schedule is expanded through
+    the window as in the payout calendar, so a Daily plan counts on each
+    day it pays. Reads each active plan due by ``end`` once, over the
+    plan_due_payout_idx index.
+    """
+    plans = (
+        SavingsPlan.objects.filter(active=True, number_of_payouts_left__gt=0, next_payout_date__lte=end)
+        .values(*SCHEDULE_FIELDS)
+        .iterator(chunk_size=2000)
+    )
+    days = defaultdict(lambda: {'plans': 0, 'amount': Decimal('0.00')})
+    for plan in plans:
+        for payout_date, amount, _ in plan_payouts(plan, start, end):
+            days[payout_date]['plans'] += 1
+            days[payout_date]['amount'] += amount
+    return [{'date': day, **days[day]} for day in sorted(days)]
@@ -1,12 +1,15 @@
+from datetime import timedelta
+
+from django.utils import timezone
 from rest_framework import serializers
-from .models import SavingsPlan, Transaction
+from .models import Circle, SavingsPlan, Transaction
 
 class SavingsPlanSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = SavingsPlan
         fields = '__all__'
-        read_only_fields = ['user', 'date_created', 'plan_id', 'active', 'remaining_balance','date_started', 'number_of_payouts', 'number_of_payouts_left']
+        read_only_fields = ['user', 'date_created', 'plan_id', 'active', 'remaining_balance','date_started', 'number_of_payouts', 'number_of_payouts_left', 'next_payout_date']
 
 
 class TransactionSerializer(serializers.ModelSerializer):
@@ -18,4 +21,89 @@ class TransactionSerializer(serializers.ModelSerializer):
 
 class FilterTransactionsByDateSerializer(serializers.Serializer):
     start_date = serializers.DateField(required=True)
-    end_date = serializers.DateField(required=True)
\ No newline at end of file
+    end_date = serializers.DateField(required=True)
+
+
+class TransactionFieldsSerializer(TransactionSerializer):
+    """
+    Transaction serializer that also exposes the plan's ``plan_id`` and can
+    be narrowed to the ``fields`` a client asked for.
+    """
+    plan_id = serializers.CharField(source='savings_plan.plan_id', read_only=True)
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class TransactionQuerySerializer(serializers.Serializer):
+    ordering_choices = ('date_created', '-date_created', 'amount', '-amount')
+
+    type = serializers.ChoiceField(choices=Transaction.transaction_types, required=False)
+    completed = serializers.BooleanField(required=False, allow_null=True, default=None)
+    plan_id = serializers.CharField(required=False)
+    start_date = serializers.DateField(required=False)
+    end_date = serializers.DateField(required=False)
+    min_amount = serializers.DecimalField(max_digits=12, decimal_places=2, required=False)
+    max_amount = serializers.DecimalField(max_digits=12, decimal_places=2, required=False)
+    ordering = serializers.ChoiceField(choices=ordering_choices, required=False, default='-date_created')
+    fields = serializers.CharField(required=False, help_text='Comma separated list of fields to return.')
+
+    def validate_fields(self, value):
+        fields = [name.strip() for name in value.split(',') if name.strip()]
+        allowed = set(TransactionFieldsSerializer().fields)
+        unknown = [name for name in fields if name not in allowed]
+        if unknown:
+            raise serializers.ValidationError(f"Unknown fields: {', '.join(unknown)}.")
+        return fields
+
+    def validate(self, data):
+        if data.get('start_date') and data.get('end_date') and data['start_date'] > data['end_date']:
+            raise serializers.ValidationError({'end_date': 'End date must not be before start date.'})
+        if data.get('min_amount') is not None and data.get('max_amount') is not None \
+                and data['min_amount'] > data['max_amount']:
+            raise serializers.ValidationError({'max_amount': 'Maximum amount must not be below minimum amount.'})
+        return data
+
+
+class TransactionExportSerializer(TransactionQuerySerializer):
+    file_format = serializers.ChoiceField(choices=('csv', 'ndjson'), required=False, default='csv')
+
+
+class PayoutWindowSerializer(serializers.Serializer):
+    """A date window starting today and spanning ``default_days`` unless given."""
+    default_days = 90
+    max_days = 366
+
+    start_date = serializers.DateField(required=False)
+    end_date = serializers.DateField(required=False)
+
+    def validate(self, data):
+        data.setdefault('start_date', timezone.localdate())
+        data.setdefault('end_date', data['start_date'] + timedelta(days=self.default_days))
+        if data['start_date'] > data['end_date']:
+            raise serializers.ValidationError({'end_date': 'End date must not be before start date.'})
+        if data['end_date'] - data['start_date'] > timedelta(days=self.max_days):
+            raise serializers.ValidationError({'end_date': f'The window may span at most {self.max_days} days.'})
+        return data
+
+
+class PayoutCalendarQuerySerializer(PayoutWindowSerializer):
+    limit = serializers.IntegerField(required=False, default=50, min_value=1, max_value=500)
+
+
+class PayoutLiabilityQuerySerializer(PayoutWindowSerializer):
+    default_days = 30
+
+
+class CircleSerializer(serializers.ModelSerializer):
+    plan_id = serializers.CharField(source='savings_plan.plan_id', read_only=True)
+
+    class Meta:
+        model = Circle
+        fields = ['id', 'name', 'frequency', 'contribution', 'plan_id', 'member_count', 'current_cycle',
+                  'active', 'date_started', 'next_close_date', 'date_created']
+        read_only_fields = ['member_count', 'current_cycle', 'active', 'date_started', 'next_close_date',
+                            'date_created']
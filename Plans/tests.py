@@ -1,3 +1,707 @@
-from django.test import TestCase
+import base64
+import json
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+import threading
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import F, Q, Sum
+from django.db.models.query import QuerySet
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from Account.models import User
+from Config.benchmark import FAST_HASHERS, EndpointBenchmarkMixin, jwt_client, seed_plans
+from Plans.circles import (CircleError, close_cycle_batch, close_due_cycles, create_circle, join_circle,
+                           member_contribution_status, next_recipient, record_contribution, start_circle)
+from Plans.ledger import plan_balance, record_transactions, refresh_snapshots
+from Plans.models import (ArchivedTransaction, BalanceSnapshot, Circle, CircleMember, CirclePayout, LedgerEntry,
+                          PlanIdSequence, SavingsPlan, Transaction)
+from Plans.plan_ids import (LAST_PLAN_NUMBER, PlanIdAllocator, encode_plan_id, is_valid_plan_id,
+                            luhn_check_digit)
+from Plans.payouts import first_payout_date, payout_reference, process_payout_batch, run_due_payouts
+from Plans.schedule import daily_liability, payout_calendar
+from Plans.urls import urlpatterns
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class PlansEndpointTests(EndpointBenchmarkMixin, TestCase):
+    covered_prefix = 'Plans/'
+    covered_patterns = [str(pattern.pattern) for pattern in urlpatterns]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='saver@example.com', username='saver', password='pass')
+        other = User.objects.create_user(email='other@example.com', username='other', password='pass')
+        cls.plans = seed_plans(cls.user, plans=20, transactions_per_plan=100, prefix='saver')
+        seed_plans(other, plans=20, transactions_per_plan=100, prefix='other')
+        record_transactions(Transaction.objects.filter(completed=True))
+        cls.plan = cls.plans[0]
+        cls.reference = f'saver-{cls.plan.plan_id}-1'
+        # Owned by another user so the circle's pot plan stays out of the saver's plan lists.
+        cls.circle = make_circle(other, members=2000)
+        CircleMember.objects.filter(circle=cls.circle, position=1).update(user=cls.user)
+        cls.circle = start_circle(cls.circle.id, timezone.localdate())
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.client = jwt_client(self.user)
+
+    def test_create_savings_plan(self):
+        self.measure(self.client, 'post', '/Plans/savings-plans/', max_queries=8, status=201, format='json',
+                     data={'name': 'new', 'frequency': 'Daily', 'total_amount': '1000.00', 'set_payout': '100.00'})
+
+    def test_get_savings_plans(self):
+        self.measure(self.client, 'get', '/Plans/get_savings_plans/', max_queries=2)
+
+    def test_get_saving_plan(self):
+        self.measure(self.client, 'get', f'/Plans/get_saving_plan/{self.plan.plan_id}/', max_queries=2)
+
+    def test_get_plan_balance(self):
+        response = self.measure(self.client, 'get', f'/Plans/get_plan_balance/{self.plan.plan_id}/', max_queries=4)
+        self.assertEqual(response.json()['data']['plan_id'], self.plan.plan_id)
+
+    def test_get_active_savings_plans(self):
+        response = self.measure(self.client, 'get', '/Plans/get_active_savings_plans/', max_queries=2)
+        self.assertEqual(len(response.json()['data']), 20)
+
+    def test_query_transactions(self):
+        # The plan's deposits fit on one page, so the archive is read too.
+        response = self.measure(self.client, 'get', '/Plans/transactions/', max_queries=3,
+                                data={'type': 'Deposit', 'completed': 'true', 'plan_id': self.plan.plan_id})
+        self.assertTrue(all(row['type'] == 'Deposit' for row in response.json()['data']))
+
+    def test_query_transactions_deep_page(self):
+        first = self.client.get('/Plans/transactions/', {'page_size': 500}, HTTP_HOST='localhost').json()
+        self.measure(self.client, 'get', first['next'], max_queries=2, name='GET Plans/transactions/ (page 2)')
+
+    def test_tampered_cursor_is_not_found(self):
+        for payload in ('{"v":"garbage","id":1,"r":false}', '{"v":"2026-01-01T00:00:00+00:00","id":1e999,"r":false}',
+                        '{"v":"2026-01-01T00:00:00+00:00","id":%d,"r":false}' % 10 ** 30):
+            cursor = base64.urlsafe_b64encode(payload.encode()).decode()
+            response = self.client.get('/Plans/transactions/', {'cursor': cursor})
+            self.assertEqual((response.status_code, response.json()), (404, {'detail': 'Invalid cursor'}), payload)
+
+    def test_export_transactions(self):
+        response = self.measure(self.client, 'get', '/Plans/transactions/export/', max_queries=3,
+                                data={'file_format': 'ndjson'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+
+    def test_export_recent_transactions(self):
+        self.measure(self.client, 'get', '/Plans/transactions/export/', max_queries=2,
+                     name='GET Plans/transactions/export/ (recent)',
+                     data={'file_format': 'ndjson', 'start_date': timezone.localdate() - timezone.timedelta(days=30)})
+
+    def test_filter_transactions_by_date(self):
+        today = timezone.localdate()
+        self.measure(self.client, 'get', '/Plans/filter_transactions_by_date/', max_queries=2,
+                     data={'start_date': today - timezone.timedelta(days=30), 'end_date': today})
+
+    def test_get_transactions(self):
+        self.measure(self.client, 'get', '/Plans/get_transactions/', max_queries=2)
+
+    def test_get_deposit_transactions(self):
+        self.measure(self.client, 'get', '/Plans/get_deposit_transactions/', max_queries=2)
+
+    def test_get_withdrawal_transactions(self):
+        self.measure(self.client, 'get', '/Plans/get_withdrawal_transactions/', max_queries=2)
+
+    def test_get_completed_transactions(self):
+        self.measure(self.client, 'get', '/Plans/get_completed_transactions/', max_queries=2)
+
+    def test_get_transaction_by_reference(self):
+        response = self.measure(self.client, 'get', f'/Plans/get_transaction_by_reference/{self.reference}/',
+                                max_queries=2)
+        self.assertEqual(response.json()['data']['transaction_reference'], self.reference)
+
+    def test_get_payout_calendar(self):
+        response = self.measure(self.client, 'get', '/Plans/payout_calendar/', max_queries=2, data={'limit': 100})
+        payouts = response.json()['data']
+        # 20 daily plans due today: five days of payouts fill the page.
+        self.assertEqual(len(payouts), 100)
+        self.assertEqual(payouts[-1]['date'], str(timezone.localdate() + timedelta(days=4)))
+
+    def test_get_payout_liability(self):
+        admin = User.objects.create_user(email='admin@example.com', username='admin', password='pass', is_admin=True)
+        response = self.measure(jwt_client(admin), 'get', '/Plans/payout_liability/', max_queries=2)
+        # The 40 daily plans pay on every day of the default 30-day window.
+        days = response.json()['data']
+        today = timezone.localdate()
+        self.assertEqual([day['date'] for day in days], [str(today + timedelta(days=n)) for n in range(31)])
+        self.assertEqual({(day['plans'], Decimal(day['amount'])) for day in days}, {(40, Decimal('4000.00'))})
+
+    def test_get_payout_liability_requires_admin(self):
+        self.measure(self.client, 'get', '/Plans/payout_liability/', max_queries=1, status=401,
+                     name='GET Plans/payout_liability/ (not admin)')
+
+    def test_create_savings_circle(self):
+        response = self.measure(self.client, 'post', '/Plans/circles/', max_queries=10, status=201, format='json',
+                                data={'name': 'family', 'frequency': 'Weekly', 'contribution': '5000.00'})
+        self.assertEqual(response.json()['data']['member_count'], 1)
+
+    def test_get_savings_circle(self):
+        response = self.measure(self.client, 'get', f'/Plans/circles/{self.circle.id}/', max_queries=5)
+        data = response.json()['data']
+        self.assertEqual((data['member_count'], data['position']), (2000, 1))
+        self.assertEqual(data['next_recipient']['position'], 0)
+
+    def test_join_savings_circle(self):
+        circle = make_circle(User.objects.get(username='other'), members=2000)
+        response = self.measure(self.client, 'post', f'/Plans/circles/{circle.id}/join/', max_queries=8,
+                                status=201, repeat=1)
+        self.assertEqual(response.json()['data']['position'], 2000)
+
+    def test_start_savings_circle(self):
+        circle = make_circle(self.user, members=2000)
+        response = self.measure(self.client, 'post', f'/Plans/circles/{circle.id}/start/', max_queries=5,
+                                repeat=1)
+        self.assertTrue(response.json()['data']['active'])
+
+
+def make_circle(owner, members, start=None, frequency='Daily', contribution=Decimal('1000.00')):
+    """A circle of ``owner`` plus ``members - 1`` bulk-created members, started on ``start`` if given."""
+    circle = create_circle(owner, f'{owner.username} circle', frequency, contribution)
+    users = User.objects.bulk_create([
+        User(email=f'c{circle.id}m{number}@example.com', username=f'c{circle.id}m{number}')
+        for number in range(1, members)
+    ])
+    CircleMember.objects.bulk_create([
+        CircleMember(circle=circle, user=user, position=position) for position, user in enumerate(users, 1)
+    ])
+    Circle.objects.filter(pk=circle.pk).update(member_count=members)
+    circle.refresh_from_db()
+    if start is not None:
+        circle = start_circle(circle.id, start)
+    return circle
+
+
+class CircleTests(TestCase):
+    start = date(2026, 3, 2)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(email='owner@example.com', username='owner', password='pass')
+        cls.circle = create_circle(cls.owner, 'family', 'Daily', Decimal('1000.00'))
+        for name in ('ada', 'bayo'):
+            join_circle(cls.circle.id, User.objects.create_user(email=f'{name}@example.com', username=name))
+        cls.circle = start_circle(cls.circle.id, cls.start)
+        cls.members = list(CircleMember.objects.filter(circle=cls.circle).order_by('position'))
+
+    def contribute(self, member, completed=True):
+        circle = Circle.objects.get(pk=member.circle_id)
+        reference = f'contribution-{circle.id}-{member.position}-{circle.current_cycle}'
+        Transaction.objects.create(
+            user_id=member.user_id, savings_plan_id=circle.savings_plan_id, type='Deposit',
+            date_created=timezone.now(), completed=completed, amount=circle.contribution, fee=Decimal('100.00'),
+            amount_paid=circle.contribution + 100, transaction_reference=reference,
+        )
+        return record_contribution(circle, member, reference)
+
+    def test_rotation_pays_each_member_once(self):
+        self.contribute(self.members[0])
+        self.contribute(self.members[1])
+        missed = self.contribute(self.members[2], completed=False)
+        self.assertEqual(member_contribution_status(self.members[0], 0), 'Paid')
+        self.assertEqual(member_contribution_status(self.members[2], 0), 'Pending')
+
+        call_command('close_circle_cycles', date=self.start + timedelta(days=1), stdout=StringIO())
+        missed.refresh_from_db()
+        self.assertEqual(missed.status, 'Missed')
+        payout = CirclePayout.objects.get(circle=self.circle, cycle=0)
+        self.assertEqual((payout.recipient, payout.amount, payout.contributions_paid),
+                         (self.members[0], Decimal('2000.00'), 2))
+        self.assertTrue(Transaction.objects.filter(
+            transaction_reference=payout.transaction_reference, user=self.owner, amount=Decimal('2000.00'),
+            type='Withdrawal', completed=True).exists())
+        self.circle.refresh_from_db()
+        self.assertEqual((self.circle.current_cycle, self.circle.next_close_date),
+                         (1, self.start + timedelta(days=2)))
+        self.assertEqual(next_recipient(self.circle), self.members[1])
+
+        # Nobody pays in cycle 1; cycle 2 is the last one.
+        close_due_cycles(self.start + timedelta(days=3))
+        self.assertEqual(list(CirclePayout.objects.filter(circle=self.circle).order_by('cycle')
+                              .values_list('recipient__position', 'amount')),
+                         [(0, Decimal('2000.00')), (1, Decimal('0.00')), (2, Decimal('0.00'))])
+        self.circle.refresh_from_db()
+        self.assertFalse(self.circle.active)
+        self.assertIsNone(next_recipient(self.circle))
+        self.assertEqual(close_due_cycles(self.start + timedelta(days=30)), 0)
+
+    def test_new_circle_shows_in_the_owner_plan_lists(self):
+        cache.clear()
+        client = jwt_client(self.owner)
+        before = client.get('/Plans/get_savings_plans/').json()['data']
+        with self.captureOnCommitCallbacks(execute=True):
+            circle = create_circle(self.owner, 'neighbours', 'Weekly', Decimal('200.00'))
+        pot = circle.savings_plan.plan_id
+        # The lists were cached by the first request.
+        plans = [plan['plan_id'] for plan in client.get('/Plans/get_savings_plans/').json()['data']]
+        self.assertEqual((len(plans), pot in plans), (len(before) + 1, True))
+        active = client.get('/Plans/get_active_savings_plans/').json()['data']
+        self.assertIn(pot, [plan['plan_id'] for plan in active])
+
+    def test_payout_to_a_member_who_is_not_the_owner(self):
+        close_due_cycles(self.start + timedelta(days=1))
+        self.contribute(self.members[0])
+        self.contribute(self.members[2])
+        close_due_cycles(self.start + timedelta(days=2))
+        payout = CirclePayout.objects.get(circle=self.circle, cycle=1)
+        self.assertEqual((payout.recipient, payout.amount), (self.members[1], Decimal('2000.00')))
+        # The withdrawal debits the pot plan, so it belongs to the plan's owner.
+        withdrawal = Transaction.objects.get(transaction_reference=payout.transaction_reference)
+        self.assertEqual((withdrawal.user, withdrawal.savings_plan_id), (self.owner, self.circle.savings_plan_id))
+        self.assertFalse(Transaction.objects.filter(user=self.members[1].user, type='Withdrawal').exists())
+
+    def test_close_out_queries_do_not_grow_with_members(self):
+        def close_out_queries(members):
+            # Closes before the shared circle is due.
+            circle = make_circle(self.owner, members, start=self.start - timedelta(days=10))
+            for member in CircleMember.objects.filter(circle=circle):
+                self.contribute(member)
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(close_cycle_batch(circle.next_close_date, batch_size=10), 1)
+            self.assertEqual(CirclePayout.objects.get(circle=circle).contributions_paid, members)
+            return len(queries)
+
+        self.assertEqual(close_out_queries(3), close_out_queries(300))
+
+    def test_joining_is_closed_once_started(self):
+        with self.assertRaises(CircleError):
+            join_circle(self.circle.id, User.objects.create_user(email='late@example.com', username='late'))
+        with self.assertRaises(CircleError):
+            start_circle(self.circle.id)
+
+    def test_start_reads_the_locked_row(self):
+        circle = create_circle(self.owner, 'friends', 'Daily', Decimal('500.00'))
+        # The member count of this instance is stale once someone joins.
+        join_circle(circle.id, User.objects.create_user(email='friend@example.com', username='friend'))
+        self.assertEqual(circle.member_count, 1)
+        with self.assertRaises(Circle.DoesNotExist):
+            start_circle(circle.id, self.start, owner=self.members[1].user)
+        started = start_circle(circle.id, self.start, owner=self.owner)
+        self.assertEqual((started.member_count, started.date_started), (2, self.start))
+
+
+class LedgerTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='ledger@example.com', username='ledger', password='pass')
+        cls.plans = seed_plans(cls.user, plans=3, transactions_per_plan=20, prefix='ledger')
+
+    def expected_balance(self, plan):
+        completed = Transaction.objects.filter(savings_plan=plan, completed=True)
+        deposits = completed.filter(type='Deposit').aggregate(total=Sum('amount'))['total'] or 0
+        withdrawals = completed.filter(type='Withdrawal').aggregate(total=Sum('amount'))['total'] or 0
+        return Decimal(deposits) - Decimal(withdrawals)
+
+    def add_deposit(self, plan, number):
+        return Transaction.objects.create(
+            user=self.user, savings_plan=plan, type='Deposit', date_created=timezone.now(), completed=True,
+            amount=Decimal('250.00'), fee=Decimal('10.00'), amount_paid=Decimal('260.00'),
+            transaction_reference=f'ledger-extra-{plan.id}-{number}',
+        )
+
+    def test_recording_is_idempotent(self):
+        record_transactions(Transaction.objects.all())
+        entries = LedgerEntry.objects.count()
+        # Pending transactions post nothing; zero amounts (the fees) are skipped.
+        self.assertEqual(entries, 2 * Transaction.objects.filter(completed=True).count())
+        record_transactions(Transaction.objects.all())
+        self.assertEqual(LedgerEntry.objects.count(), entries)
+
+    def test_snapshot_plus_delta_is_the_full_balance(self):
+        record_transactions(Transaction.objects.all())
+        self.assertEqual(refresh_snapshots(batch_size=2), 3)
+        for number, plan in enumerate(self.plans):
+            record_transactions(Transaction.objects.filter(pk=self.add_deposit(plan, number).pk))
+        with self.assertNumQueries(2):
+            balance = plan_balance(self.plans[0].id)
+        self.assertEqual(balance, self.expected_balance(self.plans[0]))
+
+        # The next refresh folds only the entries past each snapshot.
+        refresh_snapshots(batch_size=2)
+        for plan in self.plans:
+            snapshot = BalanceSnapshot.objects.get(savings_plan=plan)
+            self.assertEqual(snapshot.balance, self.expected_balance(plan))
+            self.assertEqual(plan_balance(plan.id), snapshot.balance)
+        self.assertEqual(refresh_snapshots(), 0)
+        call_command('verify_ledger', stdout=StringIO())
+
+    def verify(self):
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('verify_ledger', batch_size=2, stdout=out)
+        return out.getvalue()
+
+    def test_verify_ledger_reports_drift(self):
+        record_transactions(Transaction.objects.all())
+        refresh_snapshots()
+        first, second, third = self.plans
+
+        BalanceSnapshot.objects.filter(savings_plan=first).update(balance=F('balance') + 1)
+        report = self.verify()
+        self.assertIn(f'plan {first.id}: snapshot balance', report)
+        BalanceSnapshot.objects.filter(savings_plan=first).update(balance=F('balance') - 1)
+
+        # A deposit completed behind the ledger's back.
+        pending = Transaction.objects.filter(savings_plan=second, completed=False, type='Deposit').first()
+        Transaction.objects.filter(pk=pending.pk).update(completed=True)
+        self.assertIn(f'plan {second.id}: ledger balance', self.verify())
+        record_transactions(Transaction.objects.filter(savings_plan=second))
+
+        entry = LedgerEntry.objects.filter(savings_plan=third, account='Funding').first()
+        LedgerEntry.objects.filter(pk=entry.pk).update(amount=F('amount') - 5)
+        self.assertIn(f'plan {third.id}: transaction {entry.transaction_id} postings sum to', self.verify())
+        LedgerEntry.objects.filter(pk=entry.pk).update(amount=F('amount') + 5)
+        call_command('verify_ledger', stdout=StringIO())
+
+
+class PayoutTests(TestCase):
+    today = date(2026, 3, 2)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='payee@example.com', username='payee', password='pass')
+
+        def plan(plan_id, next_payout_date, active=True):
+            return SavingsPlan.objects.create(
+                user=cls.user, name=plan_id, plan_id=plan_id, frequency='Daily', total_amount=Decimal('250.00'),
+                set_payout=Decimal('100.00'), remaining_balance=Decimal('250.00'), number_of_payouts=3,
+                number_of_payouts_left=3, active=active, date_started=cls.today - timedelta(days=1),
+                next_payout_date=next_payout_date,
+            )
+
+        cls.due = plan('DUE', cls.today)
+        cls.later = plan('LATER', cls.today + timedelta(days=1))
+        cls.inactive = plan('INACTIVE', cls.today, active=False)
+
+    def withdrawals(self, plan):
+        return list(Transaction.objects.filter(savings_plan=plan, type='Withdrawal').order_by('id').values_list(
+            'transaction_reference', 'amount', 'fee', 'completed'))
+
+    def test_batch_pays_due_plans(self):
+        with mock.patch.object(QuerySet, 'select_for_update', autospec=True,
+                               side_effect=QuerySet.select_for_update) as claim:
+            self.assertEqual(process_payout_batch(self.today, batch_size=10), 1)
+        # Concurrent workers skip each other's plans instead of waiting on them.
+        claim.assert_called_once_with(mock.ANY, skip_locked=True)
+
+        reference = payout_reference('DUE', self.today)
+        self.assertEqual(self.withdrawals(self.due), [(reference, Decimal('100.00'), Decimal('0.00'), True)])
+        withdrawal = Transaction.objects.get(transaction_reference=reference)
+        withdrawal.full_clean()
+        self.assertEqual(LedgerEntry.objects.filter(transaction=withdrawal).count(), 2)
+        self.due.refresh_from_db()
+        self.assertEqual((self.due.number_of_payouts_left, self.due.remaining_balance, self.due.next_payout_date,
+                          self.due.active), (2, Decimal('150.00'), self.today + timedelta(days=1), True))
+        self.assertEqual(self.withdrawals(self.later), [])
+        self.assertEqual(self.withdrawals(self.inactive), [])
+
+    def test_last_payout_is_short_and_deactivates(self):
+        # Three days behind: each batch advances the plan by one payout.
+        self.assertEqual(run_due_payouts(self.today + timedelta(days=2), batch_size=1), 5)
+        self.assertEqual(self.withdrawals(self.due), [
+            (payout_reference('DUE', self.today + timedelta(days=day)), amount, Decimal('0.00'), True)
+            for day, amount in ((0, Decimal('100.00')), (1, Decimal('100.00')), (2, Decimal('50.00')))
+        ])
+        self.due.refresh_from_db()
+        # The balance bottoms out at zero rather than going below it.
+        self.assertEqual((self.due.number_of_payouts_left, self.due.remaining_balance, self.due.next_payout_date,
+                          self.due.active), (0, Decimal('0.00'), None, False))
+        self.assertEqual(len(self.withdrawals(self.later)), 2)
+
+    def test_rerun_pays_nothing_twice(self):
+        run_due_payouts(self.today)
+        paid = self.withdrawals(self.due)
+        self.assertEqual(run_due_payouts(self.today), 0)
+        call_command('run_payouts', date=self.today, stdout=StringIO())
+        self.assertEqual(self.withdrawals(self.due), paid)
+        self.assertEqual(Transaction.objects.filter(type='Withdrawal').values('transaction_reference')
+                         .distinct().count(), Transaction.objects.filter(type='Withdrawal').count())
+
+
+class PlanIdTests(TestCase):
+
+    def allocate(self, allocator):
+        # Blocks reserved in a transaction are kept once it commits.
+        with self.captureOnCommitCallbacks(execute=True):
+            return allocator.allocate()
+
+    def test_luhn_check_digit(self):
+        self.assertEqual(luhn_check_digit(7992739871), 3)
+        self.assertEqual(encode_plan_id(10000), '100008')
+        plan_id = encode_plan_id(123456789)
+        self.assertTrue(is_valid_plan_id(plan_id))
+        # Every single-digit typo is caught.
+        for position, digit in enumerate(plan_id):
+            for typo in set('0123456789') - {digit}:
+                self.assertFalse(is_valid_plan_id(plan_id[:position] + typo + plan_id[position + 1:]))
+        self.assertFalse(is_valid_plan_id('12a4'))
+
+    def test_ids_come_from_reserved_blocks(self):
+        allocator = PlanIdAllocator(block_size=5)
+        self.assertEqual(self.allocate(allocator), encode_plan_id(10000))
+        with self.assertNumQueries(0):
+            self.assertEqual([allocator.allocate() for _ in range(4)], [encode_plan_id(n) for n in range(10001, 10005)])
+        # A second allocator (another process) gets the next block.
+        self.assertEqual(self.allocate(PlanIdAllocator(block_size=5)), encode_plan_id(10005))
+        self.assertEqual(self.allocate(allocator), encode_plan_id(10010))
+        self.assertEqual(PlanIdSequence.objects.get(name='plan_id').next_value, 10015)
+
+    def test_rolled_back_block_is_not_kept(self):
+        allocator = PlanIdAllocator(block_size=5)
+        sequence = PlanIdSequence.objects.values_list('next_value', flat=True)
+        before = sequence.get(name='plan_id')
+        with self.assertRaises(ValueError), transaction.atomic():
+            first = allocator.allocate()
+            raise ValueError
+        # The reservation was undone with the transaction, so its ids may be
+        # handed out again, but only from a fresh reservation.
+        self.assertEqual(sequence.get(name='plan_id'), before)
+        with self.assertNumQueries(4):
+            self.assertEqual(self.allocate(allocator), first)
+
+    def test_ids_are_unique(self):
+        allocators = [PlanIdAllocator(block_size=7) for _ in range(3)]
+        ids = [self.allocate(allocators[number % 3 if number % 5 else 0]) for number in range(600)]
+        self.assertEqual(len(set(ids)), len(ids))
+        self.assertTrue(all(is_valid_plan_id(plan_id) for plan_id in ids))
+
+        # Threads sharing one allocator draw from its block under its lock.
+        allocator = PlanIdAllocator(block_size=7)
+        allocator.add_block(50000, 58000)
+        drawn = []
+        threads = [threading.Thread(target=lambda: drawn.extend(allocator.allocate() for _ in range(1000)))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(drawn), [encode_plan_id(number) for number in range(50000, 58000)])
+
+    def test_ids_fit_the_plan_id_column(self):
+        max_length = SavingsPlan._meta.get_field('plan_id').max_length
+        self.assertEqual(len(encode_plan_id(LAST_PLAN_NUMBER)), max_length)
+        PlanIdSequence.objects.filter(name='plan_id').update(next_value=LAST_PLAN_NUMBER - 1)
+        allocator = PlanIdAllocator(block_size=2)
+        self.assertEqual(self.allocate(allocator), encode_plan_id(LAST_PLAN_NUMBER - 1))
+        self.assertEqual(self.allocate(allocator), encode_plan_id(LAST_PLAN_NUMBER))
+        # Past the last number the allocator refuses rather than wrapping round.
+        with self.assertRaises(RuntimeError):
+            self.allocate(allocator)
+
+
+class PayoutCalendarTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='saver@example.com', username='saver', password='pass')
+        plans = [
+            ('Daily', date(2026, 1, 30), '1000.00', '300.00', 4),
+            ('Weekly', date(2026, 1, 2), '500.00', '100.00', 5),
+            ('Monthly', date(2025, 12, 31), '450.00', '100.00', 5),
+        ]
+        for number, (frequency, started, total, payout, payouts) in enumerate(plans):
+            SavingsPlan.objects.create(
+                user=cls.user, name=f'plan {number}', plan_id=f'CAL{number}', frequency=frequency,
+                total_amount=Decimal(total), set_payout=Decimal(payout), remaining_balance=Decimal(total),
+                number_of_payouts=payouts, number_of_payouts_left=payouts, active=True, date_started=started,
+                next_payout_date=first_payout_date(frequency, started),
+            )
+
+    def calendar(self, start, end, limit=500):
+        return [(day, plan['plan_id'], amount) for day, amount, plan in payout_calendar(self.user, start, end, limit)]
+
+    def test_calendar_matches_run_payouts(self):
+        start, end = date(2026, 2, 3), date(2026, 6, 30)
+        expected = self.calendar(start, end)
+        day = date(2026, 1, 1)
+        while day <= end:
+            run_due_payouts(day)
+            day += timedelta(days=1)
+        # Payout references are PAYOUT-<plan_id>-<YYYYMMDD>.
+        actual = sorted(
+            (datetime.strptime(reference[-8:], '%Y%m%d').date(), reference.split('-')[1], amount)
+            for reference, amount in Transaction.objects.filter(type='Withdrawal')
+            .values_list('transaction_reference', 'amount')
+        )
+        self.assertEqual(expected, [payout for payout in actual if payout[0] >= start])
+        # The monthly plan started on the 31st pays on the last day of shorter months.
+        self.assertIn((date(2026, 2, 28), 'CAL2', Decimal('100.00')), expected)
+        self.assertIn((date(2026, 5, 31), 'CAL2', Decimal('50.00')), expected)
+
+    def test_liability_matches_calendar(self):
+        start, end = date(2026, 1, 25), date(2026, 2, 23)
+        expected = defaultdict(lambda: {'plans': 0, 'amount': Decimal('0.00')})
+        for day, _, amount in self.calendar(start, end):
+            expected[day]['plans'] += 1
+            expected[day]['amount'] += amount
+        liability = daily_liability(start, end)
+        self.assertEqual(liability, [{'date': day, **expected[day]} for day in sorted(expected)])
+        # Four daily payouts, two weekly ones and one monthly one.
+        self.assertEqual(sum(day['plans'] for day in liability), 7)
+        self.assertEqual(sum(day['amount'] for day in liability), Decimal('1300.00'))
+
+    def test_limit_and_window(self):
+        self.assertEqual(self.calendar(date(2026, 2, 1), date(2026, 2, 13), limit=3), [
+            (date(2026, 2, 1), 'CAL0', Decimal('300.00')),
+            (date(2026, 2, 2), 'CAL0', Decimal('300.00')),
+            (date(2026, 2, 3), 'CAL0', Decimal('100.00')),
+        ])
+        self.assertEqual(self.calendar(date(2027, 1, 1), date(2027, 2, 1)), [])
+
+
+class GenerateDataTests(TestCase):
+    options = {'users': 40, 'chunk_size': 15, 'as_of': date(2026, 1, 31), 'seed': 7}
+
+    def generate(self):
+        call_command('generate_data', stdout=StringIO(), **self.options)
+        return sorted(Transaction.objects.filter(user__username__startswith='gen').values_list(
+            'user__username', 'savings_plan__plan_id', 'type', 'completed', 'amount', 'date_created',
+            'transaction_reference',
+        ))
+
+    def test_plans_match_their_transactions(self):
+        self.generate()
+        plans = SavingsPlan.objects.filter(user__username__startswith='gen').annotate(paid_out=Sum(
+            'savings_plan_transaction__amount', filter=Q(savings_plan_transaction__type='Withdrawal')))
+        self.assertGreater(len(plans), 40)
+        for plan in plans:
+            # SQLite sums decimals as floats.
+            self.assertAlmostEqual(plan.remaining_balance, plan.total_amount - (plan.paid_out or 0), places=2)
+            self.assertEqual(plan.number_of_payouts_left > 0 and plan.date_started is not None, plan.active)
+
+    def test_output_is_deterministic(self):
+        first = self.generate()
+        User.objects.filter(username__startswith='gen').delete()
+        PlanIdSequence.objects.all().delete()
+        self.assertEqual(self.generate(), first)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, TRANSACTION_ARCHIVE_AFTER_DAYS=365)
+class ArchiveTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='archive@example.com', username='archive', password='pass')
+        old, recent = seed_plans(cls.user, plans=2, transactions_per_plan=40, prefix='archive')
+        Transaction.objects.filter(savings_plan=old).update(date_created=F('date_created') - timedelta(days=500))
+        record_transactions(Transaction.objects.all())
+        cls.old_completed = Transaction.objects.filter(savings_plan=old, completed=True).count()
+
+    def setUp(self):
+        cache.clear()
+        self.client = jwt_client(self.user)
+
+    def walk(self, **params):
+        body = self.client.get('/Plans/transactions/', {**params, 'page_size': 7}, HTTP_HOST='localhost').json()
+        ids = [row['id'] for row in body['data']]
+        while body['next']:
+            body = self.client.get(body['next'], HTTP_HOST='localhost').json()
+            ids += [row['id'] for row in body['data']]
+        return ids
+
+    def export(self, **params):
+        response = self.client.get('/Plans/transactions/export/', {'file_format': 'ndjson', **params},
+                                   HTTP_HOST='localhost')
+        return [json.loads(line)['id'] for line in b''.join(response.streaming_content).splitlines()]
+
+    def archive(self):
+        call_command('archive_transactions', batch_size=7, stdout=StringIO())
+        cache.clear()
+
+    def test_archiving_moves_old_completed_transactions(self):
+        self.archive()
+        self.assertEqual(ArchivedTransaction.objects.count(), self.old_completed)
+        self.assertFalse(Transaction.objects.filter(
+            completed=True, date_created__lt=timezone.now() - timedelta(days=365)).exists())
+        call_command('verify_ledger', stdout=StringIO())
+
+    def test_reads_are_unchanged_by_archiving(self):
+        today = timezone.localdate()
+        reads = [
+            lambda: self.walk(),
+            lambda: self.walk(ordering='date_created'),
+            lambda: self.walk(ordering='-amount', type='Deposit'),
+            lambda: self.export(),
+            lambda: self.export(ordering='date_created', fields='id,plan_id'),
+            lambda: [row['id'] for row in self.client.get('/Plans/filter_transactions_by_date/', {
+                'start_date': today - timedelta(days=600), 'end_date': today}, HTTP_HOST='localhost').json()['data']],
+        ]
+        before = [read() for read in reads]
+        self.assertEqual(len(before[0]), 80)
+        self.archive()
+        self.assertEqual([read() for read in reads], before)
+
+    def test_archived_transaction_by_reference(self):
+        reference = Transaction.objects.filter(date_created__lt=timezone.now() - timedelta(days=365),
+                                               completed=True).values_list('transaction_reference', flat=True)[0]
+        self.archive()
+        response = self.client.get(f'/Plans/get_transaction_by_reference/{reference}/', HTTP_HOST='localhost')
+        self.assertEqual(response.json()['data']['transaction_reference'], reference)
+
+    def test_recent_pages_skip_the_archive(self):
+        self.archive()
+        with self.assertNumQueries(2):
+            self.client.get('/Plans/transactions/', {'page_size': 10}, HTTP_HOST='localhost')
+
+
+class NextPayoutBackfillTests(TransactionTestCase):
+    """Migration 0011 schedules the plans that were active before next_payout_date existed."""
+    serialized_rollback = True
+
+    def migrate(self, plans_migration=None):
+        """Migrate Plans to ``plans_migration`` (the latest when None) and every other app to its latest."""
+        executor = MigrationExecutor(connection)
+        targets = [
+            ('Plans', plans_migration) if plans_migration and app == 'Plans' else (app, name)
+            for app, name in executor.loader.graph.leaf_nodes()
+        ]
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate()
+
+    def test_backfill(self):
+        apps = self.migrate('0010_transaction_fee_validator')
+        SavingsPlan = apps.get_model('Plans', 'SavingsPlan')
+        user = apps.get_model('Account', 'User').objects.create(email='old@example.com', username='old')
+        today = timezone.localdate()
+        plans = {}
+        for name, frequency, active, payouts_left, date_started, next_payout_date in (
+            ('unstarted', 'Daily', True, 5, None, None),
+            ('started', 'Weekly', True, 5, today - timedelta(days=10), None),
+            ('inactive', 'Daily', False, 5, None, None),
+            ('finished', 'Daily', True, 0, None, None),
+            ('scheduled', 'Monthly', True, 5, today, today + timedelta(days=3)),
+        ):
+            plans[name] = SavingsPlan.objects.create(
+                user=user, name=name, plan_id=f'OLD-{name}', frequency=frequency, total_amount=Decimal('500.00'),
+                set_payout=Decimal('100.00'), remaining_balance=Decimal('500.00'), number_of_payouts=5,
+                number_of_payouts_left=payouts_left, active=active, date_started=date_started,
+                next_payout_date=next_payout_date,
+            ).pk
+
+        SavingsPlan = self.migrate('0011_backfill_next_payout_date').get_model('Plans', 'SavingsPlan')
+        scheduled = dict(SavingsPlan.objects.filter(pk__in=plans.values()).values_list('name', 'next_payout_date'))
+        self.assertEqual(scheduled, {
+            # As if activated by a payment today.
+            'unstarted': first_payout_date('Daily', today),
+            # The next weekly payout after today: the one 7 days after the start has passed.
+            'started': today + timedelta(days=4),
+            'inactive': None,
+            'finished': None,
+            'scheduled': today + timedelta(days=3),
+        })
+        self.assertEqual(SavingsPlan.objects.get(name='unstarted').date_started, today)
@@ -3,13 +3,22 @@ from . import views
 
 urlpatterns = [
     path('savings-plans/', views.create_savings_plan),
+    path('transactions/', views.query_transactions),
+    path('transactions/export/', views.export_transactions),
     path('filter_transactions_by_date/', views.filter_transactions_by_date),
     path('get_savings_plans/', views.get_savings_plans),
     path('get_saving_plan/<str:plan_id>/', views.get_saving_plan),
+    path('get_plan_balance/<str:plan_id>/', views.get_plan_balance),
     path('get_transactions/', views.get_transactions),
     path('get_deposit_transactions/', views.get_deposit_transactions),
     path('get_withdrawal_transactions/', views.get_withdrawal_transactions),
     path('get_completed_transactions/', views.get_completed_transactions),
-    path('get_transaction_by_reference/<str:transaction_reference>/', views.get_transaction_by_reference),
+    path('get_transaction_by_reference/<str:reference>/', views.get_transaction_by_reference),
     path('get_active_savings_plans/', views.get_active_savings_plans),
+    path('payout_calendar/', views.get_payout_calendar),
+    path('payout_liability/', views.get_payout_liability),
+    path('circles/', views.create_savings_circle),
+    path('circles/<int:circle_id>/', views.get_savings_circle),
+    path('circles/<int:circle_id>/join/', views.join_savings_circle),
+    path('circles/<int:circle_id>/start/', views.start_savings_circle),
 ]
\ No newline at end of file
@@ -1,24 +1,31 @@
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
-from .models import SavingsPlan, Transaction
-from .serializers import SavingsPlanSerializer, TransactionSerializer, FilterTransactionsByDateSerializer
+from .models import ArchivedTransaction, Circle, CircleMember, SavingsPlan, Transaction
+from .serializers import (SavingsPlanSerializer, TransactionSerializer, FilterTransactionsByDateSerializer,
+                          TransactionFieldsSerializer, TransactionQuerySerializer, TransactionExportSerializer,
+                          PayoutCalendarQuerySerializer, PayoutLiabilityQuerySerializer, CircleSerializer)
+from .queries import transaction_queryset
+from .archive import ArchiveKeysetPagination, archived_queryset
+from .schedule import daily_liability, payout_calendar
+from .circles import (CircleError, create_circle, cycle_summary, join_circle, member_contribution_status,
+                      next_recipient, start_circle)
+from .plan_ids import allocate_plan_id
+from .ledger import available_to_withdraw, plan_balance
+from .cache import bump_user_versions, cached_user_response
 from drf_yasg.utils import swagger_auto_schema
 from django.utils import timezone
 from rest_framework import status
 from rest_framework.response import Response
 from django.db import transaction
-import random
 from decimal import ROUND_UP
-
-def create_plan_id():
-    return ''.join([str(random.randint(0, 9)) for _ in range(4)])
-
-def unique_plan_id():
-    while True:
-        random_id = create_plan_id()
-        if not SavingsPlan.objects.filter(plan_id = random_id).exists():
-            break
-    return random_id
+import csv
+import heapq
+import json
+from operator import attrgetter
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from Config.pagination import KeysetPagination
 
 @swagger_auto_schema(methods=['POST'], request_body=SavingsPlanSerializer)
 @api_view(['POST'])
@@ -31,7 +38,6 @@ def create_savings_plan(request):
 
     valid_data = serializer.validated_data
     date_created = timezone.now()
-    plan_id = unique_plan_id()
     active = False
     remaining_balance = valid_data['total_amount']
     if valid_data['set_payout'] >= valid_data['total_amount']:
@@ -40,6 +46,7 @@ def create_savings_plan(request):
         return Response({'error': 'Amounts must be greater than zero.'}, status=status.HTTP_400_BAD_REQUEST)
     number_of_payouts = (valid_data['total_amount'] / valid_data['set_payout']).to_integral_value(rounding=ROUND_UP)
     number_of_payouts_left = number_of_payouts
+    plan_id = allocate_plan_id()
 
     plan = SavingsPlan(user=user, 
                        date_created=date_created, 
@@ -50,6 +57,7 @@ def create_savings_plan(request):
                         number_of_payouts_left=number_of_payouts_left, 
                          **valid_data)
     plan.save()
+    transaction.on_commit(lambda: bump_user_versions([user.pk]))
 
     response_data = SavingsPlanSerializer(plan)
     data = {'message':'success',
@@ -60,17 +68,19 @@ def create_savings_plan(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@cached_user_response
 def get_savings_plans(request):
     user = request.user
     plans = SavingsPlan.objects.filter(user=user)
-    serializer = SavingsPlanSerializer(plans, many=True)
-    data = {'message':'success',
-            'data': serializer.data}
-    return Response(data, status=status.HTTP_200_OK)
+    paginator = KeysetPagination(ordering='-date_created')
+    page = paginator.paginate_queryset(plans, request)
+    serializer = SavingsPlanSerializer(page, many=True)
+    return paginator.get_paginated_response(serializer.data)
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])     
+@cached_user_response
 def get_saving_plan(request, plan_id):
     user = request.user
     try:
@@ -84,7 +94,22 @@ def get_saving_plan(request, plan_id):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+def get_plan_balance(request, plan_id):
+    user = request.user
+    try:
+        plan = SavingsPlan.objects.get(user=user, plan_id=plan_id)
+    except SavingsPlan.DoesNotExist:
+        return Response({'error': 'Savings plan not found.'}, status=status.HTTP_404_NOT_FOUND)
+    balance = plan_balance(plan.pk)
+    data = {'message':'success',
+            'data': {'plan_id': plan.plan_id,
+                     'balance': str(balance),
+                     'available_to_withdraw': str(available_to_withdraw(plan, balance))}}
+    return Response(data, status=status.HTTP_200_OK)
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@cached_user_response
 def get_active_savings_plans(request):
     user = request.user
     plans = SavingsPlan.objects.filter(user=user, active=True)
@@ -93,49 +118,135 @@ def get_active_savings_plans(request):
             'data': serializer.data}
     return Response(data, status=status.HTTP_200_OK)
 
+@swagger_auto_schema(methods=['GET'], query_serializer=PayoutCalendarQuerySerializer)
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@cached_user_response
+def get_payout_calendar(request):
+    query = PayoutCalendarQuerySerializer(data=request.query_params)
+    query.is_valid(raise_exception=True)
+    start_date = query.validated_data['start_date']
+    end_date = query.validated_data['end_date']
+    payouts = payout_calendar(request.user, start_date, end_date, query.validated_data['limit'])
+    data = {'message':'success',
+            'start_date': start_date,
+            'end_date': end_date,
+            'data': [{'date': payout_date, 'plan_id': plan['plan_id'], 'name': plan['name'], 'amount': str(amount)}
+                     for payout_date, amount, plan in payouts]}
+    return Response(data, status=status.HTTP_200_OK)
 
-def get_transactions(request):
-    user = request.user
-    transactions = Transaction.objects.filter(user=user)
-    serializer = TransactionSerializer(transactions, many=True)
+@swagger_auto_schema(methods=['GET'], query_serializer=PayoutLiabilityQuerySerializer)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_payout_liability(request):
+    if request.user.is_admin == False:
+        return Response({'message':'unauthorized'}, status=status.HTTP_401_UNAUTHORIZED)
+    query = PayoutLiabilityQuerySerializer(data=request.query_params)
+    query.is_valid(raise_exception=True)
+    days = daily_liability(query.validated_data['start_date'], query.validated_data['end_date'])
     data = {'message':'success',
-            'data': serializer.data}
+            'data': [{'date': day['date'], 'plans': day['plans'], 'amount': str(day['amount'])}
+                     for day in days]}
     return Response(data, status=status.HTTP_200_OK)
 
+def transaction_page(request, ordering='-date_created', fields=None, **filters):
+    transactions = transaction_queryset(request.user, fields=fields, **filters)
+    archive = archived_queryset(request.user, fields=fields, **filters)
+    paginator = ArchiveKeysetPagination(archive, ordering=ordering)
+    page = paginator.paginate_queryset(transactions, request)
+    serializer = TransactionFieldsSerializer(page, many=True, fields=fields)
+    return paginator.get_paginated_response(serializer.data)
+
+@swagger_auto_schema(methods=['GET'], query_serializer=TransactionQuerySerializer)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@cached_user_response
+def query_transactions(request):
+    serializer = TransactionQuerySerializer(data=request.query_params)
+    serializer.is_valid(raise_exception=True)
+    return transaction_page(request, **serializer.validated_data)
+
+class Echo:
+    """File-like object that hands back what csv.writer writes to it."""
+    def write(self, value):
+        return value
+
+EXPORT_COLUMNS = ('id', 'date_created', 'type', 'plan_id', 'amount', 'fee',
+                  'amount_paid', 'completed', 'transaction_reference')
+
+@swagger_auto_schema(methods=['GET'], query_serializer=TransactionExportSerializer)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_transactions(request):
+    serializer = TransactionExportSerializer(data=request.query_params)
+    serializer.is_valid(raise_exception=True)
+    filters = dict(serializer.validated_data)
+    file_format = filters.pop('file_format')
+    ordering = filters.pop('ordering')
+    columns = filters.pop('fields', None) or EXPORT_COLUMNS
+    lookups = ['savings_plan__plan_id' if name == 'plan_id' else name for name in columns]
+
+    # values_list() skips model instantiation and iterator() streams the
+    # rows in chunks, so memory stays flat however long the history is.
+    transactions = transaction_queryset(request.user, **filters)
+    archive = archived_queryset(request.user, **filters)
+    if archive is None:
+        rows = _export_rows(transactions, ordering, lookups)
+    else:
+        # Both streams are sorted on (ordering, id); carry those columns
+        # along to merge on and drop them afterwards.
+        keys = [ordering.lstrip('-'), 'id']
+        width = len(lookups)
+        merged = heapq.merge(
+            _export_rows(transactions, ordering, lookups + keys),
+            _export_rows(archive, ordering, lookups + keys),
+            key=lambda row: row[width:],
+            reverse=ordering.startswith('-'),
+        )
+        rows = (row[:width] for row in merged)
+
+    if file_format == 'ndjson':
+        content = (json.dumps(dict(zip(columns, row)), cls=DjangoJSONEncoder) + '\n' for row in rows)
+        content_type = 'application/x-ndjson'
+    else:
+        writer = csv.writer(Echo())
+        content = (writer.writerow(row) for row in _with_header(columns, rows))
+        content_type = 'text/csv'
+
+    response = StreamingHttpResponse(content, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="transactions.{file_format}"'
+    return response
+
+def _export_rows(queryset, ordering, lookups):
+    return queryset.order_by(ordering, 'id').values_list(*lookups).iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+
+def _with_header(header, rows):
+    yield header
+    yield from rows
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@cached_user_response
+def get_transactions(request):
+    return transaction_page(request)
+
 @api_view(['GET'])  
 @permission_classes([IsAuthenticated])
 
 def get_deposit_transactions(request):
-    user = request.user
-    transactions = Transaction.objects.filter(user=user, type='Deposit')
-    serializer = TransactionSerializer(transactions, many=True)
-    data = {'message':'success',
-            'data': serializer.data}
-    return Response(data, status=status.HTTP_200_OK)
+    return transaction_page(request, type='Deposit')
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 
 def get_withdrawal_transactions(request):
-    user = request.user
-    transactions = Transaction.objects.filter(user=user, type='Withdrawal')
-    serializer = TransactionSerializer(transactions, many=True)
-    data = {'message':'success',
-            'data': serializer.data}    
-    return Response(data, status=status.HTTP_200_OK)
+    return transaction_page(request, type='Withdrawal')
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 
 def get_completed_transactions(request):
-    user = request.user
-    transactions = Transaction.objects.filter(user=user, completed=True)
-    serializer = TransactionSerializer(transactions, many=True)
-    data = {'message':'success',
-            'data': serializer.data}    
-    return Response(data, status=status.HTTP_200_OK)
+    return transaction_page(request, completed=True)
 
 
 @swagger_auto_schema(methods=['GET'], query_serializer=FilterTransactionsByDateSerializer)
@@ -150,18 +261,21 @@ def filter_transactions_by_date(request):
     start_date = serializer.validated_data['start_date']
     end_date = serializer.validated_data['end_date']
     
-    end_date_inclusive = end_date + timezone.timedelta(days=1)
+    # len() on the evaluated list avoids a second COUNT query.
+    transactions = list(transaction_queryset(
+        user,
+        start_date=start_date,
+        end_date=end_date
+    ).order_by('date_created', 'id'))
+    archive = archived_queryset(user, start_date=start_date, end_date=end_date)
+    if archive is not None:
+        transactions = list(heapq.merge(archive.order_by('date_created', 'id'), transactions,
+                                        key=attrgetter('date_created', 'pk')))
     
-    transactions = Transaction.objects.filter(
-        user=user, 
-        date_created__date__gte=start_date,
-        date_created__date__lt=end_date_inclusive
-    )
-    
-    serializer = TransactionSerializer(transactions, many=True)
+    serializer = TransactionFieldsSerializer(transactions, many=True)
     data = {
         'message': 'success',
-        'count': transactions.count(),
+        'count': len(transactions),
         'data': serializer.data
     }    
     return Response(data, status=status.HTTP_200_OK)
@@ -174,8 +288,69 @@ def get_transaction_by_reference(request, reference):
     try:
         transaction = Transaction.objects.get(user=user, transaction_reference=reference)
     except Transaction.DoesNotExist:
-        return Response({'error': 'Transaction not found.'}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            transaction = ArchivedTransaction.objects.get(user=user, transaction_reference=reference)
+        except ArchivedTransaction.DoesNotExist:
+            return Response({'error': 'Transaction not found.'}, status=status.HTTP_404_NOT_FOUND)
     serializer = TransactionSerializer(transaction)
     data = {'message':'success',
             'data': serializer.data}    
-    return Response(data, status=status.HTTP_200_OK)
\ No newline at end of file
+    return Response(data, status=status.HTTP_200_OK)
+
+
+@swagger_auto_schema(methods=['POST'], request_body=CircleSerializer)
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def create_savings_circle(request):
+    serializer = CircleSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    circle = create_circle(request.user, **serializer.validated_data)
+    data = {'message':'success',
+            'data': CircleSerializer(circle).data}
+    return Response(data, status=status.HTTP_201_CREATED)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_savings_circle(request, circle_id):
+    try:
+        member = CircleMember.objects.select_related('circle__savings_plan').get(circle_id=circle_id, user=request.user)
+    except CircleMember.DoesNotExist:
+        return Response({'error': 'Savings circle not found.'}, status=status.HTTP_404_NOT_FOUND)
+    circle = member.circle
+    recipient = next_recipient(circle)
+    summary = cycle_summary(circle)
+    data = {'message':'success',
+            'data': {**CircleSerializer(circle).data,
+                     'position': member.position,
+                     'next_recipient': recipient and {'position': recipient.position,
+                                                      'username': recipient.user.username},
+                     'contribution_status': member_contribution_status(member, circle.current_cycle),
+                     'cycle': {status_name: {'count': row['count'], 'total': str(row['total'])}
+                               for status_name, row in summary.items()}}}
+    return Response(data, status=status.HTTP_200_OK)
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def join_savings_circle(request, circle_id):
+    try:
+        member = join_circle(circle_id, request.user)
+    except Circle.DoesNotExist:
+        return Response({'error': 'Savings circle not found.'}, status=status.HTTP_404_NOT_FOUND)
+    except CircleError as exc:
+        return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    data = {'message':'success',
+            'data': {'circle_id': circle_id, 'position': member.position}}
+    return Response(data, status=status.HTTP_201_CREATED)
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def start_savings_circle(request, circle_id):
+    try:
+        circle = start_circle(circle_id, owner=request.user)
+    except Circle.DoesNotExist:
+        return Response({'error': 'Savings circle not found.'}, status=status.HTTP_404_NOT_FOUND)
+    except CircleError as exc:
+        return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    data = {'message':'success',
+            'data': CircleSerializer(circle).data}
+    return Response(data, status=status.HTTP_200_OK)
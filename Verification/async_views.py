@@ -0,0 +1,88 @@
+"""
+Async versions of the BVN lookup and of the job long-poll, for ASGI
+deployments.
+"""
+import asyncio
+import logging
+import time
+
+import httpx
+from django.conf import settings
+from django.http import JsonResponse
+from rest_framework import status
+
+from Config.async_views import async_api_view
+from Config.providers import ProviderUnavailable, get_async_provider
+from .models import VerificationJob
+from .serializers import VerificationJobSerializer, VerificationSerializer
+from .views import BVN_LOOKUP_PATH, FINAL_JOB_STATUSES, bvn_lookup, long_poll_wait, match_bvn
+
+logger = logging.getLogger(__name__)
+
+
+@async_api_view(['POST'], throttle_scope='youverify')
+async def verify_bvn(request):
+    serializer = VerificationSerializer(data=request.data)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    user = request.user
+    if user.verified:
+        return JsonResponse({'message': 'User is already verified'}, status=status.HTTP_400_BAD_REQUEST)
+
+    headers, request_body = bvn_lookup(serializer.validated_data['BVN'])
+    try:
+        response = await get_async_provider('youverify').post(
+            BVN_LOOKUP_PATH, headers=headers, json=request_body, idempotent=True
+        )
+        response.raise_for_status()
+        data, status_code = match_bvn(user, response.json())
+        if status_code == status.HTTP_200_OK:
+            await user.asave(update_fields=['verified', 'verification_date'])
+    except ProviderUnavailable as exc:
+        return JsonResponse({
+            'message': 'Verification service is temporarily unavailable. Please try again later.',
+        }, status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={'Retry-After': str(exc.retry_after)})
+    except httpx.TimeoutException:
+        logger.error(f"BVN verification timeout for user {user.id}")
+        return JsonResponse({
+            'message': 'Verification service is temporarily unavailable. Please try again later.',
+        }, status=status.HTTP_504_GATEWAY_TIMEOUT)
+    except httpx.HTTPError as e:
+        logger.error(f"Error during BVN verification for user {user.id}: {str(e)}")
+        return JsonResponse({
+            'message': 'An error occurred while verifying BVN. Please try again later.',
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    except (KeyError, ValueError) as e:
+        logger.error(f"Unexpected response format during BVN verification: {str(e)}")
+        return JsonResponse({
+            'message': 'Verification service returned an unexpected response.',
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return JsonResponse(data, status=status_code)
+
+
+@async_api_view(['GET'])
+async def get_verification_job(request, job_id):
+    """
+    Return a verification job. ``?wait=<seconds>`` long-polls until the job
+    finishes or the wait (capped by VERIFICATION_LONG_POLL_MAX) runs out;
+    the wait is an ``asyncio.sleep``, so it holds no worker thread.
+    """
+    try:
+        wait = long_poll_wait(request.GET.get('wait', 0))
+    except ValueError:
+        return JsonResponse({'wait': ['A finite number of seconds is required.']},
+                            status=status.HTTP_400_BAD_REQUEST)
+    jobs = VerificationJob.objects.filter(id=job_id, user=request.user)
+
+    deadline = time.monotonic() + wait
+    while True:
+        job = await jobs.afirst()
+        if job is None:
+            return JsonResponse({'message': 'Verification job not found'}, status=status.HTTP_404_NOT_FOUND)
+        remaining = deadline - time.monotonic()
+        if job.status in FINAL_JOB_STATUSES or remaining <= 0:
+            break
+        await asyncio.sleep(min(settings.VERIFICATION_POLL_INTERVAL, remaining))
+
+    return JsonResponse({'message': 'success', 'data': VerificationJobSerializer(job).data})
@@ -0,0 +1,160 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from Account.models import User
+
+
+def fake_provider(latency):
+    """
+    Minimal ASGI app standing in for YouVerify: every lookup takes
+    ``latency`` seconds and returns a record that never matches, so the
+    benchmark user stays unverified and each request reaches the provider.
+    """
+    body = json.dumps({'data': {'status': 'found', 'firstName': 'Nobody', 'lastName': 'Nobody',
+                                'dateOfBirth': '00-01-01'}}).encode()
+
+    async def app(scope, receive, send):
+        if scope['type'] != 'http':
+            return
+        while (await receive()).get('more_body'):
+            pass
+        await asyncio.sleep(latency)
+        await send({'type': 'http.response.start', 'status': 200,
+                    'headers': [(b'content-type', b'application/json')]})
+        await send({'type': 'http.response.body', 'body': body})
+    return app
+
+
+def serve_fake_provider(port, latency):
+    import uvicorn
+    uvicorn.run(fake_provider(latency), host='127.0.0.1', port=port, log_level='warning',
+                backlog=4096, limit_concurrency=None)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Command(BaseCommand):
+    help = (
+        'Load-test verify_bvn against a local fake provider, comparing the sync view '
+        'under gunicorn (WSGI) with the async view under uvicorn (ASGI), one process each.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--concurrency', type=int, default=200, help='Client connections kept busy.')
+        parser.add_argument('--latency', type=float, default=0.2, help='Fake provider response time in seconds.')
+        parser.add_argument('--threads', type=int, default=32, help='gunicorn gthread threads for the WSGI run.')
+
+    def handle(self, *args, **options):
+        if settings.DATABASES['default']['ENGINE'].endswith('sqlite3') and 'DATABASE_URL' not in os.environ:
+            raise CommandError('Set DATABASE_URL so the servers share the benchmark database.')
+
+        user, _ = User.objects.get_or_create(
+            username='bench_bvn',
+            defaults={'email': 'bench_bvn@example.com', 'password': make_password(None),
+                      'first_name': 'Bench', 'last_name': 'User'},
+        )
+        User.objects.filter(pk=user.pk).update(verified=False)
+        token = str(RefreshToken.for_user(user).access_token)
+
+        provider_port = free_port()
+        provider = multiprocessing.Process(target=serve_fake_provider, args=(provider_port, options['latency']),
+                                           daemon=True)
+        provider.start()
+        env = {
+            **os.environ,
+            'YOUVERIFY_BASE_URL': f'http://127.0.0.1:{provider_port}',
+            'YOUVERIFY_RETRIES': '0',
+            'YOUVERIFY_POOL_SIZE': str(options['threads']),
+            'YOUVERIFY_MAX_CONCURRENT': str(options['threads']),
+            'YOUVERIFY_ASYNC_MAX_CONCURRENT': str(options['concurrency']),
+            'YOUVERIFY_BREAKER_MIN_CALLS': str(options['requests'] + 1),
+        }
+        runs = [
+            ('wsgi', '/Verification/verify_bvn/', [
+                sys.executable, '-m', 'gunicorn', 'Config.wsgi:application', '--workers', '1',
+                '--worker-class', 'gthread', '--threads', str(options['threads']),
+                '--backlog', '4096', '--log-level', 'warning',
+            ]),
+            ('asgi', '/Verification/async/verify_bvn/', [
+                sys.executable, '-m', 'uvicorn', 'Config.asgi:application', '--workers', '1',
+                '--backlog', '4096', '--log-level', 'warning',
+            ]),
+        ]
+        try:
+            for name, path, command in runs:
+                port = free_port()
+                bind = ['--bind', f'127.0.0.1:{port}'] if name == 'wsgi' else ['--host', '127.0.0.1', '--port', str(port)]
+                server = subprocess.Popen(command + bind, env=env)
+                try:
+                    base_url = f'http://127.0.0.1:{port}'
+                    self.wait_for(base_url)
+                    result = asyncio.run(self.load(base_url + path, token, options))
+                finally:
+                    server.terminate()
+                    server.wait()
+                self.stdout.write(
+                    f'{name}: {result["ok"]}/{options["requests"]} ok  {result["rps"]:7.1f} req/s  '
+                    f'p50={result["p50"] * 1000:7.1f}ms  p99={result["p99"] * 1000:7.1f}ms'
+                )
+        finally:
+            provider.terminate()
+
+    def wait_for(self, base_url, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                httpx.get(base_url + '/admin/login/', headers={'Host': 'localhost'}, timeout=1)
+                return
+            except httpx.HTTPError:
+                time.sleep(0.2)
+        raise CommandError(f'Server at {base_url} did not start')
+
+    async def load(self, url, token, options):
+        headers = {'Host': 'localhost', 'Authorization': f'Bearer {token}'}
+        remaining = options['requests']
+        latencies = []
+        ok = 0
+
+        async def worker(client):
+            nonlocal remaining, ok
+            while remaining > 0:
+                remaining -= 1
+                started = time.perf_counter()
+                try:
+                    response = await client.post(url, json={'BVN': '12345678901'}, headers=headers)
+                    # The fake record never matches: 400 means the lookup ran.
+                    ok += response.status_code == 400
+                except httpx.HTTPError:
+                    pass
+                latencies.append(time.perf_counter() - started)
+
+        limits = httpx.Limits(max_connections=options['concurrency'])
+        async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+            started = time.perf_counter()
+            await asyncio.gather(*(worker(client) for _ in range(options['concurrency'])))
+            elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        return {
+            'ok': ok,
+            'rps': len(latencies) / elapsed,
+            'p50': latencies[len(latencies) // 2],
+            'p99': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+        }
@@ -0,0 +1,108 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from Config.providers import ProviderUnavailable, get_provider
+
+from Verification.models import VerificationJob
+from Verification.views import check_bvn
+
+
+class Command(BaseCommand):
+    help = 'Run queued BVN verification jobs with bounded parallelism.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=settings.VERIFICATION_WORKERS,
+                            help='Provider calls kept in flight at once.')
+        parser.add_argument('--max-attempts', type=int, default=3)
+        parser.add_argument('--stale-after', type=int, default=300,
+                            help='Seconds after which a Running job is assumed lost and requeued.')
+        parser.add_argument('--watch', action='store_true', help='Keep running and poll for new jobs.')
+        parser.add_argument('--interval', type=float, default=1.0, help='Seconds between polls with --watch.')
+
+    def handle(self, *args, **options):
+        self.max_attempts = options['max_attempts']
+        # The thread pool already bounds this process's calls; the web
+        # workers' bulkhead size would only turn its threads away.
+        get_provider('youverify').set_max_concurrent(options['concurrency'])
+        in_flight = set()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            while True:
+                self.requeue_stale(options['stale_after'])
+                for job_id in self.claim(options['concurrency'] - len(in_flight)):
+                    in_flight.add(pool.submit(self.run_job, job_id))
+                if not in_flight:
+                    if not options['watch']:
+                        return
+                    time.sleep(options['interval'])
+                    continue
+                done, in_flight = wait(in_flight, timeout=options['interval'], return_when=FIRST_COMPLETED)
+                backoff = max((future.result() or 0 for future in done), default=0)
+                if backoff:
+                    # The provider is refusing calls: let in-flight jobs finish
+                    # and stop claiming until its breaker may close again.
+                    wait(in_flight)
+                    in_flight = set()
+                    if not options['watch']:
+                        self.stdout.write('provider unavailable, leaving jobs queued')
+                        return
+                    time.sleep(backoff)
+
+    def requeue_stale(self, stale_after):
+        VerificationJob.objects.filter(
+            status='Running',
+            date_updated__lt=timezone.now() - timedelta(seconds=stale_after),
+        ).update(status='Pending', date_updated=timezone.now())
+
+    def claim(self, count):
+        if count <= 0:
+            return []
+        with transaction.atomic():
+            ids = list(
+                VerificationJob.objects
+                .select_for_update(skip_locked=True)
+                .filter(status='Pending')
+                .order_by('date_updated')
+                .values_list('id', flat=True)[:count]
+            )
+            VerificationJob.objects.filter(id__in=ids).update(
+                status='Running', attempts=F('attempts') + 1, date_updated=timezone.now()
+            )
+        return ids
+
+    def run_job(self, job_id):
+        try:
+            job = VerificationJob.objects.select_related('user').get(id=job_id)
+            if job.user.verified:
+                data, status_code = {'message': 'User is already verified'}, 400
+            else:
+                try:
+                    data, status_code = check_bvn(job.user, job.bvn)
+                except ProviderUnavailable as exc:
+                    # The call never went out, so it does not use up an attempt.
+                    VerificationJob.objects.filter(id=job_id).update(
+                        status='Pending', attempts=F('attempts') - 1, date_updated=timezone.now()
+                    )
+                    return exc.retry_after
+
+            if status_code >= 500 and job.attempts < self.max_attempts:
+                # Provider trouble: leave the job for another attempt.
+                VerificationJob.objects.filter(id=job_id).update(status='Pending', date_updated=timezone.now())
+                return
+            VerificationJob.objects.filter(id=job_id).update(
+                status='Succeeded' if status_code == 200 else 'Failed',
+                result=data,
+                result_status=status_code,
+                bvn='',
+                date_updated=timezone.now(),
+            )
+            self.stdout.write(f'job {job_id}: {status_code}')
+        finally:
+            # Worker threads each hold their own connection.
+            connection.close()
@@ -0,0 +1,35 @@
+# Generated by Django 5.0.14 on 2026-10-18 12:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fail_duplicate_open_jobs(apps, schema_editor):
+    # Keep each user's oldest open job; later duplicates never reach the provider.
+    VerificationJob = apps.get_model('Verification', 'VerificationJob')
+    seen = set()
+    duplicates = []
+    for job_id, user_id in (VerificationJob.objects.filter(status__in=['Pending', 'Running'])
+                            .order_by('user_id', 'date_created').values_list('id', 'user_id')):
+        if user_id in seen:
+            duplicates.append(job_id)
+        seen.add(user_id)
+    VerificationJob.objects.filter(id__in=duplicates).update(
+        status='Failed', bvn='', result={'message': 'Duplicate verification request'},
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Verification', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(fail_duplicate_open_jobs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='verificationjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['Pending', 'Running'])), fields=('user',), name='verification_one_open_job_per_user'),
+        ),
+    ]
@@ -1,3 +1,37 @@
+import uuid
+
 from django.db import models
+from Account.models import User
+
+
+class VerificationJob(models.Model):
+    status_choices = (
+        ('Pending', 'Pending'),
+        ('Running', 'Running'),
+        ('Succeeded', 'Succeeded'),
+        ('Failed', 'Failed'),
+    )
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='verification_jobs')
+    # Cleared as soon as the job has run so BVNs are not kept at rest.
+    bvn = models.CharField(max_length=20, blank=True)
+    status = models.CharField(choices=status_choices, max_length=20, default='Pending')
+    result = models.JSONField(blank=True, null=True)
+    result_status = models.PositiveSmallIntegerField(blank=True, null=True)
+    attempts = models.PositiveIntegerField(default=0)
+    date_created = models.DateTimeField(auto_now_add=True)
+    date_updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'date_updated'], name='verification_status_idx'),
+            models.Index(fields=['user', 'status'], name='verification_user_status_idx'),
+        ]
+        constraints = [
+            # One open job per user; verify_bvn_async returns it on resubmission.
+            models.UniqueConstraint(fields=['user'], condition=models.Q(status__in=['Pending', 'Running']),
+                                    name='verification_one_open_job_per_user'),
+        ]
 
-# Create your models here.
+    def __str__(self):
+        return f'{self.user_id} {self.status}'
@@ -1,4 +1,13 @@
 from rest_framework import serializers
+from .models import VerificationJob
 
 class VerificationSerializer(serializers.Serializer):
     BVN  = serializers.CharField()
+
+
+class VerificationJobSerializer(serializers.ModelSerializer):
+    job_id = serializers.UUIDField(source='id', read_only=True)
+
+    class Meta:
+        model = VerificationJob
+        fields = ['job_id', 'status', 'result', 'result_status', 'date_created', 'date_updated']
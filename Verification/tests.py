@@ -1,3 +1,128 @@
-from django.test import TestCase
+import time
+from datetime import date
+from unittest import mock
 
-# Create your tests here.
+import requests
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models.query import QuerySet
+from django.test import TestCase, override_settings
+
+from Account.models import User
+from Config.benchmark import (
+    BENCHMARK_THROTTLE_RATES, FAST_HASHERS, EndpointBenchmarkMixin, create_throttle_buckets, jwt_client,
+    provider_response,
+)
+from Config.providers import AsyncProviderClient, ProviderClient
+from Verification.models import VerificationJob
+from Verification.urls import urlpatterns
+
+MISMATCHED_BVN = {'data': {'status': 'found', 'firstName': 'Someone', 'lastName': 'Else', 'dateOfBirth': '80-01-01'}}
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, THROTTLE_RATES=BENCHMARK_THROTTLE_RATES)
+class VerificationEndpointTests(EndpointBenchmarkMixin, TestCase):
+    covered_prefix = 'Verification/'
+    covered_patterns = [str(pattern.pattern) for pattern in urlpatterns]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='ada@example.com', username='ada', password='pass',
+                                            first_name='Ada', last_name='Obi', date_of_birth=date(1990, 1, 2))
+        cls.job = VerificationJob.objects.create(user=cls.user, status='Succeeded', result={'message': 'ok'},
+                                                 result_status=200)
+        create_throttle_buckets(cls.user)
+
+    def setUp(self):
+        super().setUp()
+        self.client = jwt_client(self.user)
+
+    def test_verify_bvn(self):
+        # A record that never matches keeps the user unverified, so every
+        # call goes through the full provider lookup.
+        with mock.patch.object(ProviderClient, 'request', return_value=provider_response(200, MISMATCHED_BVN)):
+            self.measure(self.client, 'post', '/Verification/verify_bvn/', max_queries=3, status=400,
+                         data={'BVN': '12345678901'}, format='json')
+
+    def test_verify_bvn_match(self):
+        matched = {'data': {'status': 'found', 'firstName': 'Ada', 'lastName': 'Obi', 'dateOfBirth': '90-01-02'}}
+        with mock.patch.object(ProviderClient, 'request', return_value=provider_response(200, matched)):
+            self.measure(self.client, 'post', '/Verification/verify_bvn/', max_queries=4, repeat=1,
+                         name='POST Verification/verify_bvn/ (match)', data={'BVN': '12345678901'}, format='json')
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.verified)
+
+    def test_async_verify_bvn(self):
+        with mock.patch.object(AsyncProviderClient, 'request', new=mock.AsyncMock(
+                return_value=provider_response(200, MISMATCHED_BVN, asynchronous=True))):
+            self.measure(self.client, 'post', '/Verification/async/verify_bvn/', max_queries=3, status=400,
+                         data={'BVN': '12345678901'}, format='json')
+
+    def test_verify_bvn_throttled(self):
+        with self.settings(THROTTLE_RATES={'youverify': '1/hour', 'youverify.global': '100000/min'}), \
+                mock.patch.object(ProviderClient, 'request',
+                                  return_value=provider_response(200, MISMATCHED_BVN)) as provider:
+            self.client.post('/Verification/verify_bvn/', {'BVN': '12345678901'}, format='json')
+            response = self.measure(self.client, 'post', '/Verification/verify_bvn/', max_queries=3, status=429,
+                                    name='POST Verification/verify_bvn/ (throttled)',
+                                    data={'BVN': '12345678901'}, format='json')
+        self.assertEqual(provider.call_count, 1)
+        self.assertTrue(3590 <= int(response['Retry-After']) <= 3600)
+
+    def test_verify_bvn_breaker_open(self):
+        providers = {**settings.PROVIDERS, 'youverify': {**settings.PROVIDERS['youverify'], 'BREAKER_MIN_CALLS': 1}}
+        with self.settings(PROVIDERS=providers), mock.patch(
+                'requests.Session.request', side_effect=requests.exceptions.ConnectionError('refused')) as session:
+            # The first failure opens the breaker, which also stops the retries.
+            for _ in range(2):
+                response = self.client.post('/Verification/verify_bvn/', {'BVN': '12345678901'}, format='json')
+                self.assertEqual(response.status_code, 503)
+                self.assertEqual(response['Retry-After'], '30')
+        self.assertEqual(session.call_count, 1)
+
+    def test_verify_bvn_async_job(self):
+        response = self.measure(self.client, 'post', '/Verification/verify_bvn_async/', max_queries=5, status=202,
+                                data={'BVN': '12345678901'}, format='json')
+        self.assertEqual(VerificationJob.objects.filter(user=self.user, status='Pending').count(), 1)
+        self.assertEqual(response.json()['data']['status'], 'Pending')
+
+    def test_verify_bvn_async_race_returns_the_open_job(self):
+        open_job = VerificationJob.objects.create(user=self.user, bvn='12345678901')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            VerificationJob.objects.create(user=self.user, bvn='12345678901', status='Running')
+
+        real_first = QuerySet.first
+        checks = []
+
+        def first(queryset):
+            checks.append(queryset)
+            # The open job was queued by a concurrent request after this one's check ran.
+            return None if len(checks) == 1 else real_first(queryset)
+
+        with mock.patch.object(QuerySet, 'first', autospec=True, side_effect=first):
+            response = self.client.post('/Verification/verify_bvn_async/', {'BVN': '12345678901'}, format='json')
+        self.assertEqual((response.status_code, response.json()['data']['job_id']), (202, str(open_job.pk)))
+        self.assertEqual(VerificationJob.objects.filter(user=self.user).count(), 2)
+
+    def test_get_verification_job(self):
+        response = self.measure(self.client, 'get', f'/Verification/verification_jobs/{self.job.pk}/', max_queries=2)
+        self.assertEqual(response.json()['data']['status'], 'Succeeded')
+
+    def test_async_get_verification_job(self):
+        # A finished job is returned at once, whatever the wait.
+        response = self.measure(self.client, 'get', f'/Verification/async/verification_jobs/{self.job.pk}/',
+                                max_queries=2, data={'wait': 20})
+        self.assertEqual(response.json()['data']['status'], 'Succeeded')
+
+    @override_settings(VERIFICATION_LONG_POLL_MAX=0.3, VERIFICATION_POLL_INTERVAL=0.05)
+    def test_long_poll_wait_is_bounded(self):
+        pending = VerificationJob.objects.create(user=self.user, bvn='12345678901')
+        path = f'/Verification/async/verification_jobs/{pending.pk}/'
+        for wait in ('nan', 'inf', '-inf', 'soon'):
+            self.assertEqual(self.client.get(path, {'wait': wait}).status_code, 400, wait)
+        # Clamped to [0, VERIFICATION_LONG_POLL_MAX].
+        for wait, shortest, longest in (('-5', 0, 0.2), ('1e9', 0.3, 1.5)):
+            started = time.monotonic()
+            response = self.client.get(path, {'wait': wait})
+            self.assertTrue(shortest <= time.monotonic() - started < longest, wait)
+            self.assertEqual(response.json()['data']['status'], 'Pending')
@@ -1,5 +1,9 @@
 from django.urls import path
-from . import views
+from . import views, async_views
 urlpatterns = [
     path('verify_bvn/', views.verify_bvn, name='verify_bvn'),
+    path('async/verify_bvn/', async_views.verify_bvn, name='verify_bvn_asgi'),
+    path('verify_bvn_async/', views.verify_bvn_async, name='verify_bvn_async'),
+    path('verification_jobs/<uuid:job_id>/', views.get_verification_job, name='verification_job'),
+    path('async/verification_jobs/<uuid:job_id>/', async_views.get_verification_job, name='verification_job_asgi'),
 ]
\ No newline at end of file
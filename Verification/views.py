@@ -1,20 +1,27 @@
 from django.shortcuts import render
-from .serializers import VerificationSerializer
+from .serializers import VerificationSerializer, VerificationJobSerializer
+from .models import VerificationJob
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
 from rest_framework.permissions import IsAuthenticated
 import requests
 import os
 import logging
 from drf_yasg.utils import swagger_auto_schema
 from django.conf import settings
+from django.db import IntegrityError, transaction
 from django.utils import timezone
 from datetime import datetime
 import json
+import math
+from Config.providers import ProviderUnavailable, get_provider
+from Config.throttling import YouverifyThrottle
 
 logger = logging.getLogger(__name__)
 
+BVN_LOOKUP_PATH = '/v2/api/identity/ng/bvn'
+
 class BVNVerificationError(Exception):
     """Custom exception for BVN verification errors"""
     pass
@@ -22,6 +29,7 @@ class BVNVerificationError(Exception):
 @swagger_auto_schema(methods=['POST'], request_body=VerificationSerializer())
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@throttle_classes([YouverifyThrottle])
 def verify_bvn(request):
     serializer = VerificationSerializer(data=request.data)
     
@@ -35,9 +43,18 @@ def verify_bvn(request):
         }, status=status.HTTP_400_BAD_REQUEST)
     
     bvn = serializer.validated_data['BVN']
-    
-    # Prepare API request
-    url = f"https://api.sandbox.youverify.co/v2/api/identity/ng/bvn"
+    try:
+        data, status_code = check_bvn(request.user, bvn)
+    except ProviderUnavailable as exc:
+        return Response({
+            'message': 'Verification service is temporarily unavailable. Please try again later.',
+        }, status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={'Retry-After': str(exc.retry_after)})
+    return Response(data, status=status_code)
+
+def bvn_lookup(bvn):
+    """
+    Headers and body for a YouVerify BVN lookup.
+    """
     headers = {
         "token": os.getenv('VERIFICATION'),
         "Content-Type": "application/json"
@@ -47,83 +64,166 @@ def verify_bvn(request):
         'premiumNin': False,
         'isSubjectConsent': True,
     }
+    return headers, request_body
+
+def match_bvn(user, response_data):
+    """
+    Compare a YouVerify lookup with ``user``. Returns ``(body, status_code)``
+    and, on a match, sets the verification fields without saving them.
+    """
+    # Log the API response (mask sensitive data in production)
+    if settings.DEBUG:
+        logger.info(f"BVN API Response: {json.dumps(response_data)}")
     
-    try:
-        # Make external API call with timeout
-        response = requests.post(url, headers=headers, json=request_body, timeout=15)
-        response.raise_for_status()  # Raises exception for 4xx/5xx status codes
-        
-        response_data = response.json()
-        
-        # Log the API response (mask sensitive data in production)
-        if settings.DEBUG:
-            logger.info(f"BVN API Response: {json.dumps(response_data)}")
-        
-        # Check if BVN was found
-        if response_data.get('data', {}).get('status') != 'found':
-            return Response({
-                'message': 'BVN not found or invalid',
-                'error': response_data.get('message', 'Unknown error')
-            }, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Extract BVN data
-        bvn_data = response_data['data']
+    # Check if BVN was found
+    if response_data.get('data', {}).get('status') != 'found':
+        return {
+            'message': 'BVN not found or invalid',
+            'error': response_data.get('message', 'Unknown error')
+        }, status.HTTP_400_BAD_REQUEST
+    
+    # Extract BVN data
+    bvn_data = response_data['data']
+    
+    # Format user's date of birth to match API format (YY-MM-DD)
+    user_dob_formatted = user.date_of_birth.strftime('%y-%m-%d') if user.date_of_birth else None
+    
+    # Compare user details with BVN information
+    name_matches = (
+        bvn_data.get('firstName', '').lower() == user.first_name.lower() and
+        bvn_data.get('lastName', '').lower() == user.last_name.lower()
+    )
+    
+    dob_matches = bvn_data.get('dateOfBirth') == user_dob_formatted
+    
+    if name_matches and dob_matches:
+        user.verified = True
+        user.verification_date = timezone.now()
         
-        # Verify user information matches
-        user = request.user
+        # Log successful verification
+        logger.info(f"User {user.id} successfully verified with BVN")
         
-        # Format user's date of birth to match API format (YY-MM-DD)
-        user_dob_formatted = user.date_of_birth.strftime('%y-%m-%d') if user.date_of_birth else None
+        return {
+            'message': 'BVN verified successfully',
+            'data': {
+                'firstName': bvn_data.get('firstName'),
+                'lastName': bvn_data.get('lastName'),
+                'dateOfBirth': bvn_data.get('dateOfBirth'),
+                # Include other non-sensitive data as needed
+            }
+        }, status.HTTP_200_OK
+    else:
+        # Log verification failure due to mismatched data
+        logger.warning(f"BVN verification failed for user {user.id}: data mismatch")
         
-        # Compare user details with BVN information
-        name_matches = (
-            bvn_data.get('firstName', '').lower() == user.first_name.lower() and
-            bvn_data.get('lastName', '').lower() == user.last_name.lower()
+        # Generic error message to avoid revealing specific mismatch details
+        return {
+            'message': 'Verification failed. Your information does not match our records.',
+        }, status.HTTP_400_BAD_REQUEST
+
+def check_bvn(user, bvn):
+    """
+    Look up ``bvn`` with YouVerify and mark ``user`` verified when the
+    name and date of birth match. Returns ``(body, status_code)``; raises
+    ``ProviderUnavailable`` when the provider's breaker or bulkhead refuses
+    the call.
+    """
+    headers, request_body = bvn_lookup(bvn)
+    
+    try:
+        # Lookups are read-only, so the client may retry them
+        response = get_provider('youverify').post(
+            BVN_LOOKUP_PATH, headers=headers, json=request_body, idempotent=True
         )
+        response.raise_for_status()  # Raises exception for 4xx/5xx status codes
         
-        dob_matches = bvn_data.get('dateOfBirth') == user_dob_formatted
-        
-        if name_matches and dob_matches:
-            # Update user verification status
-            user.verified = True
-            user.verification_date = timezone.now()
-            user.save()
-            
-            # Log successful verification
-            logger.info(f"User {user.id} successfully verified with BVN")
-            
-            return Response({
-                'message': 'BVN verified successfully',
-                'data': {
-                    'firstName': bvn_data.get('firstName'),
-                    'lastName': bvn_data.get('lastName'),
-                    'dateOfBirth': bvn_data.get('dateOfBirth'),
-                    # Include other non-sensitive data as needed
-                }
-            }, status=status.HTTP_200_OK)
-        else:
-            # Log verification failure due to mismatched data
-            logger.warning(f"BVN verification failed for user {user.id}: data mismatch")
-            
-            # Generic error message to avoid revealing specific mismatch details
-            return Response({
-                'message': 'Verification failed. Your information does not match our records.',
-            }, status=status.HTTP_400_BAD_REQUEST)
+        data, status_code = match_bvn(user, response.json())
+        if status_code == status.HTTP_200_OK:
+            user.save(update_fields=['verified', 'verification_date'])
+        return data, status_code
             
     except requests.exceptions.Timeout:
-        logger.error(f"BVN verification timeout for user {request.user.id}")
-        return Response({
+        logger.error(f"BVN verification timeout for user {user.id}")
+        return {
             'message': 'Verification service is temporarily unavailable. Please try again later.',
-        }, status=status.HTTP_504_GATEWAY_TIMEOUT)
+        }, status.HTTP_504_GATEWAY_TIMEOUT
         
     except requests.exceptions.RequestException as e:
-        logger.error(f"Error during BVN verification for user {request.user.id}: {str(e)}")
-        return Response({
+        logger.error(f"Error during BVN verification for user {user.id}: {str(e)}")
+        return {
             'message': 'An error occurred while verifying BVN. Please try again later.',
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        }, status.HTTP_500_INTERNAL_SERVER_ERROR
         
     except (KeyError, ValueError) as e:
         logger.error(f"Unexpected response format during BVN verification: {str(e)}")
-        return Response({
+        return {
             'message': 'Verification service returned an unexpected response.',
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+        }, status.HTTP_500_INTERNAL_SERVER_ERROR
+
+
+@swagger_auto_schema(methods=['POST'], request_body=VerificationSerializer())
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def verify_bvn_async(request):
+    """
+    Queue a BVN verification and return 202 with a job id to poll.
+    """
+    serializer = VerificationSerializer(data=request.data)
+
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    if request.user.verified:
+        return Response({
+            'message': 'User is already verified'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    # One open job per user: resubmitting returns the job already queued.
+    # The check is a fast path; the partial unique constraint settles races.
+    open_jobs = VerificationJob.objects.filter(user=request.user, status__in=['Pending', 'Running'])
+    job = open_jobs.first()
+    if job is None:
+        try:
+            with transaction.atomic():
+                job = VerificationJob.objects.create(user=request.user, bvn=serializer.validated_data['BVN'])
+        except IntegrityError:
+            job = open_jobs.first()
+
+    return Response({
+        'message': 'Verification queued',
+        'data': VerificationJobSerializer(job).data,
+    }, status=status.HTTP_202_ACCEPTED)
+
+
+FINAL_JOB_STATUSES = ('Succeeded', 'Failed')
+
+
+def long_poll_wait(value):
+    """
+    Seconds to long-poll for a ``?wait=`` value, clamped to
+    [0, VERIFICATION_LONG_POLL_MAX]. Raises ValueError for anything that
+    is not a finite number, so ``nan`` or ``inf`` cannot wait forever.
+    """
+    wait = float(value)
+    if not math.isfinite(wait):
+        raise ValueError(f'{value!r} is not a finite number')
+    return min(max(wait, 0.0), settings.VERIFICATION_LONG_POLL_MAX)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_verification_job(request, job_id):
+    """
+    Return a verification job's current status. Long-polling with
+    ``?wait=<seconds>`` is served by the async route
+    (``async/verification_jobs/<id>/``) so a waiting client never holds a
+    sync worker.
+    """
+    job = VerificationJob.objects.filter(id=job_id, user=request.user).first()
+    if job is None:
+        return Response({'message': 'Verification job not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    return Response({
+        'message': 'success',
+        'data': VerificationJobSerializer(job).data,
+    }, status=status.HTTP_200_OK)